@@ -6,6 +6,7 @@ before app itself gets started.
 """
 
 import os
+import logging
 import sqlalchemy
 import sqlahelper
 from configobj import ConfigObj
@@ -16,6 +17,9 @@ import oedialect as _
 from wam import settings
 from db_apps import oemof_results
 from stemp import oep_models
+from stemp import startup
+from stemp import database
+from stemp import solver
 
 ADDITIONAL_PARAMETERS = ConfigObj(
     os.path.join(settings.BASE_DIR, "stemp", "scenarios", "attributes.cfg")
@@ -30,6 +34,44 @@ stemp_config = settings.config["STEMP"]
 
 STORE_LP_FILE = stemp_config.get("STORE_LP_FILE", "False") == "True"
 DEFAULT_PERIODS = int(stemp_config.get("DEFAULT_PERIODS", 8760))
+TIMESERIES_CACHE_SIZE = int(stemp_config.get("TIMESERIES_CACHE_SIZE", 128))
+MODEL_TEMPLATE_CACHE_SIZE = int(stemp_config.get("MODEL_TEMPLATE_CACHE_SIZE", 4))
+SIMULATION_DEDUPLICATION_TIMEOUT = int(
+    stemp_config.get("SIMULATION_DEDUPLICATION_TIMEOUT", 3600)
+)
+SIMULATION_PENDING_GRACE_PERIOD = int(
+    stemp_config.get("SIMULATION_PENDING_GRACE_PERIOD", 300)
+)
+TIMESERIES_AGGREGATION = stemp_config.get("TIMESERIES_AGGREGATION", "")
+RESULT_STORAGE = stemp_config.get("RESULT_STORAGE", "database")
+RESULT_STORE_PATH = stemp_config.get(
+    "RESULT_STORE_PATH", os.path.join(settings.BASE_DIR, "stemp", "result_store")
+)
+RESULT_EXTRACTION = stemp_config.get("RESULT_EXTRACTION", "lean")
+if RESULT_EXTRACTION not in ("lean", "full"):
+    raise ValueError(f'Unknown result extraction "{RESULT_EXTRACTION}"')
+RESULT_PAGE_CACHE = stemp_config.get("RESULT_PAGE_CACHE", "default")
+RESULT_PAGE_CACHE_TIMEOUT = int(
+    stemp_config.get("RESULT_PAGE_CACHE_TIMEOUT", 7 * 24 * 3600)
+)
+RESULT_PAGE_CACHE_VERSION = stemp_config.get("RESULT_PAGE_CACHE_VERSION", "1")
+DECOMPOSITION_PERIOD = stemp_config.get("DECOMPOSITION_PERIOD", "")
+DECOMPOSITION_FIRST_STAGE = stemp_config.get(
+    "DECOMPOSITION_FIRST_STAGE", "typical_days:12"
+)
+ANALYTIC_EVALUATION = stemp_config.get("ANALYTIC_EVALUATION", "on")
+ANALYSIS_POOL_SIZE = int(stemp_config.get("ANALYSIS_POOL_SIZE", 4))
+SIMULATION_POOL_SIZE = int(stemp_config.get("SIMULATION_POOL_SIZE", 4))
+WARMING_INTERVAL = int(stemp_config.get("WARMING_INTERVAL", 3600))
+STARTUP_MODE = os.environ.get(
+    "STEMP_STARTUP_MODE", stemp_config.get("STARTUP_MODE", "lazy")
+)
+if STARTUP_MODE not in startup.STARTUP_MODES:
+    raise ValueError(f'Unknown startup mode "{STARTUP_MODE}"')
+solver.load_profiles(stemp_config.get("SOLVER_PROFILES", {}))
+SCENARIO_SOLVER_PROFILES = dict(stemp_config.get("SCENARIO_SOLVER_PROFILES", {}))
+for profile in SCENARIO_SOLVER_PROFILES.values():
+    solver.get_profile(profile)
 
 # DB SETUP:
 DB_URL = "{ENGINE}://{USER}:{PASSWORD}@{HOST}:{PORT}"
@@ -51,24 +93,77 @@ def add_engine(db_connection):
     db_name = stemp_config.get(db_connection, DB_DEFAULT_SETUP[db_connection])
     conf = settings.config["DATABASES"][db_name]
     db_url = DB_URL + "/{NAME}" if "NAME" in conf else DB_URL
-    engine = sqlalchemy.create_engine(db_url.format(**conf))
+    pool = get_pool_setup(db_connection)
+    with startup.phase(f"engine:{db_connection}"):
+        engine = sqlalchemy.create_engine(db_url.format(**conf), **pool)
+    database.register_pool_metrics(
+        engine, db_connection, pool["pool_size"] + pool["max_overflow"]
+    )
     sqlahelper.add_engine(engine, db_connection)
+    ENGINES[db_connection] = engine
+
+
+def get_pool_setup(db_connection):
+    """
+    Returns connection pool setup of given DB connection from STEMP config
+
+    Pool is configured per DB connection via config keys with DB connection as prefix
+    (i.e. DB_RESULTS_POOL_SIZE); defaults are used for keys not given in config.
+    """
+    return {
+        parameter: convert(
+            stemp_config.get(f"{db_connection}_{parameter.upper()}", default)
+        )
+        for parameter, (convert, default) in DB_POOL_DEFAULTS.items()
+    }
+
+
+def get_engine(db_connection):
+    """Returns engine of given DB connection; engine is created on first call"""
+    if db_connection not in ENGINES:
+        add_engine(db_connection)
+    return ENGINES[db_connection]
+
+
+class DeferredEngine(object):
+    """
+    Placeholder for engine of given DB connection, which is created on first use
+
+    Placeholder can be bound to SQLAlchemy metadata instead of an engine. Engine is
+    created (see get_engine) as soon as placeholder is used, i.e. on first query.
+    """
+
+    def __init__(self, db_connection):
+        self.db_connection = db_connection
+
+    def __getattr__(self, name):
+        return getattr(get_engine(self.db_connection), name)
 
 
 DB_DEFAULT_SETUP = {
     "DB_RESULTS": "DEFAULT",
     "DB_SCENARIOS": "DEFAULT",
 }
+DB_POOL_DEFAULTS = {
+    "pool_size": (int, 5),
+    "max_overflow": (int, 10),
+    "pool_timeout": (int, 30),
+    "pool_recycle": (int, 3600),
+    "pool_pre_ping": (lambda value: str(value) == "True", True),
+}
+ENGINES = {}
+"""Engines of all DB connections, which have been created in current process"""
 
 if "READTHEDOCS" not in os.environ:
-    for setup in DB_DEFAULT_SETUP:
-        add_engine(setup)
+    engine_fct = DeferredEngine if STARTUP_MODE == "deferred" else get_engine
 
     # Add sqlalchemy for oemof_results:
-    oemof_results.Base.metadata.bind = sqlahelper.get_engine("DB_RESULTS")
+    oemof_results.Base.metadata.bind = engine_fct("DB_RESULTS")
 
     # Add OEP:
-    oep_models.Base.metadata.bind = sqlahelper.get_engine("DB_SCENARIOS")
+    oep_models.Base.metadata.bind = engine_fct("DB_SCENARIOS")
+
+oep_models.TIMESERIES_CACHE.max_size = TIMESERIES_CACHE_SIZE
 
 # SCENARIO SETUP:
 ACTIVATED_SCENARIOS = stemp_config.get("ACTIVATED_SCENARIOS", [])
@@ -92,7 +187,8 @@ def import_scenario(scenario):
     filename = os.path.join(SCENARIO_PATH, scenario)
     splitted = filename.split(os.path.sep)
     module_name = ".".join(splitted[1:])
-    return import_module("." + module_name, package=splitted[0])
+    with startup.phase(f"scenario:{scenario}"):
+        return import_module("." + module_name, package=splitted[0])
 
 
 class ScenarioModules(object):
@@ -116,6 +212,21 @@ class ScenarioModules(object):
 
 
 SCENARIO_MODULES = ScenarioModules()
+
+
+def preload():
+    """
+    Imports oemof and all activated scenario modules (see startup module)
+
+    Import time of each module is logged, in order to measure cold-start latency.
+    """
+    with startup.phase("oemof.solph"):
+        import_module("oemof.solph")
+    for scenario in ACTIVATED_SCENARIOS:
+        SCENARIO_MODULES[scenario]
+    logging.info("Startup phases:\n" + startup.get_report())
+
+
 SCENARIO_PARAMETERS = {
     scenario: ConfigObj(
         os.path.join(settings.BASE_DIR, SCENARIO_PATH, f"{scenario}.cfg")
@@ -3,3 +3,10 @@ from django.apps import AppConfig
 
 class StempConfig(AppConfig):
     name = "stemp"
+
+    def ready(self):
+        # Scenario modules are preloaded once per (gunicorn or celery) worker:
+        from stemp import app_settings
+
+        if app_settings.STARTUP_MODE == "preload":
+            app_settings.preload()
@@ -0,0 +1,457 @@
+"""
+Benchmarks to measure performance of simulation and result processing
+
+Benchmarks are run from command line (django application is set up automatically):
+
+    python stemp/benchmark.py model_templates --scenario gas --household 1
+    python stemp/benchmark.py timeseries_aggregation --household 1
+    python stemp/benchmark.py analyzers --result 1
+    python stemp/benchmark.py startup --mode lazy --mode preload
+    python stemp/benchmark.py analytic --scenario gas
+    python stemp/benchmark.py decomposition --scenario bhkw --household 1
+    python stemp/benchmark.py solver_interfaces --profile in_memory
+    python stemp/benchmark.py result_extraction --scenario bhkw
+"""
+
+import os
+import sys
+import math
+import time
+import subprocess
+import logging
+import tracemalloc
+from copy import deepcopy
+from types import SimpleNamespace
+import click
+
+wam_path = os.path.abspath(os.path.join(__file__, os.pardir, os.pardir))
+sys.path.append(wam_path)
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from oemof.solph import analyzer as an
+from db_apps.oemof_results import restore_results
+
+from stemp import startup as stemp_startup
+from stemp import solver
+from stemp.database import session_scope
+from stemp.app_settings import SCENARIO_MODULES, ACTIVATED_SCENARIOS
+from stemp.constants import DemandType
+from stemp.warming import get_default_parameters, get_default_households
+from stemp.scenarios import simulation, analytic, decomposition
+from stemp.scenarios.basic_setup import AdvancedLabel
+from stemp.results import analyzer as stemp_an
+from stemp.results import results
+from stemp.results.aggregations import SUMMARY_AGGREGATIONS
+
+
+def get_cost_variants(scenario, parameters, variants):
+    """
+    Returns parameter variants, in which all cost parameters are increased stepwise
+    """
+    cost_parameters = simulation.get_cost_parameters(scenario)
+    parameter_variants = []
+    for i in range(variants):
+        variant = deepcopy(parameters)
+        for component, parameter in cost_parameters:
+            if parameter in variant.get(component, {}):
+                value = float(variant[component][parameter])
+                variant[component][parameter] = value * (1 + 0.05 * (i + 1))
+        parameter_variants.append(variant)
+    return parameter_variants
+
+
+def simulate(
+    scenario,
+    parameters,
+    use_template,
+    aggregation=None,
+    simulate_fct=simulation.default_simulate_fct,
+    solver_profile=None,
+):
+    """
+    Builds and solves energysystem (via given simulation function)
+
+    If no solver profile is given, solver profile of scenario is used.
+
+    Returns
+    -------
+    tuple
+        Elapsed time in seconds, energysystem and (string-keyed) results and
+        parameter results
+    """
+    start = time.perf_counter()
+    module = SCENARIO_MODULES[scenario]
+    energysystem = simulation.create_energysystem(
+        module, aggregation=aggregation, **parameters
+    )
+    template_key = (
+        simulation.get_model_template_key(scenario, energysystem, parameters)
+        if use_template
+        else None
+    )
+    results, param_results = simulate_fct(
+        energysystem,
+        solver_profile=solver_profile or simulation.get_solver_profile(module),
+        template_key=template_key,
+    )
+    return time.perf_counter() - start, energysystem, results, param_results
+
+
+def get_lcoe(energysystem, results, param_results):
+    """Returns total LCOE for results of given energysystem"""
+    labels = {str(node.label): node.label for node in energysystem.nodes}
+
+    def restore_labels(data):
+        return {
+            tuple(labels.get(node) for node in nodes): values
+            for nodes, values in data.items()
+        }
+
+    analysis = an.Analysis(restore_labels(results), restore_labels(param_results))
+    lcoe_analyzer = stemp_an.LCOEAutomatedDemandAnalyzer()
+    analysis.add_analyzer(lcoe_analyzer)
+    analysis.analyze()
+    return sum(
+        lcoe.investment + lcoe.variable_costs
+        for nodes, lcoe in lcoe_analyzer.result.items()
+        if not isinstance(nodes, str)
+    )
+
+
+@click.group()
+def benchmark():
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+@benchmark.command()
+@click.option("--scenario", default="gas", help="Scenario module to benchmark")
+@click.option("--household", default=1, help="ID of household to use as demand")
+@click.option("--variants", default=5, help="Number of cost parameter variants")
+def model_templates(scenario, household, variants):
+    """Compares build+solve time of fresh models against re-used model templates"""
+    parameters = get_default_parameters(scenario, DemandType.Single, household)
+    parameter_variants = get_cost_variants(scenario, parameters, variants)
+
+    fresh = [simulate(scenario, variant, False)[0] for variant in parameter_variants]
+
+    simulation.MODEL_TEMPLATES.max_size = max(simulation.MODEL_TEMPLATES.max_size, 1)
+    simulation.MODEL_TEMPLATES.clear()
+    simulate(scenario, parameters, True)
+    reused = [simulate(scenario, variant, True)[0] for variant in parameter_variants]
+
+    click.echo(f"Scenario: {scenario}, household: {household}, variants: {variants}")
+    click.echo(f"Fresh model (build+solve): {sum(fresh) / variants:.3f}s per run")
+    click.echo(f"Model template (patch+solve): {sum(reused) / variants:.3f}s per run")
+    click.echo(f"Speedup: {sum(fresh) / sum(reused):.2f}x")
+
+
+@benchmark.command()
+@click.option(
+    "--scenario",
+    "scenarios",
+    multiple=True,
+    help="Scenario module to benchmark (default: all activated scenarios)",
+)
+@click.option("--household", default=1, help="ID of household to use as demand")
+@click.option(
+    "--modes",
+    default="2H,4H,typical_days:12",
+    help="Comma-separated aggregation modes to compare against hourly simulation",
+)
+def timeseries_aggregation(scenarios, household, modes):
+    """Compares build+solve time and LCOE of aggregated against hourly simulation"""
+    click.echo(f"Household: {household}")
+    for scenario in scenarios or ACTIVATED_SCENARIOS:
+        parameters = get_default_parameters(scenario, DemandType.Single, household)
+        full_time, *full_result = simulate(scenario, parameters, False, "")
+        full_lcoe = get_lcoe(*full_result)
+        click.echo(f"{scenario}: hourly {full_time:.3f}s, LCOE {full_lcoe:.4f}")
+        for mode in modes.split(","):
+            elapsed, *result = simulate(scenario, parameters, False, mode)
+            lcoe = get_lcoe(*result)
+            click.echo(
+                f"  {mode}: {elapsed:.3f}s (speedup {full_time / elapsed:.2f}x), "
+                f"LCOE {lcoe:.4f} (error {(lcoe - full_lcoe) / full_lcoe:+.2%})"
+            )
+
+
+def analyze_result(result, analyzers):
+    """Analyzes result with given analyzers and returns elapsed time in seconds"""
+    planned = results.plan_analyzers(
+        [SimpleNamespace(analyzer=analyzer) for analyzer in analyzers]
+    )
+    start = time.perf_counter()
+    results.analyze(result, planned)
+    return time.perf_counter() - start
+
+
+@benchmark.command()
+@click.option("--result", "result_id", type=int, required=True, help="Result ID")
+@click.option("--repeat", default=20, help="Number of analysis runs")
+def analyzers(result_id, repeat):
+    """Compares analysis time of per-flow and vectorized analyzers for one result"""
+    analyzer_pairs = (
+        (stemp_an.TotalInvestmentAnalyzer, stemp_an.VectorizedTotalInvestmentAnalyzer),
+        (stemp_an.CO2Analyzer, stemp_an.VectorizedCO2Analyzer),
+        (stemp_an.FossilCostsAnalyzer, stemp_an.VectorizedFossilCostsAnalyzer),
+    )
+    result = results.Result(result_id, None)
+    with session_scope(transactional=False) as sa_session:
+        result.data = restore_results(
+            sa_session, result_id, restore_none_type=True, advanced_label=AdvancedLabel
+        )
+    results.apply_minimum_size(result)
+
+    timings = []
+    for analyzer_set in zip(*analyzer_pairs):
+        timings.append(
+            sum(analyze_result(result, analyzer_set) for _ in range(repeat)) / repeat
+        )
+    for analyzer, vectorized in analyzer_pairs:
+        analyze_result(result, (analyzer,))
+        expected = result.analysis.get_analyzer(analyzer)
+        analyze_result(result, (vectorized,))
+        actual = result.analysis.get_analyzer(vectorized)
+        identical = expected.result == actual.result and expected.total == actual.total
+        click.echo(f"{analyzer.__name__}: identical results: {identical}")
+    click.echo(f"Per-flow analyzers: {timings[0] * 1000:.2f}ms per result")
+    click.echo(f"Vectorized analyzers: {timings[1] * 1000:.2f}ms per result")
+
+
+@benchmark.command("analytic")
+@click.option(
+    "--scenario",
+    "scenarios",
+    multiple=True,
+    default=("gas", "oil", "woodchip"),
+    help="Primary input scenario to verify",
+)
+def analytic_evaluation(scenarios):
+    """Verifies analytic evaluation against solver for all default households"""
+    mismatches = 0
+    for household in get_default_households():
+        for scenario in scenarios:
+            parameters = get_default_parameters(
+                scenario, DemandType.Single, household.id
+            )
+            solver_time, _, *expected = simulate(scenario, parameters, False)
+            analytic_time, _, *actual = simulate(
+                scenario,
+                parameters,
+                False,
+                simulate_fct=lambda energysystem, **kwargs: analytic.evaluate(
+                    energysystem
+                ),
+            )
+            differences = [
+                difference
+                for kind in range(2)
+                for difference in analytic.compare_results(
+                    expected[kind], actual[kind]
+                )
+            ]
+            mismatches += len(differences) > 0
+            click.echo(
+                f"{household.name}, {scenario}: solver {solver_time:.3f}s, "
+                f"analytic {analytic_time:.3f}s, "
+                f"{'identical' if not differences else 'DIFFERENT'}"
+            )
+            for difference in differences:
+                click.echo(f"  {difference}")
+    click.echo(f"{mismatches} mismatching results")
+
+
+@benchmark.command("decomposition")
+@click.option("--scenario", default="bhkw", help="Scenario module to benchmark")
+@click.option("--household", default=1, help="ID of household to use as demand")
+@click.option("--period", default="M", help="Pandas frequency of dispatch periods")
+def decomposition_solve(scenario, household, period):
+    """Compares decomposed solve against monolithic solve (time and objective)"""
+    parameters = get_default_parameters(scenario, DemandType.Single, household)
+    module = SCENARIO_MODULES[scenario]
+    energysystem = simulation.create_energysystem(module, aggregation="", **parameters)
+    profile = simulation.get_solver_profile(module)
+
+    start = time.perf_counter()
+    monolithic = decomposition.solve(deepcopy(energysystem), profile).objective()
+    monolithic_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    *_, decomposed = decomposition.solve_decomposed(
+        energysystem, profile, period=period
+    )
+    decomposed_time = time.perf_counter() - start
+
+    click.echo(f"Scenario: {scenario}, household: {household}, period: {period}")
+    click.echo(f"Monolithic: {monolithic_time:.3f}s, objective {monolithic:.2f}")
+    click.echo(f"Decomposed: {decomposed_time:.3f}s, objective {decomposed:.2f}")
+    click.echo(f"Speedup: {monolithic_time / decomposed_time:.2f}x")
+    click.echo(f"Objective gap: {(decomposed - monolithic) / monolithic:+.3%}")
+
+
+@benchmark.command("solver_interfaces")
+@click.option(
+    "--scenario",
+    "scenarios",
+    multiple=True,
+    help="Scenario to benchmark (defaults to all activated scenarios)",
+)
+@click.option("--household", default=1, help="ID of household to use as demand")
+@click.option(
+    "--profile",
+    default="in_memory",
+    help="Solver profile to compare against file-based default profile",
+)
+@click.option("--repeat", default=3, help="Number of runs per scenario and profile")
+def solver_interfaces(scenarios, household, profile, repeat):
+    """Compares build+solve time and LCOE of given profile against default profile"""
+    if not solver.is_available(solver.get_profile(profile)):
+        click.echo(f'Solver of profile "{profile}" is not available')
+        return
+    click.echo(f"Household: {household}, best of {repeat} runs")
+    for scenario in scenarios or ACTIVATED_SCENARIOS:
+        parameters = get_default_parameters(scenario, DemandType.Single, household)
+        timings = {}
+        for name in (solver.DEFAULT_PROFILE, profile):
+            elapsed = []
+            for _ in range(repeat):
+                duration, *result = simulate(
+                    scenario, parameters, False, solver_profile=name
+                )
+                elapsed.append(duration)
+            timings[name] = min(elapsed), get_lcoe(*result)
+        file_time, file_lcoe = timings[solver.DEFAULT_PROFILE]
+        elapsed, lcoe = timings[profile]
+        click.echo(
+            f"{scenario}: file-based {file_time:.3f}s, {profile} {elapsed:.3f}s "
+            f"(speedup {file_time / elapsed:.2f}x), "
+            f"LCOE difference {(lcoe - file_lcoe) / file_lcoe:+.4%}"
+        )
+
+
+def extract(model, variables):
+    """Extracts results of model and returns peak of traced memory in bytes"""
+    tracemalloc.start()
+    try:
+        simulation.extract_results(model, variables)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summaries_match(expected, actual):
+    """Returns True, if all values of both summaries are (almost) equal"""
+    if expected.keys() != actual.keys():
+        return False
+    for key in expected:
+        if not isinstance(expected[key], list):
+            if expected[key] != actual[key]:
+                return False
+            continue
+        if [label for label, _ in expected[key]] != [
+            label for label, _ in actual[key]
+        ]:
+            return False
+        if not all(
+            value == actual_value or math.isclose(value, actual_value, rel_tol=1e-9)
+            for (_, value), (_, actual_value) in zip(expected[key], actual[key])
+        ):
+            return False
+    return True
+
+
+@benchmark.command("result_extraction")
+@click.option(
+    "--scenario",
+    "scenarios",
+    multiple=True,
+    help="Scenario to benchmark (defaults to all activated scenarios)",
+)
+@click.option("--household", default=1, help="ID of household to use as demand")
+@click.option("--repeat", default=5, help="Number of extractions per mode")
+def result_extraction(scenarios, household, repeat):
+    """Compares time and peak memory of lean against full result extraction"""
+    variables = stemp_an.get_required_variables(
+        results.plan_analyzers(SUMMARY_AGGREGATIONS)
+    )
+    click.echo(f"Household: {household}, lean variables: {variables}")
+    for scenario in scenarios or ACTIVATED_SCENARIOS:
+        parameters = get_default_parameters(scenario, DemandType.Single, household)
+        module = SCENARIO_MODULES[scenario]
+        energysystem = simulation.create_energysystem(
+            module, aggregation="", **parameters
+        )
+        model = decomposition.solve(energysystem, simulation.get_solver_profile(module))
+
+        timings, peaks, summaries = {}, {}, {}
+        for mode, mode_variables in (("full", None), ("lean", variables)):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                extracted = simulation.extract_results(model, mode_variables)
+            timings[mode] = (time.perf_counter() - start) / repeat
+            peaks[mode] = extract(model, mode_variables)
+            summaries[mode] = results.summarize_results(
+                scenario, energysystem, *extracted
+            )
+        click.echo(
+            f"{scenario}: full {timings['full'] * 1000:.1f}ms / "
+            f"{peaks['full'] / 2 ** 20:.1f}MiB, "
+            f"lean {timings['lean'] * 1000:.1f}ms / "
+            f"{peaks['lean'] / 2 ** 20:.1f}MiB, "
+            f"same summary: {summaries_match(summaries['full'], summaries['lean'])}"
+        )
+
+
+STARTUP_SCRIPT = """
+import os
+import time
+
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+
+get_wsgi_application()
+setup = time.perf_counter() - start
+
+from stemp import startup
+from stemp.app_settings import SCENARIO_MODULES, ACTIVATED_SCENARIOS
+
+start = time.perf_counter()
+for scenario in ACTIVATED_SCENARIOS:
+    SCENARIO_MODULES[scenario]
+first_access = time.perf_counter() - start
+print(startup.get_report())
+print(f"Django setup: {setup * 1000:.1f} ms")
+print(f"First access of all scenarios: {first_access * 1000:.1f} ms")
+"""
+
+
+@benchmark.command()
+@click.option(
+    "--mode",
+    "modes",
+    multiple=True,
+    default=stemp_startup.STARTUP_MODES,
+    help="Startup mode to measure (can be given multiple times)",
+)
+def startup(modes):
+    """Reports startup phases of a fresh process for each startup mode"""
+    for mode in modes:
+        process = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            cwd=wam_path,
+            env=dict(os.environ, STEMP_STARTUP_MODE=mode),
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            check=True,
+        )
+        click.echo(f"Startup mode {mode}:")
+        click.echo(process.stdout)
+
+
+if __name__ == "__main__":
+    benchmark()
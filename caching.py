@@ -0,0 +1,119 @@
+"""
+Process-wide caches to avoid repeated database look-ups and recalculations
+
+Caches are held per process (django worker or celery worker); thus, each process
+loads data only once and shares it between all requests.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy
+
+
+def array_fingerprint(data):
+    """
+    Returns fingerprint of given array-like data (i.e. demand profile)
+
+    Fingerprint can be used as cache key for results depending on the data.
+
+    Parameters
+    ----------
+    data : array-like
+        Data (pandas.Series, numpy.ndarray or list) to get fingerprint for
+
+    Returns
+    -------
+    str
+        Hex digest of data
+    """
+    array = numpy.ascontiguousarray(data, dtype=float)
+    return hashlib.sha1(array.tobytes()).hexdigest()
+
+
+class LRUCache(object):
+    """
+    Thread-safe, size-bounded read-through cache
+
+    On cache miss, value is loaded via given loader function and stored.
+    If cache exceeds its maximum size, least recently used entries are evicted.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of cached entries (caching is disabled if set to zero)
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.__data = OrderedDict()
+        self.__lock = threading.RLock()
+        self.__generation = 0
+
+    def get(self, key, loader):
+        """
+        Returns cached value for given key; value is loaded and stored on cache miss
+
+        Parameters
+        ----------
+        key : hashable
+            Key of cached entry
+        loader : callable
+            Function without arguments to load value, if key is not cached yet
+
+        Returns
+        -------
+        object
+            Cached or freshly loaded value
+        """
+        with self.__lock:
+            if key in self.__data:
+                self.__data.move_to_end(key)
+                return self.__data[key]
+            generation = self.__generation
+        value = loader()
+        self.set(key, value, generation)
+        return value
+
+    def set(self, key, value, generation=None):
+        """
+        Stores value for given key and evicts least recently used entries
+
+        If generation is given and cache has been cleared in between (i.e. while
+        loading value), value is not stored as it might be outdated.
+        """
+        with self.__lock:
+            if generation is not None and generation != self.__generation:
+                return
+            if self.max_size <= 0:
+                return
+            self.__data[key] = value
+            self.__data.move_to_end(key)
+            while len(self.__data) > self.max_size:
+                self.__data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        """Removes entry with given key from cache and returns it"""
+        with self.__lock:
+            return self.__data.pop(key, default)
+
+    def invalidate(self, key):
+        """Removes entry with given key from cache (if present)"""
+        with self.__lock:
+            self.__data.pop(key, None)
+            self.__generation += 1
+
+    def clear(self):
+        """Removes all entries from cache"""
+        with self.__lock:
+            self.__data.clear()
+            self.__generation += 1
+
+    def __contains__(self, key):
+        with self.__lock:
+            return key in self.__data
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__data)
@@ -0,0 +1,146 @@
+"""
+Session handling and connection pool metrics for SQLAlchemy connections
+
+All SQLAlchemy sessions should be opened via session_scope; thus, connections are
+returned to connection pool of related engine (see app_settings.add_engine) after
+use, even if session is used within celery workers or threads.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import sqlahelper
+import transaction
+from sqlalchemy import event
+
+POOL_METRICS = {}
+"""Pool metrics (see PoolMetrics) of each DB connection in current process"""
+
+__scope = threading.local()
+
+
+@contextmanager
+def session_scope(transactional=True):
+    """
+    Provides (thread-local) SQLAlchemy session, which is closed afterwards
+
+    Nested scopes share the session of outermost scope; session is removed (and its
+    connections are returned to pool) when outermost scope is left. Likewise, nested
+    transactional scopes share the transaction of outermost transactional scope.
+
+    Parameters
+    ----------
+    transactional : bool
+        If set, session is used within a (zope) transaction, which is committed on
+        success and aborted on error (by outermost transactional scope). Must be
+        unset, if called functions manage transactions themselves (i.e.
+        oemof_results.store_results).
+
+    Yields
+    ------
+    sqlalchemy.orm.Session
+        Session of current thread
+    """
+    session = sqlahelper.get_session()
+    depth = getattr(__scope, "depth", 0)
+    in_transaction = getattr(__scope, "in_transaction", False)
+    __scope.depth = depth + 1
+    try:
+        if transactional and not in_transaction:
+            # Entering transaction manager again would abort outer transaction:
+            __scope.in_transaction = True
+            with transaction.manager:
+                yield session
+        else:
+            yield session
+    finally:
+        __scope.depth = depth
+        __scope.in_transaction = in_transaction
+        if depth == 0:
+            session.remove()
+
+
+class PoolMetrics(object):
+    """
+    Counts checkouts of connection pool of one DB connection
+
+    Metrics are updated via SQLAlchemy pool events; if all connections of pool are
+    checked out, a warning is logged, as further checkouts have to wait.
+
+    Parameters
+    ----------
+    db_connection : str
+        Name of DB connection
+    capacity : int
+        Maximum number of connections (pool size plus overflow)
+    """
+
+    def __init__(self, db_connection, capacity):
+        self.db_connection = db_connection
+        self.capacity = capacity
+        self.connects = 0
+        self.checkouts = 0
+        self.checked_out = 0
+        self.peak_checked_out = 0
+        self.checkout_time = 0.0
+        self.__checkout_start = {}
+        self.__lock = threading.Lock()
+
+    def on_connect(self, dbapi_connection, connection_record):
+        with self.__lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self.__lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+            self.__checkout_start[id(connection_record)] = time.perf_counter()
+            exhausted = self.checked_out >= self.capacity
+        if exhausted:
+            logging.warning(
+                f"All {self.capacity} connections of {self.db_connection} are "
+                f"checked out"
+            )
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        with self.__lock:
+            start = self.__checkout_start.pop(id(connection_record), None)
+            if start is None:
+                return
+            self.checked_out -= 1
+            self.checkout_time += time.perf_counter() - start
+
+    def as_dict(self):
+        """Returns current metrics"""
+        with self.__lock:
+            return {
+                "capacity": self.capacity,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checked_out": self.checked_out,
+                "peak_checked_out": self.peak_checked_out,
+                "mean_checkout_time": (
+                    self.checkout_time / self.checkouts if self.checkouts else 0.0
+                ),
+            }
+
+
+def register_pool_metrics(engine, db_connection, capacity):
+    """Registers pool metrics (see PoolMetrics) for pool of given engine"""
+    metrics = PoolMetrics(db_connection, capacity)
+    event.listen(engine, "connect", metrics.on_connect)
+    event.listen(engine, "checkout", metrics.on_checkout)
+    event.listen(engine, "checkin", metrics.on_checkin)
+    POOL_METRICS[db_connection] = metrics
+    return metrics
+
+
+def get_pool_metrics():
+    """Returns pool metrics of all DB connections in current process"""
+    return {
+        db_connection: metrics.as_dict()
+        for db_connection, metrics in POOL_METRICS.items()
+    }
@@ -3,10 +3,8 @@ import sys
 import click
 import logging
 import pandas
-import sqlahelper
 from sqlalchemy.schema import CreateSchema
 from sqlalchemy.exc import ProgrammingError
-import transaction
 import datetime as dt
 
 from demandlib import bdew
@@ -18,6 +16,8 @@ sys.path.append(wam_path)
 from django.core.wsgi import get_wsgi_application
 
 os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+# DB engines are only created if needed by given commands:
+os.environ.setdefault("STEMP_STARTUP_MODE", "deferred")
 application = get_wsgi_application()
 
 from wam.settings import BASE_DIR
@@ -27,9 +27,13 @@ from stemp.db_population.population_utils import get_meta_from_json
 
 from db_apps import oemof_results
 from stemp import constants
-from stemp.models import Parameter, Scenario, Household, District
+from stemp.models import Parameter, Scenario, Household, District, Simulation
 from stemp import oep_models
+from stemp.database import session_scope
 from stemp.scenarios import basic_setup
+from stemp import warming
+from stemp.results import sequence_store
+from stemp.results.results import ResultPageCache
 
 
 def __get_temperature():
@@ -47,9 +51,9 @@ def __get_temperature():
 
 
 def delete_scenarios():
-    session = sqlahelper.get_session()
-    with transaction.manager:
+    with session_scope() as session:
         session.query(oep_models.OEPScenario).delete()
+    oep_models.invalidate_scenario_parameters()
 
 
 def insert_scenarios():
@@ -57,8 +61,6 @@ def insert_scenarios():
 
 
 def insert_pv_and_temp():
-    session = sqlahelper.get_session()
-
     temperature = __get_temperature()
     temp = oep_models.OEPTimeseries(
         name="Temperature",
@@ -76,14 +78,13 @@ def insert_pv_and_temp():
     pv = oep_models.OEPTimeseries(
         name="PV", meta_data=get_meta_from_json("pv_feedin"), data=pv_feedin
     )
-    with transaction.manager:
+    with session_scope() as session:
         session.add(temp)
         session.add(pv)
+    oep_models.TIMESERIES_CACHE.clear()
 
 
 def insert_heat_demand():
-    session = sqlahelper.get_session()
-
     temperature = __get_temperature()
 
     demand = pandas.DataFrame(
@@ -116,7 +117,7 @@ def insert_heat_demand():
     demand["mfh"][temperature["TT_TU"] >= 20] = 0
 
     # Add to OEP
-    with transaction.manager:
+    with session_scope() as session:
         session.add_all(
             [
                 oep_models.OEPTimeseries(
@@ -137,13 +138,12 @@ def insert_heat_demand():
                 ),
             ]
         )
+    oep_models.TIMESERIES_CACHE.clear()
 
 
 def insert_dhw_timeseries():
     NUM_PERSONS = 30
 
-    session = sqlahelper.get_session()
-
     for consumption in constants.WarmwaterConsumption:
         for p in range(NUM_PERSONS):
             hot_water_file = os.path.join(
@@ -161,8 +161,9 @@ def insert_dhw_timeseries():
                 liter=consumption.in_liters() * (p + 1),
                 data=hot_water_energy_profile[0].values.tolist(),
             )
-            with transaction.manager:
+            with session_scope() as session:
                 session.add(hot_water)
+    oep_models.TIMESERIES_CACHE.clear()
 
 
 def insert_default_households():
@@ -194,6 +195,7 @@ def delete_oep_tables():
         oep_models.Base.metadata.drop_all()
     except oedialect.engine.ConnectionException:
         pass
+    oep_models.TIMESERIES_CACHE.clear()
 
 
 def create_oep_tables():
@@ -201,6 +203,7 @@ def create_oep_tables():
         oep_models.Base.metadata.bind.execute(CreateSchema(oep_models.SCHEMA))
     except ProgrammingError:
         pass
+    oep_models.OEPHotWater.__table__.comment = oep_models.get_dhw_meta()
     oep_models.Base.metadata.create_all()
 
 
@@ -211,12 +214,39 @@ def create_oemof_results_tables():
 def delete_stored_simulations():
     Parameter.objects.all().delete()
     Scenario.objects.all().delete()
-    session = sqlahelper.get_session()
-    with transaction.manager:
+    with session_scope() as session:
         session.query(oemof_results.OemofInputResult).delete()
         session.query(oemof_results.OemofScalar).delete()
         session.query(oemof_results.OemofSequence).delete()
         session.query(oemof_results.OemofData).delete()
+    sequence_store.delete_sequences()
+    ResultPageCache().invalidate()
+
+
+def backfill_simulation_hashes():
+    updated = Simulation.backfill_parameter_hashes()
+    logging.info(f"Parameter hashes of {updated} simulations backfilled.")
+
+
+def migrate_result_sequences():
+    """Copies sequences of stored simulations into column-oriented sequence store"""
+    migrated = 0
+    with session_scope(transactional=False) as session:
+        for result_id in Simulation.objects.values_list("result_id", flat=True):
+            if sequence_store.has_sequences(result_id):
+                continue
+            data = oemof_results.restore_results(
+                session, result_id, restore_none_type=True
+            )
+            _, sequences = sequence_store.split_data(*data)
+            sequence_store.write_data(result_id, sequences)
+            migrated += 1
+    logging.info(f"Sequences of {migrated} simulations migrated.")
+
+
+def warm_default_results():
+    started = warming.warm_default_results(force=True)
+    logging.info(f"{started} simulations of default results started.")
 
 
 def create_all():
@@ -271,6 +301,12 @@ def execute(commands):
             delete_scenarios()
         elif command == "delete_simulations":
             delete_stored_simulations()
+        elif command == "backfill_hashes":
+            backfill_simulation_hashes()
+        elif command == "migrate_sequences":
+            migrate_result_sequences()
+        elif command == "warm_results":
+            warm_default_results()
         elif command == "delete_assumptions":
             assumptions.delete_assumptions()
         else:
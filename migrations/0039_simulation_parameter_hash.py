@@ -0,0 +1,18 @@
+# Generated by Django 2.2.3 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stemp", "0038_auto_20190823_1202"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="simulation",
+            name="parameter_hash",
+            field=models.CharField(db_index=True, max_length=40, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.3 on 2026-10-18 12:00
+
+import django.contrib.postgres.fields.jsonb
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("stemp", "0039_simulation_parameter_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="simulation",
+            name="summary",
+            field=django.contrib.postgres.fields.jsonb.JSONField(null=True),
+        ),
+    ]
@@ -3,9 +3,12 @@ Database models to set up households and districts and to store simulations incl
 related scenario, parameters and results
 """
 
+import json
+import hashlib
+import datetime
+import numpy
 import pandas
-import sqlahelper
-import transaction
+from collections import namedtuple
 
 from django.utils import timezone
 from django.db import models
@@ -14,6 +17,14 @@ from django.contrib.postgres.fields import ArrayField, JSONField
 
 from stemp import constants
 from stemp import oep_models
+from stemp.app_settings import (
+    TIMESERIES_AGGREGATION,
+    DECOMPOSITION_PERIOD,
+    DECOMPOSITION_FIRST_STAGE,
+)
+
+
+AnnualDemand = namedtuple("AnnualDemand", ("heat", "hot_water", "total"))
 
 
 class Parameter(models.Model):
@@ -43,11 +54,150 @@ class Simulation(models.Model):
     parameter = models.ForeignKey(Parameter, on_delete=models.CASCADE)
     result_id = models.IntegerField()
     date = models.DateTimeField(default=timezone.now)
+    parameter_hash = models.CharField(max_length=40, null=True, db_index=True)
+    summary = JSONField(null=True)
 
     def __str__(self):
         ids = map(str, [self.scenario, self.parameter, self.result_id])
         return "(" + ",".join(ids) + ")"
 
+    @staticmethod
+    def __normalize(value):
+        """Numbers are converted to float, in order to get same hash for 3 and 3.0"""
+        if isinstance(value, dict):
+            return {str(k): Simulation.__normalize(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [Simulation.__normalize(v) for v in value]
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (int, float)):
+            return float(value)
+        return value
+
+    @staticmethod
+    def get_parameter_hash(
+        scenario_name, parameters, last_change, aggregation=None, decomposition=None
+    ):
+        """
+        Returns canonical hash of scenario, parameters and scenario change date
+
+        Results of a simulation can be looked up via this hash. As date of last
+        scenario change is included, results become outdated automatically if
+        scenario is changed. Time series aggregation and decomposition mode are
+        included as well (unless disabled, which keeps hashes of hourly, monolithic
+        simulations unchanged); thus, results of different modes are not mixed up.
+
+        Parameters
+        ----------
+        scenario_name : str
+            Name of scenario
+        parameters : dict
+            Parameters of simulation (including demand)
+        last_change : datetime.datetime
+            Date of last change of scenario
+        aggregation : str
+            Time series aggregation mode (defaults to TIMESERIES_AGGREGATION)
+        decomposition : str
+            Decomposition mode, i.e. period and first stage aggregation (defaults to
+            DECOMPOSITION_PERIOD and DECOMPOSITION_FIRST_STAGE, if period is set)
+
+        Returns
+        -------
+        str
+            Hex digest of canonical hash
+        """
+        if aggregation is None:
+            aggregation = TIMESERIES_AGGREGATION
+        if decomposition is None:
+            decomposition = (
+                f"{DECOMPOSITION_PERIOD}|{DECOMPOSITION_FIRST_STAGE}"
+                if DECOMPOSITION_PERIOD
+                else ""
+            )
+        canonical_data = [
+            scenario_name,
+            Simulation.__normalize(parameters),
+            last_change.astimezone(datetime.timezone.utc).isoformat(),
+        ]
+        if aggregation:
+            canonical_data.append(aggregation)
+        if decomposition:
+            canonical_data.append(["decomposition", decomposition])
+        canonical = json.dumps(
+            canonical_data,
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha1(canonical.encode()).hexdigest()
+
+    @classmethod
+    def get_current_parameter_hash(cls, scenario_name, parameters):
+        """
+        Returns parameter hash using current change date of scenario
+
+        Returns None, if scenario has not been simulated yet.
+        """
+        last_change = (
+            Scenario.objects.filter(name=scenario_name)
+            .values_list("last_change", flat=True)
+            .first()
+        )
+        if last_change is None:
+            return None
+        return cls.get_parameter_hash(scenario_name, parameters, last_change)
+
+    @classmethod
+    def find_result(cls, scenario_name, parameters):
+        """
+        Returns result ID of stored simulation for given scenario and parameters
+
+        Simulation is looked up via (indexed) parameter hash.
+
+        Returns
+        -------
+        int:
+            Result ID if simulation was found, else None
+        """
+        parameter_hash = cls.get_current_parameter_hash(scenario_name, parameters)
+        if parameter_hash is None:
+            return None
+        return (
+            cls.objects.filter(parameter_hash=parameter_hash)
+            .values_list("result_id", flat=True)
+            .first()
+        )
+
+    @classmethod
+    def backfill_parameter_hashes(cls, batch_size=500):
+        """
+        Sets parameter hash for all simulations which have no hash yet
+
+        Simulations which are outdated (simulated before last change of scenario)
+        are skipped, as they would not have been found by a lookup anyway.
+
+        Returns
+        -------
+        int
+            Number of updated simulations
+        """
+        simulations = []
+        missing = cls.objects.filter(parameter_hash__isnull=True)
+        for simulation in missing.select_related("scenario", "parameter"):
+            if simulation.date < simulation.scenario.last_change:
+                continue
+            simulation.parameter_hash = cls.get_parameter_hash(
+                simulation.scenario.name,
+                simulation.parameter.data,
+                simulation.scenario.last_change,
+                # Simulations without hash have been solved monolithically and
+                # without time series aggregation:
+                aggregation="",
+                decomposition="",
+            )
+            simulations.append(simulation)
+        cls.objects.bulk_update(simulations, ["parameter_hash"], batch_size=batch_size)
+        return len(simulations)
+
     @classmethod
     def delete_containing_household(cls, hh_id):
         """Deletes all simulations which contain given household ID"""
@@ -113,7 +263,7 @@ class Household(models.Model):
     warm_water_per_day (int): Daily warm water consumption
     roof_area (float): Potential photovoltaik area on roof of household
     """
-    timeseries = None
+    _annual_demands = None
 
     name = models.CharField(
         max_length=22,
@@ -185,25 +335,13 @@ class Household(models.Model):
         """
         Function to get household timeseries
 
-        This function allows one time DB access, in order to avoid multiple database
-        look-ups.
+        Timeseries are cached process-wide (see oep_models.TIMESERIES_CACHE), in
+        order to avoid multiple database look-ups.
 
         Returns:
             pandas.Series: Heat demand profile for given house type
         """
-        if self.timeseries is None:
-            session = sqlahelper.get_session()
-            with transaction.manager:
-                self.timeseries = {
-                    house_type.value: pandas.Series(
-                        session.query(oep_models.OEPTimeseries)
-                        .filter_by(name=house_type.value)
-                        .first()
-                        .data
-                    )
-                    for house_type in constants.HouseType
-                }
-        return self.timeseries[name]
+        return pandas.Series(oep_models.OEPTimeseries.get_data(name), copy=True)
 
     def get_heat_demand_profile(self):
         """
@@ -215,6 +353,11 @@ class Household(models.Model):
         house_type = constants.HouseType[self.house_type]
         return self.get_oep_timeseries(house_type.value)
 
+    @property
+    def hot_water_liter(self):
+        """Daily hot water consumption of whole household in liters"""
+        return self.warm_water_per_day * self.number_of_persons
+
     def annual_hot_water_demand(self):
         """Get annual hot water demand profile
 
@@ -223,31 +366,36 @@ class Household(models.Model):
         Returns:
             pandas.Series: Annual hot water profile
         """
-        session = sqlahelper.get_session()
-        with transaction.manager:
-            hot_water = (
-                session.query(oep_models.OEPHotWater)
-                .filter_by(liter=self.warm_water_per_day * self.number_of_persons)
-                .first()
-            )
-            if hot_water is None:
-                raise KeyError(
-                    f"No hot water profile found for "
-                    f"liter={self.warm_water_per_day}"
-                )
-            return pandas.Series(hot_water.data)
+        return pandas.Series(
+            oep_models.OEPHotWater.get_data(self.hot_water_liter), copy=True
+        )
 
     def __str__(self):
         return self.name
 
+    def annual_demands(self):
+        """
+        Returns annual heat, hot water and total demand profiles in one pass
+
+        Profiles are calculated only once per instance; thus, multiple scenarios can
+        share the same demand profiles (returned profiles must not be changed).
+
+        Returns:
+            AnnualDemand: Heat, hot water and total demand as pandas.Series
+        """
+        if self._annual_demands is None:
+            heat = self.heat_demand * self.get_heat_demand_profile()
+            hot_water = self.annual_hot_water_demand()
+            self._annual_demands = AnnualDemand(
+                heat=heat, hot_water=hot_water, total=heat + hot_water
+            )
+        return self._annual_demands
+
     def annual_total_demand(self):
-        return (
-            self.heat_demand * self.get_heat_demand_profile()
-            + self.annual_hot_water_demand()
-        )
+        return self.annual_demands().total
 
     def annual_heat_demand(self):
-        return self.heat_demand * self.get_heat_demand_profile()
+        return self.annual_demands().heat
 
     def warm_water_demand(self):
         return self.annual_hot_water_demand().sum()
@@ -265,6 +413,8 @@ class Household(models.Model):
 
 class District(models.Model):
     """Multiple households combined to a district"""
+    _annual_demands = None
+
     name = models.CharField(max_length=22)
     households = models.ManyToManyField("Household", through="DistrictHouseholds")
 
@@ -285,35 +435,70 @@ class District(models.Model):
             hh = Household.objects.get(pk=hh_id)
             district_hh = DistrictHouseholds(district=self, household=hh, amount=amount)
             district_hh.save()
+        self._annual_demands = None
 
-    def annual_total_demand(self):
+    def annual_demands(self):
         """
-        Returns combined annual totol demand (heat and warmwater) for all related
-        households in district"""
-        return sum(
+        Returns combined annual heat, hot water and total demand for all related
+        households in district in one pass
+
+        All households (including amounts) are fetched within one query, missing hot
+        water profiles within another.
+        Profiles of all households are stacked into matrices; district profiles are
+        calculated as weighted sum (matrix-vector product) of those matrices.
+        Profiles are calculated only once per instance (returned profiles must not be
+        changed).
+
+        Returns:
+            AnnualDemand: Heat, hot water and total demand as pandas.Series
+        """
+        if self._annual_demands is None:
+            self._annual_demands = self.__calculate_annual_demands()
+        return self._annual_demands
+
+    def __calculate_annual_demands(self):
+        district_households = list(
+            self.districthouseholds_set.select_related("household")
+        )
+        if not district_households:
+            return AnnualDemand(heat=0.0, hot_water=0.0, total=0.0)
+        households = [dh.household for dh in district_households]
+        amounts = numpy.array([dh.amount for dh in district_households], dtype=float)
+
+        heat_profiles = numpy.vstack(
             [
-                dh.household.annual_total_demand() * dh.amount
-                for dh in self.districthouseholds_set.all()
+                oep_models.OEPTimeseries.get_data(
+                    constants.HouseType[hh.house_type].value
+                )
+                for hh in households
             ]
         )
+        heat_weights = amounts * numpy.array([hh.heat_demand for hh in households])
+        heat = pandas.Series(heat_weights.dot(heat_profiles))
+
+        hot_water_data = oep_models.OEPHotWater.get_data_for_liters(
+            hh.hot_water_liter for hh in households
+        )
+        hot_water_profiles = numpy.vstack(
+            [hot_water_data[hh.hot_water_liter] for hh in households]
+        )
+        hot_water = pandas.Series(amounts.dot(hot_water_profiles))
+
+        return AnnualDemand(heat=heat, hot_water=hot_water, total=heat + hot_water)
+
+    def annual_total_demand(self):
+        """
+        Returns combined annual totol demand (heat and warmwater) for all related
+        households in district"""
+        return self.annual_demands().total
 
     def annual_heat_demand(self):
         """Returns combined annual heat demand for all households in district"""
-        return sum(
-            [
-                dh.household.annual_heat_demand() * dh.amount
-                for dh in self.districthouseholds_set.all()
-            ]
-        )
+        return self.annual_demands().heat
 
     def annual_hot_water_demand(self):
         """Returns combined annual hot water demand for all households in district"""
-        return sum(
-            [
-                dh.household.annual_hot_water_demand() * dh.amount
-                for dh in self.districthouseholds_set.all()
-            ]
-        )
+        return self.annual_demands().hot_water
 
     def contains_radiator(self):
         """Returns `True` if any household in district contains a radiator"""
@@ -6,20 +6,61 @@ But due to OEP-latency, models are migrated to WAM-serverr right now.
 """
 
 import os
-from collections import defaultdict, OrderedDict, ChainMap
-import sqlahelper
-import transaction
+from collections import OrderedDict, ChainMap
+from types import MappingProxyType
+import numpy
+from django.core.cache import cache
 from sqlalchemy import Column, VARCHAR, BIGINT, JSON, INT
 from sqlalchemy.dialects.postgresql import ARRAY, FLOAT
 from sqlalchemy.ext.declarative import declarative_base
 
 from stemp import app_settings
+from stemp.caching import LRUCache
+from stemp.database import session_scope
 
 
 SCHEMA = "sandbox"
 
 Base = declarative_base()
 
+TIMESERIES_CACHE = LRUCache()
+"""
+Process-wide cache for timeseries and hot water profiles
+
+Size of cache is set via STEMP config in app_settings; cache is cleared whenever
+timeseries tables are repopulated (see db_population.queries).
+"""
+
+SCENARIO_PARAMETER_CACHE = LRUCache()
+"""
+Process-wide cache for merged scenario parameters per scenario and demand type
+
+Cache is invalidated whenever scenario parameters are uploaded or deleted (see
+invalidate_scenario_parameters).
+"""
+SCENARIO_PARAMETER_GENERATION_KEY = "stemp_scenario_parameter_generation"
+
+
+def invalidate_scenario_parameters():
+    """
+    Invalidates cached scenario parameters of all processes
+
+    Cache of current process is cleared; other processes notice invalidation via
+    generation counter in django cache, which is part of each cache key.
+    """
+    SCENARIO_PARAMETER_CACHE.clear()
+    try:
+        cache.incr(SCENARIO_PARAMETER_GENERATION_KEY)
+    except ValueError:
+        cache.set(SCENARIO_PARAMETER_GENERATION_KEY, 1, None)
+
+
+def to_readonly_array(data):
+    """Converts timeseries data into (immutable) numpy array"""
+    array = numpy.array(data, dtype=float)
+    array.setflags(write=False)
+    return array
+
 
 class OEPScenario(Base):
     """
@@ -55,9 +96,30 @@ class OEPScenario(Base):
         Scenario parameters are chained with default attributes;
         thus, default parameter values are used as fallback values, if scenario does not
         define special/individual values.
+        Merged parameters are cached per scenario and demand type (see
+        SCENARIO_PARAMETER_CACHE). Each parameter is returned as ChainMap overlay of
+        cached (read-only) parameter; thus, changes (i.e. by dynamic parameters) are
+        only written to overlay and do not alter cache.
         """
-        session = sqlahelper.get_session()
-        with transaction.manager:
+        generation = cache.get_or_set(SCENARIO_PARAMETER_GENERATION_KEY, 0, None)
+        merged_parameters = SCENARIO_PARAMETER_CACHE.get(
+            (generation, scenario_name, demand_type.suffix()),
+            lambda: cls.__load_scenario_parameters(scenario_name, demand_type),
+        )
+        return OrderedDict(
+            (
+                comp,
+                OrderedDict(
+                    (parameter, ChainMap({}, param_dict))
+                    for parameter, param_dict in comp_parameters.items()
+                ),
+            )
+            for comp, comp_parameters in merged_parameters.items()
+        )
+
+    @classmethod
+    def __load_scenario_parameters(cls, scenario_name, demand_type):
+        with session_scope() as session:
             scenario_parameters = (
                 session.query(cls)
                 .filter_by(scenario=f"{scenario_name}_{demand_type.suffix()}")
@@ -72,7 +134,7 @@ class OEPScenario(Base):
 
             # Get secondary attributes:
             description = app_settings.ADDITIONAL_PARAMETERS
-            parameters = defaultdict(OrderedDict)
+            parameters = OrderedDict()
 
             for scenario_parameter in scenario_parameters:
                 item = scenario_parameter.__dict__.copy()
@@ -87,11 +149,9 @@ class OEPScenario(Base):
                         parameter, description.get(parameter, {})
                     ),
                 )
-                parameters[comp][parameter] = param_dict
-
-        # Default factory has to be unset in order to support iterating over
-        # dict in django template:
-        parameters.default_factory = None
+                parameters.setdefault(comp, OrderedDict())[parameter] = (
+                    MappingProxyType(dict(param_dict))
+                )
         return parameters
 
 
@@ -105,19 +165,124 @@ class OEPTimeseries(Base):
     meta_data = Column(JSON)
     data = Column(ARRAY(FLOAT))
 
+    @classmethod
+    def get_data(cls, name):
+        """
+        Returns timeseries for given name
+
+        Timeseries is loaded from DB only once per process and read from
+        TIMESERIES_CACHE afterwards.
+
+        Returns
+        -------
+        numpy.ndarray
+            Read-only array of timeseries
+        """
+        return TIMESERIES_CACHE.get(
+            (cls.__tablename__, name), lambda: cls.__load_data(name)
+        )
+
+    @classmethod
+    def __load_data(cls, name):
+        with session_scope() as session:
+            timeseries = session.query(cls).filter_by(name=name).first()
+            if timeseries is None:
+                raise KeyError(f'No timeseries found for name "{name}"')
+            return to_readonly_array(timeseries.data)
+
 
 temp_meta_file = os.path.join(
     os.path.dirname(__file__), "metadata", "coastdat_temp.json"
 )
-with open(temp_meta_file) as meta_file:
-    dhw_meta = meta_file.read()
+
+
+def get_dhw_meta():
+    """
+    Returns metadata of hot water table
+
+    Metadata is only needed as table comment when creating table (see
+    db_population.queries.create_oep_tables); thus, it is not read at startup.
+    """
+    with open(temp_meta_file) as meta_file:
+        return meta_file.read()
 
 
 class OEPHotWater(Base):
     """Model to hold hot water timeseries related to given liter"""
     __tablename__ = "kopernikus_warmwasser"
-    __table_args__ = {"schema": SCHEMA, "comment": dhw_meta}
+    __table_args__ = {"schema": SCHEMA}
 
     id = Column(BIGINT, primary_key=True)
     liter = Column(INT)
     data = Column(ARRAY(FLOAT))
+
+    @classmethod
+    def get_data(cls, liter):
+        """
+        Returns hot water profile for given liter
+
+        Profile is loaded from DB only once per process and read from
+        TIMESERIES_CACHE afterwards.
+
+        Returns
+        -------
+        numpy.ndarray
+            Read-only array of hot water profile
+        """
+        return TIMESERIES_CACHE.get(
+            (cls.__tablename__, liter), lambda: cls.__load_data(liter)
+        )
+
+    @classmethod
+    def get_data_for_liters(cls, liters):
+        """
+        Returns hot water profiles for multiple liters at once
+
+        All profiles which are not cached yet are fetched within one query.
+
+        Parameters
+        ----------
+        liters : iterable of int
+            Liters to get hot water profiles for
+
+        Returns
+        -------
+        dict
+            Read-only array of hot water profile for each liter
+        """
+        profiles = {}
+        missing = set()
+        for liter in set(liters):
+            if (cls.__tablename__, liter) in TIMESERIES_CACHE:
+                profiles[liter] = cls.get_data(liter)
+            else:
+                missing.add(liter)
+        if not missing:
+            return profiles
+
+        with session_scope() as session:
+            hot_water_profiles = (
+                session.query(cls).filter(cls.liter.in_(missing)).order_by(cls.id).all()
+            )
+            for hot_water in hot_water_profiles:
+                if hot_water.liter in profiles:
+                    continue
+                profiles[hot_water.liter] = to_readonly_array(hot_water.data)
+                TIMESERIES_CACHE.set(
+                    (cls.__tablename__, hot_water.liter), profiles[hot_water.liter]
+                )
+        not_found = missing - profiles.keys()
+        if not_found:
+            raise KeyError(
+                f"No hot water profile found for liter="
+                f"{','.join(map(str, sorted(not_found)))}"
+            )
+        return profiles
+
+    @classmethod
+    def __load_data(cls, liter):
+        with session_scope() as session:
+            hot_water = session.query(cls).filter_by(liter=liter).first()
+            if hot_water is None:
+                raise KeyError(f"No hot water profile found for liter={liter}")
+            return to_readonly_array(hot_water.data)
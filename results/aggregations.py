@@ -9,14 +9,52 @@ from oemof.solph import analyzer as an
 from stemp.results import analyzer as stemp_an
 from stemp.app_settings import SCENARIO_PARAMETERS
 
+SUMMARY_VERSION = 1
+"""Version of simulation summaries; must be increased if summary data changes"""
+SUMMARY_VERSION_KEY = "version"
+
 
 class Aggregation(ABC):
     """Baseclass to group and label multiple oemof analyses into one dataframe"""
 
     name = "Aggregation"
     analyzer = None
+    summary_key = None
+    """Key to persist aggregation data in simulation summary (None: not persisted)"""
+
+    def has_summary(self, result):
+        """
+        Returns True, if aggregation data of given result is persisted in summary
+
+        Summaries of another summary version (see SUMMARY_VERSION) are ignored.
+        """
+        return (
+            self.summary_key is not None
+            and result.summary is not None
+            and result.summary.get(SUMMARY_VERSION_KEY) == SUMMARY_VERSION
+            and self.summary_key in result.summary
+        )
+
+    def summarize(self, result):
+        """
+        Returns (JSON-serializable) aggregation data of given analyzed result
+
+        Data is returned as list of label-value pairs, as order of keys is not
+        preserved by JSON field of simulation summary.
+        """
+        return [
+            [label, None if value is None else float(value)]
+            for label, value in self._analyze(result).items()
+        ]
 
     def _get_data(self, result):
+        if self.has_summary(result):
+            return OrderedDict(
+                (label, value) for label, value in result.summary[self.summary_key]
+            )
+        return self._analyze(result)
+
+    def _analyze(self, result):
         data = result.analysis.get_analyzer(self.analyzer).result
         return self._set_label(data, result)
 
@@ -57,8 +95,9 @@ class LCOEAggregation(Aggregation):
     """
     name = "LCOE"
     analyzer = stemp_an.LCOEAutomatedDemandAnalyzer
+    summary_key = "lcoe"
 
-    def _get_data(self, result):
+    def _analyze(self, result):
         data = result.analysis.get_analyzer(self.analyzer).result
         filtered_data = defaultdict(float)
         for k, v in data.items():
@@ -82,28 +121,36 @@ class TechnologieComparison(Aggregation):
     analyzer = OrderedDict(
         [
             ("Wärmekosten", stemp_an.LCOEAutomatedDemandAnalyzer),
-            ("Investitionskosten", stemp_an.TotalInvestmentAnalyzer),
-            ("CO2 Emissionen", stemp_an.CO2Analyzer),
-            ("Brennstoffkosten", stemp_an.FossilCostsAnalyzer),
+            ("Investitionskosten", stemp_an.VectorizedTotalInvestmentAnalyzer),
+            ("CO2 Emissionen", stemp_an.VectorizedCO2Analyzer),
+            ("Brennstoffkosten", stemp_an.VectorizedFossilCostsAnalyzer),
         ]
     )
+    summary_key = "tech"
+
+    def _analyze(self, result):
+        # Add data from analyzers:
+        data = OrderedDict(
+            (category, result.analysis.get_analyzer(analyzer).total)
+            for category, analyzer in self.analyzer.items()
+        )
+
+        # Add primary energy:
+        pe = result.scenario.Scenario.calculate_primary_factor_and_energy(
+            result.analysis.param_results,
+            result.analysis.get_analyzer(an.NodeBalanceAnalyzer),
+            result.node_index,
+        )
+        data["Primärenergiefaktor"] = pe.factor
+        data["Primärenergie"] = pe.energy
+        return data
 
     def aggregate(self, results):
         df = pandas.DataFrame()
         for result in results:
             series = pandas.Series(name=self._get_result_label(result))
-
-            # Add data from analyzers:
-            for category, analyzer in self.analyzer.items():
-                series[category] = result.analysis.get_analyzer(analyzer).total
-
-            # Add primary energy:
-            pe = result.scenario.Scenario.calculate_primary_factor_and_energy(
-                result.analysis.param_results,
-                result.analysis.get_analyzer(an.NodeBalanceAnalyzer),
-            )
-            series["Primärenergiefaktor"] = pe.factor
-            series["Primärenergie"] = pe.energy
+            for category, value in self._get_data(result).items():
+                series[category] = value
 
             # Add pros and cons:
             labels = SCENARIO_PARAMETERS[result.scenario.Scenario.name.lower()][
@@ -141,3 +188,7 @@ class TechnologieComparison(Aggregation):
         ]
 
         return df.transpose()
+
+
+SUMMARY_AGGREGATIONS = (LCOEAggregation, TechnologieComparison)
+"""Aggregations whose data is persisted as simulation summary at simulation time"""
@@ -1,106 +1,172 @@
 """Additional analyzers to calculate results from oemof"""
+import numpy
 from oemof.solph import analyzer as an
 
+from stemp.scenarios.basic_setup import NodeIndex
+
+OEMOF_REQUIRED_VARIABLES = {
+    "SequenceFlowSumAnalyzer": ("flow",),
+    "NodeBalanceAnalyzer": ("flow",),
+    "BusBalanceAnalyzer": ("flow",),
+    "VariableCostAnalyzer": ("flow",),
+    "SizeAnalyzer": ("invest",),
+    "InvestAnalyzer": ("invest",),
+    "LCOEAnalyzer": (),
+}
+"""Result variables needed by oemof analyzers (by analyzer name)"""
 
-class TotalInvestmentAnalyzer(an.Analyzer):
-    """
-    Calculates total investment costs for whole system
 
-    total_invest = capex * size
+def get_required_variables(analyzers):
     """
-    requires = ("results", "param_results")
-    depends_on = (an.SizeAnalyzer,)
+    Returns names of result variables needed by given analyzers
 
-    def analyze(self, *args):
-        super(TotalInvestmentAnalyzer, self).analyze(*args)
-        seq_result = self._get_dep_result(an.SizeAnalyzer)
-        try:
-            psc = self.psc(args)
-            size = seq_result[args]
-            invest = psc["investment_capex"]
-        except KeyError:
-            return
-        result = invest * size
-        self.result[args] = result
-        self.total += result
+    Analyzers declare needed variables via attribute "required_variables"; for
+    oemof analyzers, OEMOF_REQUIRED_VARIABLES is used. Analyzers which do not
+    require results at all need no variables.
 
+    Returns
+    -------
+    set
+        Names of needed variables (None, if any analyzer needs unknown variables)
+    """
+    variables = set()
+    for analyzer in analyzers:
+        required = getattr(
+            analyzer,
+            "required_variables",
+            OEMOF_REQUIRED_VARIABLES.get(analyzer.__name__),
+        )
+        if required is None:
+            if "results" in getattr(analyzer, "requires", ("results",)):
+                return None
+            required = ()
+        variables.update(required)
+    return variables
 
-class CO2Analyzer(an.Analyzer):
+
+class LCOEAutomatedDemandAnalyzer(an.LCOEAnalyzer):
     """
-    Calculates proportional CO2 emission for each component
+    Calculates LCOE for each component
 
-    co2_emission_prop = CO2_emission * (flow_component / total_demand)
+    In advance to LCOEAnalyzer, demand is automatically calculated by adding up
+    components tagged as "demand".
     """
-    requires = ("results", "param_results")
-    depends_on_former = (an.NodeBalanceAnalyzer,)
+    required_variables = ()
 
     def __init__(self):
-        super(CO2Analyzer, self).__init__()
-        self.demand = 0.0
+        super(LCOEAutomatedDemandAnalyzer, self).__init__([])
 
     def init_analyzer(self):
-        nb_result = self._get_dep_result(an.NodeBalanceAnalyzer)
         # Find all demands:
-        for node, node_balance in nb_result.items():
-            try:
-                if node.tags is not None and "demand" in node.tags:
-                    self.demand += sum(node_balance["input"].values())
-            except AttributeError:
-                pass
+        node_index = getattr(self.analysis, "node_index", None)
+        if node_index is None:
+            node_index = NodeIndex(self.analysis.param_results)
+        self.load_sinks.extend(node_index.get_by_tag("demand"))
+        super(LCOEAutomatedDemandAnalyzer, self).init_analyzer()
+
+
+class VectorizedAnalyzer(an.Analyzer):
+    """
+    Base class for analyzers which calculate results of all flows at once
+
+    Results are calculated within "init_analyzer" from (complete) results of former
+    analyzers; thus, nothing has to be done per flow. Values of all flows are gathered
+    into aligned arrays and calculated via array operations.
+    """
+    required_variables = ()
 
     def analyze(self, *args):
-        super(CO2Analyzer, self).analyze(*args)
-        seq_result = self._get_dep_result(an.SequenceFlowSumAnalyzer)
+        pass
+
+    def _get_scalars(self, args):
         try:
-            psc = self.psc(args)
-            flow = seq_result[args]
-            co2 = psc["co2_emissions"]
+            return self.analysis.param_results[args]["scalars"]
         except KeyError:
-            return
-        result = co2 * flow / self.demand
-        self.result[args] = result
-        self.total += result
+            return {}
 
+    def _set_result(self, keys, values):
+        """Sets result per flow and total (summed up in order of flows)"""
+        self.result = dict(zip(keys, values.tolist()))
+        if len(values) > 0:
+            # Cumulative sum adds up sequentially, as non-vectorized analyzers do:
+            self.total += values.cumsum()[-1]
 
-class LCOEAutomatedDemandAnalyzer(an.LCOEAnalyzer):
+
+class VectorizedTotalInvestmentAnalyzer(VectorizedAnalyzer):
     """
-    Calculates LCOE for each component
+    Calculates total investment costs for whole system (vectorized)
 
-    In advance to LCOEAnalyzer, demand is automatically calculated by adding up
-    components tagged as "demand".
+    Replaces former (per flow) TotalInvestmentAnalyzer with same results (see
+    tests/test_analyzer.py).
     """
-    def __init__(self):
-        super(LCOEAutomatedDemandAnalyzer, self).__init__([])
+    requires = ("results", "param_results")
+    depends_on_former = (an.SizeAnalyzer,)
 
     def init_analyzer(self):
-        # Find all demands:
-        for nodes in self.analysis.param_results:
-            try:
-                if nodes[1].tags is not None and "demand" in nodes[1].tags:
-                    self.load_sinks.append(nodes[1])
-            except AttributeError:
-                pass
-        super(LCOEAutomatedDemandAnalyzer, self).init_analyzer()
+        size_result = self._get_dep_result(an.SizeAnalyzer)
+        keys, sizes, capex = [], [], []
+        for args, size in size_result.items():
+            scalars = self._get_scalars(args)
+            if "investment_capex" in scalars:
+                keys.append(args)
+                sizes.append(size)
+                capex.append(scalars["investment_capex"])
+        self._set_result(
+            keys, numpy.array(capex, dtype=float) * numpy.array(sizes, dtype=float)
+        )
+
+
+class VectorizedCO2Analyzer(VectorizedAnalyzer):
+    """
+    Calculates proportional CO2 emission for each component (vectorized)
 
+    Replaces former (per flow) CO2Analyzer with same results (see
+    tests/test_analyzer.py).
+    """
+    requires = ("results", "param_results")
+    depends_on_former = (an.NodeBalanceAnalyzer, an.SequenceFlowSumAnalyzer)
 
-class FossilCostsAnalyzer(an.Analyzer):
+    def __init__(self):
+        super(VectorizedCO2Analyzer, self).__init__()
+        self.demand = 0.0
+
+    def init_analyzer(self):
+        nb_result = self._get_dep_result(an.NodeBalanceAnalyzer)
+        for node, node_balance in nb_result.items():
+            if "demand" in (getattr(node, "tags", None) or ()):
+                self.demand += sum(node_balance["input"].values())
+
+        seq_result = self._get_dep_result(an.SequenceFlowSumAnalyzer)
+        keys, flows, co2 = [], [], []
+        for args, flow in seq_result.items():
+            scalars = self._get_scalars(args)
+            if "co2_emissions" in scalars:
+                keys.append(args)
+                flows.append(flow)
+                co2.append(scalars["co2_emissions"])
+        self._set_result(
+            keys,
+            numpy.array(co2, dtype=float)
+            * numpy.array(flows, dtype=float)
+            / self.demand,
+        )
+
+
+class VectorizedFossilCostsAnalyzer(VectorizedAnalyzer):
     """
-    Calculates "Brennstoffkosten" for each component/system
+    Calculates "Brennstoffkosten" for each component/system (vectorized)
 
-    All variable costs of components marked as "fossil" are summed up.
+    Replaces former (per flow) FossilCostsAnalyzer with same results (see
+    tests/test_analyzer.py).
     """
-    depends_on = (an.VariableCostAnalyzer,)
+    depends_on_former = (an.VariableCostAnalyzer,)
 
-    def analyze(self, *args):
-        super(FossilCostsAnalyzer, self).analyze(*args)
+    def init_analyzer(self):
         vc_result = self._get_dep_result(an.VariableCostAnalyzer)
-        try:
-            psc = self.psc(args)
-            if psc["is_fossil"]:
-                result = vc_result[args]
-            else:
-                return
-        except KeyError:
-            return
-        self.result[args] = result
-        self.total += result
+        keys, costs = [], []
+        for args, variable_costs in vc_result.items():
+            scalars = self._get_scalars(args)
+            if "is_fossil" in scalars and scalars["is_fossil"]:
+                keys.append(args)
+                costs.append(variable_costs)
+        self._set_result(keys, numpy.array(costs, dtype=float))
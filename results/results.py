@@ -1,36 +1,334 @@
 """Module to start analyzing oemof results"""
 
-import sqlahelper
+import ast
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
+import pandas
+from django.core.cache import caches
 
 from oemof.solph import analyzer as an
-from db_apps.oemof_results import restore_results
+from db_apps.oemof_results import OemofInputResult, OemofScalar, OemofSequence
 
-from stemp.app_settings import SCENARIO_MODULES
+from stemp.app_settings import (
+    SCENARIO_MODULES,
+    RESULT_PAGE_CACHE,
+    RESULT_PAGE_CACHE_TIMEOUT,
+    RESULT_PAGE_CACHE_VERSION,
+    ANALYSIS_POOL_SIZE,
+    RESULT_EXTRACTION,
+)
 from stemp.scenarios import basic_setup
 from stemp.models import Simulation
-from stemp.results.aggregations import Aggregation
+from stemp.results.aggregations import (
+    Aggregation,
+    SUMMARY_AGGREGATIONS,
+    SUMMARY_VERSION,
+    SUMMARY_VERSION_KEY,
+)
+from stemp.results import analyzer as stemp_an
+from stemp.results import sequence_store
+from stemp.database import session_scope
+
+RESULT_PAGE_VERSION = 1
+"""Version of result page rendering; must be increased if rendering changes"""
+RESULT_PAGE_GENERATION_KEY = "stemp_result_page_generation"
 
 
 class SimulationResultNotFound(Exception):
-    pass
+    def __init__(self, result_ids):
+        super(SimulationResultNotFound, self).__init__(
+            "Simulation result "
+            + ", ".join(f"#{result_id}" for result_id in result_ids)
+            + " not found"
+        )
+        self.result_ids = result_ids
 
 
 class Result(object):
     """Dataclass to hold oemof result and analysis which shall be done"""
-    def __init__(self, result_id):
+    def __init__(self, result_id, scenario, summary=None):
         self.result_id = result_id
-        self.scenario = self.__init_scenario(result_id)
+        self.scenario = scenario
+        self.summary = summary
         self.data = None
         self.analysis: an.Analysis = None
+        self.__node_index = None
 
-    @staticmethod
-    def __init_scenario(result_id):
+    @property
+    def node_index(self):
+        """Index of nodes by name, type and tag (built once per restored result)"""
+        if self.__node_index is None:
+            self.__node_index = basic_setup.NodeIndex(self.data[0])
+        return self.__node_index
+
+
+def _restore_label(label, advanced_label):
+    """Restores node label (stored as str) as advanced label, if possible"""
+    if label is None or label == "None":
+        return None
+    try:
+        call = ast.parse(label, mode="eval").body
+    except SyntaxError:
+        return label
+    if (
+        isinstance(call, ast.Call)
+        and isinstance(call.func, ast.Name)
+        and call.func.id == advanced_label.__name__
+    ):
+        return advanced_label(
+            *map(ast.literal_eval, call.args),
+            **{
+                keyword.arg: ast.literal_eval(keyword.value)
+                for keyword in call.keywords
+            },
+        )
+    return label
+
+
+SCALAR_TYPES = {
+    "int": int,
+    "int32": int,
+    "int64": int,
+    "float": float,
+    "float32": float,
+    "float64": float,
+    "bool": lambda value: value == "True",
+    "bool_": lambda value: value == "True",
+}
+"""Conversion of scalar values (stored as str) by stored type name"""
+
+
+def _restore_value(value, value_type):
+    """Restores scalar value (stored as str); values of unknown types stay str"""
+    if value_type == "NoneType" or value == "None":
+        return None
+    return SCALAR_TYPES.get(value_type, str)(value)
+
+
+def restore_results_bulk(session, result_ids, advanced_label=basic_setup.AdvancedLabel):
+    """
+    Restores oemof input data and results of all given result IDs
+
+    In contrast to db_apps.oemof_results.restore_results (one result per call), all
+    results are restored with one query per table; rows are split per result
+    afterwards. Restored data must equal data of restore_results with
+    restore_none_type (see tests/test_result_restore.py).
+
+    Returns
+    -------
+    dict
+        Input data and results (as tuple) per result ID; missing IDs are left out
+    """
+    input_results = (
+        session.query(OemofInputResult)
+        .filter(OemofInputResult.input_result_id.in_(result_ids))
+        .all()
+    )
+    data_ids = {}
+    for input_result in input_results:
+        data_ids[input_result.input_id] = (input_result.input_result_id, 0)
+        data_ids[input_result.result_id] = (input_result.input_result_id, 1)
+
+    restored = {
+        input_result.input_result_id: (
+            defaultdict(lambda: {"scalars": {}, "sequences": {}}),
+            defaultdict(lambda: {"scalars": {}, "sequences": {}}),
+        )
+        for input_result in input_results
+    }
+    labels = {}
+
+    def get_values(row):
+        result_id, kind = data_ids[row.data_id]
+        nodes = tuple(
+            labels.setdefault(node, _restore_label(node, advanced_label))
+            for node in (row.from_node, row.to_node)
+        )
+        return restored[result_id][kind][nodes]
+
+    if data_ids:
+        for scalar in session.query(OemofScalar).filter(
+            OemofScalar.data_id.in_(data_ids)
+        ):
+            get_values(scalar)["scalars"][scalar.attribute] = _restore_value(
+                scalar.value, scalar.type
+            )
+        for sequence in session.query(OemofSequence).filter(
+            OemofSequence.data_id.in_(data_ids)
+        ):
+            get_values(sequence)["sequences"][sequence.attribute] = (
+                pandas.Series(sequence.value)
+                if sequence.type == "series"
+                else sequence.value
+            )
+
+    return {
+        result_id: tuple(
+            {
+                nodes: {
+                    "scalars": pandas.Series(values["scalars"]),
+                    "sequences": pandas.DataFrame(values["sequences"]),
+                }
+                for nodes, values in data.items()
+            }
+            for data in kinds
+        )
+        for result_id, kinds in restored.items()
+    }
+
+
+def apply_minimum_size(result):
+    """Sets minimum sizes for each component in result if given"""
+    for nodes, values in result.data[1].items():
         try:
-            sim = Simulation.objects.get(result_id=result_id)
-        except Simulation.DoesNotExist:
-            raise SimulationResultNotFound(f"Simulation result #{result_id} not found")
-        return SCENARIO_MODULES[sim.scenario.name]
+            min_size = result.data[0][nodes]["scalars"]["min_size"]
+        except KeyError:
+            pass
+        else:
+            if "invest" in values["scalars"]:
+                values["scalars"]["invest"] = max(values["scalars"]["invest"], min_size)
+
+
+def plan_analyzers(aggregations):
+    """
+    Returns all analyzers needed by given aggregations in order of dependencies
+
+    Analyzers of all aggregations and their dependencies ("depends_on" and
+    "depends_on_former") are merged into one dependency graph; each analyzer is
+    returned only once and after all of its dependencies.
+
+    Raises
+    ------
+    ValueError
+        If analyzer dependencies are cyclic
+    """
+    planned = []
+
+    def add_analyzer(analyzer, path):
+        if analyzer in planned:
+            return
+        if analyzer in path:
+            raise ValueError(f"Cyclic dependency of analyzer {analyzer.__name__}")
+        for dependency in getattr(analyzer, "depends_on", ()) + getattr(
+            analyzer, "depends_on_former", ()
+        ):
+            add_analyzer(dependency, path + (analyzer,))
+        planned.append(analyzer)
+
+    for aggregation in aggregations:
+        if isinstance(aggregation.analyzer, dict):
+            analyzers = aggregation.analyzer.values()
+        else:
+            analyzers = [aggregation.analyzer]
+        for analyzer in analyzers:
+            add_analyzer(analyzer, ())
+    return planned
+
+
+def analyze(result, analyzers):
+    """
+    Runs analysis of result
+
+    First, given analyzers (see plan_analyzers) are added to analysis.
+    Afterwards analysis is run. Node index of result is attached to analysis in
+    order to look up nodes within analyzers.
+    """
+    result.analysis = an.Analysis(result.data[1], result.data[0])
+    result.analysis.node_index = result.node_index
+    for analyzer in analyzers:
+        result.analysis.add_analyzer(analyzer())
+    result.analysis.analyze()
+
+
+def get_result_variables():
+    """
+    Returns names of variables to extract from solved models
+
+    Variables are collected from all analyzers needed by summary aggregations
+    (see analyzer.get_required_variables), as result page is built from those.
+    Returns None (all variables are extracted), if RESULT_EXTRACTION is set to
+    "full" or if any analyzer needs unknown variables.
+    """
+    if RESULT_EXTRACTION == "full":
+        return None
+    return stemp_an.get_required_variables(plan_analyzers(SUMMARY_AGGREGATIONS))
+
+
+def get_simulated_result(scenario_name, energysystem, results, param_results):
+    """
+    Returns result (not analyzed yet) of given simulation without restoring it
+
+    Node labels are restored from energysystem and minimum sizes are applied, as
+    done for results restored from database.
+
+    Parameters
+    ----------
+    scenario_name : str
+        Name of scenario module
+    energysystem : oemof.solph.EnergySystem
+        Simulated energysystem (needed to restore node labels)
+    results : dict
+        Oemof results (with str-keys)
+    param_results : dict
+        Oemof input parameters (with str-keys)
+
+    Returns
+    -------
+    Result
+        Result without result ID
+    """
+    labels = {str(node.label): node.label for node in energysystem.nodes}
+    result = Result(None, SCENARIO_MODULES[scenario_name])
+    result.data = tuple(
+        {
+            tuple(labels.get(node) for node in nodes): {
+                "scalars": values["scalars"].copy(),
+                "sequences": values["sequences"],
+            }
+            for nodes, values in data.items()
+        }
+        for data in (param_results, results)
+    )
+    apply_minimum_size(result)
+    return result
+
+
+def summarize_results(scenario_name, energysystem, results, param_results):
+    """
+    Returns summary of given simulation results
+
+    All summary aggregations (see aggregations.SUMMARY_AGGREGATIONS) are analyzed
+    and their (scalar) data is returned; thus, result page can be built from summary
+    without restoring and analyzing full results.
+
+    Parameters
+    ----------
+    scenario_name : str
+        Name of scenario module
+    energysystem : oemof.solph.EnergySystem
+        Simulated energysystem (needed to restore node labels)
+    results : dict
+        Oemof results (with str-keys)
+    param_results : dict
+        Oemof input parameters (with str-keys)
+
+    Returns
+    -------
+    dict
+        Summary data (label-value pairs) per aggregation summary key and summary
+        version (see aggregations.SUMMARY_VERSION)
+    """
+    result = get_simulated_result(scenario_name, energysystem, results, param_results)
+    aggregations = [aggregation() for aggregation in SUMMARY_AGGREGATIONS]
+    analyze(result, plan_analyzers(aggregations))
+    summary = {
+        aggregation.summary_key: aggregation.summarize(result)
+        for aggregation in aggregations
+    }
+    summary[SUMMARY_VERSION_KEY] = SUMMARY_VERSION
+    return summary
 
 
 class ResultAggregations(object):
@@ -39,63 +337,159 @@ class ResultAggregations(object):
 
     Following steps are made:
 
-    #. List of all results is set up.
+    #. List of all results is set up (scenarios of all results are looked up within
+       one query).
     #. Within the list, Results class is used to store results ID.
-    #. All results are loaded from database.
-    #. For each component in each result, a minimum size is adapted if given.
-    #. For each result related analysis is done.
-    #. Afterwards aggregated results can be accessed via "aggregate" method.
+    #. All results without (complete) summary are loaded from database.
+    #. For each component in each of those results, a minimum size is adapted if
+       given.
+    #. For each of those results related analysis is done; all analyzers needed by
+       aggregations are run once per result and results are analyzed in parallel.
+    #. Afterwards aggregated results can be accessed via "aggregate" method
+       (aggregations use summary data, if available).
     """
     def __init__(self, result_ids: List[int], aggregations: Dict[str, Aggregation]):
-        self.results = [Result(result_id) for result_id in result_ids]
+        self.results = self.__init_results(result_ids)
         self.aggregations = aggregations
+        self.results_to_analyze = [
+            result
+            for result in self.results
+            if not all(
+                aggregation.has_summary(result)
+                for aggregation in self.aggregations.values()
+            )
+        ]
         self.init_scenarios()
         self.apply_minimum_size()
         self.analyze()
 
+    @staticmethod
+    def __init_results(result_ids):
+        """
+        Sets up results for all result IDs
+
+        Raises
+        ------
+        SimulationResultNotFound
+            If any result ID has no related simulation
+        """
+        simulations = {
+            result_id: (scenario_name, summary)
+            for result_id, scenario_name, summary in Simulation.objects.filter(
+                result_id__in=result_ids
+            ).values_list("result_id", "scenario__name", "summary")
+        }
+        results_not_found = [
+            result_id for result_id in result_ids if result_id not in simulations
+        ]
+        if len(results_not_found) > 0:
+            raise SimulationResultNotFound(results_not_found)
+        return [
+            Result(
+                result_id,
+                SCENARIO_MODULES[simulations[result_id][0]],
+                simulations[result_id][1],
+            )
+            for result_id in result_ids
+        ]
+
     def init_scenarios(self):
-        """Gets results from database for each result ID"""
-        sa_session = sqlahelper.get_session()
-        for result in self.results:
-            result.data = restore_results(
-                sa_session,
-                result.result_id,
-                restore_none_type=True,
-                advanced_label=basic_setup.AdvancedLabel,
+        """
+        Gets results from database for all result IDs at once
+
+        All results are restored with one query per table (see
+        restore_results_bulk). If sequences of a result are stored in sequence
+        store, they are attached lazily; thus, only sequences which are needed by
+        analyzers are loaded.
+
+        Raises
+        ------
+        SimulationResultNotFound
+            If oemof results of any result ID are missing in result database
+        """
+        if len(self.results_to_analyze) == 0:
+            return
+        with session_scope(transactional=False) as sa_session:
+            restored = restore_results_bulk(
+                sa_session, [result.result_id for result in self.results_to_analyze]
             )
-        sa_session.close()
+        missing = [
+            result.result_id
+            for result in self.results_to_analyze
+            if result.result_id not in restored
+        ]
+        if len(missing) > 0:
+            raise SimulationResultNotFound(missing)
+        for result in self.results_to_analyze:
+            result.data = restored[result.result_id]
+            if sequence_store.has_sequences(result.result_id):
+                result.data = sequence_store.attach_sequences(
+                    result.result_id, result.data
+                )
 
     def apply_minimum_size(self):
         """Sets minimum sizes for each component in each result if given"""
-        for result in self.results:
-            for nodes, values in result.data[1].items():
-                try:
-                    min_size = result.data[0][nodes]["scalars"]["min_size"]
-                except KeyError:
-                    pass
-                else:
-                    if "invest" in values["scalars"]:
-                        values["scalars"]["invest"] = max(
-                            values["scalars"]["invest"], min_size
-                        )
+        for result in self.results_to_analyze:
+            apply_minimum_size(result)
 
     def analyze(self):
-        """
-        Runs all analysis in each result
-
-        First, all needed analyzers to perform each aggregation are added to analysis.
-        Afterwards analysis is run.
-        """
-        for result in self.results:
-            result.analysis = an.Analysis(result.data[1], result.data[0])
-            for aggregation in self.aggregations.values():
-                if isinstance(aggregation.analyzer, dict):
-                    for analyzer in aggregation.analyzer.values():
-                        result.analysis.add_analyzer(analyzer())
-                else:
-                    result.analysis.add_analyzer(aggregation.analyzer())
-            result.analysis.analyze()
+        """Runs all analysis in each result (see analyze) within thread pool"""
+        if len(self.results_to_analyze) == 0:
+            return
+        analyzers = plan_analyzers(self.aggregations.values())
+        with ThreadPoolExecutor(
+            max_workers=max(min(ANALYSIS_POOL_SIZE, len(self.results_to_analyze)), 1)
+        ) as pool:
+            list(
+                pool.map(
+                    lambda result: analyze(result, analyzers), self.results_to_analyze
+                )
+            )
 
     def aggregate(self, name):
         """Returns aggregation results for given aggregation name"""
         return self.aggregations[name].aggregate(self.results)
+
+
+class ResultPageCache(object):
+    """
+    Cache for rendered result pages
+
+    As stored results do not change, rendered result pages are cached per set of
+    result IDs (sorted) within django cache RESULT_PAGE_CACHE (eviction is done by
+    cache backend). Cache entries are versioned by RESULT_PAGE_VERSION (code) and
+    RESULT_PAGE_CACHE_VERSION (config). Additionally, a generation counter is part of
+    each key, which is increased if stored simulations are deleted (see invalidate).
+    """
+    def __init__(self):
+        self.cache = caches[RESULT_PAGE_CACHE]
+        self.version = f"{RESULT_PAGE_VERSION}.{RESULT_PAGE_CACHE_VERSION}"
+
+    def get_key(self, result_ids):
+        """Returns cache key for given result IDs"""
+        generation = self.cache.get_or_set(RESULT_PAGE_GENERATION_KEY, 0, None)
+        ids = ",".join(map(str, sorted(result_ids)))
+        return (
+            f"stemp_result_page_{generation}_"
+            + hashlib.sha1(ids.encode()).hexdigest()
+        )
+
+    def get(self, result_ids):
+        """Returns rendered result page for given result IDs or None if not cached"""
+        return self.cache.get(self.get_key(result_ids), version=self.version)
+
+    def set(self, result_ids, content):
+        """Stores rendered result page for given result IDs"""
+        self.cache.set(
+            self.get_key(result_ids),
+            content,
+            RESULT_PAGE_CACHE_TIMEOUT,
+            version=self.version,
+        )
+
+    def invalidate(self):
+        """Invalidates all cached result pages"""
+        try:
+            self.cache.incr(RESULT_PAGE_GENERATION_KEY)
+        except ValueError:
+            self.cache.set(RESULT_PAGE_GENERATION_KEY, 1, None)
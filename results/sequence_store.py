@@ -0,0 +1,268 @@
+"""
+Column-oriented storage of oemof result sequences
+
+Instead of storing each sequence of oemof results (and input parameters) in result
+database, all sequences of one result are stored as one NumPy matrix file per data
+kind (input/result) in local directory, keyed by result ID. Each sequence (flow
+attribute) is stored as one contiguous row of matrix; thus, files can be read via
+memory-mapping and only sequences which are accessed are actually loaded.
+Scalars are still stored in result database (see tasks.store_results), which also
+provides the result ID.
+
+Storage directory of one result looks like::
+
+    <RESULT_STORE_PATH>/<result_id>/input.npy
+    <RESULT_STORE_PATH>/<result_id>/input.json
+    <RESULT_STORE_PATH>/<result_id>/result.npy
+    <RESULT_STORE_PATH>/<result_id>/result.json
+
+JSON files hold time index and column labels (from node, to node, attribute).
+Files of one result are written into a temporary directory first, which is moved
+to its final path afterwards (see write_data); thus, readers never see partially
+written results.
+
+Note: Results are written by celery workers and read by django; thus,
+RESULT_STORE_PATH must be located on a volume which is shared between web and
+celery containers.
+"""
+
+import os
+import json
+import shutil
+import tempfile
+from collections import defaultdict
+
+import numpy
+import pandas
+
+from stemp.app_settings import RESULT_STORE_PATH
+
+RESULT_KINDS = ("input", "result")
+
+
+def get_result_path(result_id):
+    """Returns storage directory for given result ID"""
+    return os.path.join(RESULT_STORE_PATH, str(result_id))
+
+
+def has_sequences(result_id):
+    """Returns True, if sequences of given result ID are stored in sequence store"""
+    return os.path.exists(
+        os.path.join(get_result_path(result_id), f"{RESULT_KINDS[-1]}.json")
+    )
+
+
+def _node_key(nodes):
+    return tuple(None if node is None else str(node) for node in nodes)
+
+
+def split_sequences(data):
+    """
+    Splits sequences from oemof data
+
+    Only sequences with same length as time index (of first sequence) are split; all
+    other sequences are kept in data.
+
+    Parameters
+    ----------
+    data : dict
+        Oemof results or parameter results
+
+    Returns
+    -------
+    tuple
+        Data without sequences, time index, column labels and sequence matrix
+    """
+    timeindex = None
+    columns = []
+    rows = []
+    stripped = {}
+    for nodes, values in data.items():
+        sequences = pandas.DataFrame(values["sequences"])
+        if timeindex is None and len(sequences) > 0:
+            timeindex = sequences.index
+        if timeindex is None or len(sequences) != len(timeindex):
+            stripped[nodes] = values
+            continue
+        stripped[nodes] = {
+            "scalars": values["scalars"],
+            "sequences": pandas.DataFrame(),
+        }
+        for attribute, series in sequences.items():
+            columns.append([*_node_key(nodes), attribute])
+            rows.append(series.to_numpy(dtype=float))
+    matrix = numpy.vstack(rows) if rows else numpy.empty((0, 0))
+    return stripped, timeindex, columns, matrix
+
+
+def _timeindex_to_json(timeindex):
+    if isinstance(timeindex, pandas.DatetimeIndex) and timeindex.freq is not None:
+        return {
+            "start": timeindex[0].isoformat(),
+            "periods": len(timeindex),
+            "freq": timeindex.freqstr,
+        }
+    if isinstance(timeindex, pandas.DatetimeIndex):
+        return {"values": [timestamp.isoformat() for timestamp in timeindex]}
+    return {"periods": 0 if timeindex is None else len(timeindex)}
+
+
+def _timeindex_from_json(data):
+    if "freq" in data:
+        return pandas.date_range(
+            data["start"], periods=data["periods"], freq=data["freq"]
+        )
+    if "values" in data:
+        return pandas.DatetimeIndex(data["values"])
+    return pandas.RangeIndex(data["periods"])
+
+
+def write_sequences(path, kind, timeindex, columns, matrix):
+    """Writes sequence matrix and related time index and labels into given directory"""
+    numpy.save(os.path.join(path, f"{kind}.npy"), matrix)
+    with open(os.path.join(path, f"{kind}.json"), "w") as meta_file:
+        json.dump(
+            {"timeindex": _timeindex_to_json(timeindex), "columns": columns},
+            meta_file,
+        )
+
+
+def split_data(input_data, result_data):
+    """
+    Splits sequences from oemof input and result data (see split_sequences)
+
+    Returns
+    -------
+    tuple
+        Input and result data without sequences and split sequences (time index,
+        column labels and sequence matrix) per data kind
+    """
+    split = [split_sequences(data) for data in (input_data, result_data)]
+    return (
+        tuple(stripped for stripped, *_ in split),
+        [sequences for _, *sequences in split],
+    )
+
+
+def write_data(result_id, sequences):
+    """
+    Writes split sequences (see split_data) of all data kinds for given result
+
+    Files are written into a temporary directory (within RESULT_STORE_PATH, in order
+    to stay on same file system), which is renamed to storage directory of result
+    afterwards via os.replace.
+    """
+    os.makedirs(RESULT_STORE_PATH, exist_ok=True)
+    temp_path = tempfile.mkdtemp(prefix=f".{result_id}_", dir=RESULT_STORE_PATH)
+    try:
+        for kind, (timeindex, columns, matrix) in zip(RESULT_KINDS, sequences):
+            write_sequences(temp_path, kind, timeindex, columns, matrix)
+        path = get_result_path(result_id)
+        old_path = None
+        if os.path.exists(path):
+            # os.replace cannot replace non-empty directories:
+            old_path = f"{temp_path}_old"
+            os.replace(path, old_path)
+        os.replace(temp_path, path)
+        if old_path is not None:
+            shutil.rmtree(old_path, ignore_errors=True)
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+
+def delete_sequences(result_id=None):
+    """Deletes stored sequences of given result ID (or of all results)"""
+    path = RESULT_STORE_PATH if result_id is None else get_result_path(result_id)
+    shutil.rmtree(path, ignore_errors=True)
+
+
+class ResultSequences(object):
+    """
+    Memory-mapped sequences of one stored result and data kind
+
+    Sequences are read from disk only if sequences of related nodes are requested.
+    """
+    def __init__(self, result_id, kind):
+        path = get_result_path(result_id)
+        with open(os.path.join(path, f"{kind}.json")) as meta_file:
+            meta = json.load(meta_file)
+        self.timeindex = _timeindex_from_json(meta["timeindex"])
+        self.matrix = numpy.load(os.path.join(path, f"{kind}.npy"), mmap_mode="r")
+        self.columns = defaultdict(list)
+        for row, (from_node, to_node, attribute) in enumerate(meta["columns"]):
+            self.columns[from_node, to_node].append((attribute, row))
+
+    def __contains__(self, nodes):
+        return _node_key(nodes) in self.columns
+
+    def get(self, nodes):
+        """Returns sequences of given nodes as dataframe"""
+        columns = self.columns.get(_node_key(nodes), [])
+        rows = [row for _, row in columns]
+        return pandas.DataFrame(
+            numpy.array(self.matrix[rows]).T,
+            index=self.timeindex,
+            columns=[attribute for attribute, _ in columns],
+        )
+
+
+class LazySequenceData(dict):
+    """
+    Oemof data of one component, whose sequences are loaded on first access
+
+    Scalars are available immediately; sequences are loaded from (memory-mapped)
+    sequence store once key "sequences" is accessed.
+    """
+    def __init__(self, values, sequences, nodes):
+        super(LazySequenceData, self).__init__(
+            (key, value) for key, value in values.items() if key != "sequences"
+        )
+        self.__sequences = sequences
+        self.__nodes = nodes
+
+    def __missing__(self, key):
+        if key != "sequences":
+            raise KeyError(key)
+        self[key] = self.__sequences.get(self.__nodes)
+        return self[key]
+
+    def __contains__(self, key):
+        return key == "sequences" or super(LazySequenceData, self).__contains__(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def attach_sequences(result_id, data):
+    """
+    Attaches stored sequences lazily to restored oemof input and result data
+
+    Parameters
+    ----------
+    result_id : int
+        Result ID of restored data
+    data : tuple
+        Oemof input and result data as restored from result database
+
+    Returns
+    -------
+    tuple
+        Input and result data whose sequences are loaded on access
+    """
+    attached = []
+    for kind, kind_data in zip(RESULT_KINDS, data):
+        sequences = ResultSequences(result_id, kind)
+        attached.append(
+            {
+                nodes: (
+                    LazySequenceData(values, sequences, nodes)
+                    if nodes in sequences
+                    else values
+                )
+                for nodes, values in kind_data.items()
+            }
+        )
+    return tuple(attached)
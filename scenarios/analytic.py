@@ -0,0 +1,258 @@
+"""
+Analytic evaluation of primary input scenarios (see basic_setup.PrimaryInputScenario)
+
+Primary input scenarios (i.e. gas, oil, woodchip) consist of one transformer (tagged
+"primary_source") fed by an unbalanced primary bus and supplying a fixed heat demand
+(plus an excess sink without costs). If all costs are non-negative, optimum is known
+without solving an optimization problem: transformer supplies exactly the demand,
+input flow equals demand divided by conversion factor and invested capacity equals
+peak of input flow. (Minimum size is applied afterwards, see
+results.apply_minimum_size, as it is not part of the optimization problem either.)
+
+Results and parameters are returned in the same structure as
+oemof.outputlib.processing returns them for solved models; if energysystem does
+not match the structure above, energysystem is solved via solver instead.
+"""
+
+import logging
+from collections import namedtuple
+
+import numpy
+import pandas
+from oemof import outputlib
+from oemof.solph import Transformer, Sink
+
+from stemp.scenarios.simulation import default_simulate_fct
+from stemp.scenarios.timeseries_aggregation import expand_results
+
+try:
+    from stemp.app_settings import ANALYTIC_EVALUATION
+except KeyError:
+    logging.warning(
+        "Could not find wam settings. "
+        "Maybe you have to start django application first."
+    )
+    ANALYTIC_EVALUATION = "on"
+
+PrimaryInputSetup = namedtuple(
+    "PrimaryInputSetup",
+    ("transformer", "primary_bus", "demand_bus", "demand", "excess_sinks"),
+)
+
+
+class NotAnalyticallySolvable(Exception):
+    """Raised if energysystem does not match structure of primary input scenario"""
+
+
+def _as_array(value, periods):
+    """Returns (oemof) sequence as numpy array"""
+    return numpy.array([value[t] for t in range(periods)], dtype=float)
+
+
+def _has_default_bounds(flow, periods):
+    """Returns True, if flow is only bounded by its investment or fixed value"""
+    return (
+        flow.nonconvex is None
+        and flow.summed_max is None
+        and flow.summed_min is None
+        and (_as_array(flow.min, periods) == 0).all()
+        and (_as_array(flow.max, periods) == 1).all()
+    )
+
+
+def get_primary_input_setup(energysystem):
+    """
+    Returns nodes of primary input scenario
+
+    Raises
+    ------
+    NotAnalyticallySolvable
+        If energysystem does not match structure of primary input scenario or its
+        optimum cannot be found analytically (i.e. due to negative costs or bounds)
+    """
+    periods = len(energysystem.timeindex)
+    transformers = [
+        node
+        for node in energysystem.nodes
+        if isinstance(node, Transformer)
+        and "primary_source" in (getattr(node.label, "tags", None) or ())
+    ]
+    if len(transformers) != 1:
+        raise NotAnalyticallySolvable("Exactly one primary source needed")
+    transformer = transformers[0]
+    if len(transformer.inputs) != 1 or len(transformer.outputs) != 1:
+        raise NotAnalyticallySolvable("Primary source must have one input and output")
+    primary_bus = next(iter(transformer.inputs))
+    demand_bus = next(iter(transformer.outputs))
+    if primary_bus.balanced or len(primary_bus.inputs) > 0:
+        raise NotAnalyticallySolvable("Primary bus must be unbalanced and unfed")
+
+    demands = []
+    excess_sinks = []
+    for node in demand_bus.outputs:
+        flow = demand_bus.outputs[node]
+        if not isinstance(node, Sink) or len(node.outputs) > 0:
+            raise NotAnalyticallySolvable(f"Unexpected component {node.label}")
+        if flow.fixed:
+            demands.append(node)
+        elif flow.investment is None and flow.nominal_value is None:
+            excess_sinks.append(node)
+        else:
+            raise NotAnalyticallySolvable(f"Unexpected sink {node.label}")
+    if len(demands) != 1 or list(demand_bus.inputs) != [transformer]:
+        raise NotAnalyticallySolvable("Demand bus must connect source and one demand")
+
+    input_flow = transformer.inputs[primary_bus]
+    output_flow = transformer.outputs[demand_bus]
+    investment = input_flow.investment
+    if (
+        investment is None
+        or input_flow.nominal_value is not None
+        or output_flow.investment is not None
+        or output_flow.nominal_value is not None
+        or not _has_default_bounds(input_flow, periods)
+        or investment.existing != 0
+        or investment.minimum != 0
+        or investment.ep_costs < 0
+    ):
+        raise NotAnalyticallySolvable("Primary source must be a plain investment")
+    flows = [input_flow, output_flow] + [
+        demand_bus.outputs[node] for node in excess_sinks
+    ]
+    if any((_as_array(flow.variable_costs, periods) < 0).any() for flow in flows):
+        raise NotAnalyticallySolvable("Negative costs found")
+    if len(energysystem.flows()) != len(flows) + 1:
+        raise NotAnalyticallySolvable("Unexpected flows found")
+    return PrimaryInputSetup(
+        transformer, primary_bus, demand_bus, demands[0], excess_sinks
+    )
+
+
+def evaluate_primary_input(energysystem, setup):
+    """
+    Returns optimal results of primary input scenario (without solving)
+
+    Results are structured as returned by oemof.outputlib.processing.results.
+    """
+    timeindex = energysystem.timeindex
+    periods = len(timeindex)
+    demand_flow = setup.demand_bus.outputs[setup.demand]
+    demand = _as_array(demand_flow.actual_value, periods) * demand_flow.nominal_value
+    efficiency = _as_array(
+        setup.transformer.conversion_factors[setup.demand_bus], periods
+    )
+    primary = demand / efficiency
+    investment = setup.transformer.inputs[setup.primary_bus].investment
+    if primary.max() > investment.maximum:
+        raise NotAnalyticallySolvable("Maximum investment is too small")
+
+    def get_result(flow, scalars=None):
+        sequences = pandas.DataFrame({"flow": flow}, index=timeindex)
+        sequences.columns.name = "variable_name"
+        return {
+            "scalars": pandas.Series(scalars or {}, dtype=float),
+            "sequences": sequences,
+        }
+
+    results = {
+        (setup.primary_bus, setup.transformer): get_result(
+            primary, {"invest": primary.max()}
+        ),
+        (setup.transformer, setup.demand_bus): get_result(demand),
+        (setup.demand_bus, setup.demand): get_result(demand),
+    }
+    for excess in setup.excess_sinks:
+        results[setup.demand_bus, excess] = get_result(numpy.zeros(periods))
+    return results
+
+
+def evaluate(energysystem):
+    """
+    Evaluates energysystem analytically
+
+    Like simulation.default_simulate_fct, results are re-expanded if time series
+    have been aggregated and are returned with str-keys.
+
+    Returns
+    -------
+    tuple
+        Oemof results and input parameters
+
+    Raises
+    ------
+    NotAnalyticallySolvable
+        If energysystem cannot be evaluated analytically
+    """
+    results = evaluate_primary_input(
+        energysystem, get_primary_input_setup(energysystem)
+    )
+    param_results = outputlib.processing.parameter_as_dict(
+        energysystem, exclude_none=True
+    )
+    aggregation = getattr(energysystem, "aggregation", None)
+    if aggregation is not None:
+        expand_results(results, aggregation)
+        expand_results(param_results, aggregation)
+    return tuple(
+        map(outputlib.processing.convert_keys_to_strings, (results, param_results))
+    )
+
+
+def compare_results(expected, actual, rtol=1e-6, atol=1e-6):
+    """
+    Compares two oemof results (i.e. from solver and analytic evaluation)
+
+    Returns
+    -------
+    list of str
+        Differences found (empty if results match)
+    """
+    differences = []
+    for nodes in set(expected) ^ set(actual):
+        differences.append(f"Result {nodes} is missing in one result")
+    for nodes in set(expected) & set(actual):
+        for kind in ("scalars", "sequences"):
+            exp = expected[nodes][kind]
+            act = actual[nodes][kind]
+            for attribute in set(exp.keys()) ^ set(act.keys()):
+                differences.append(f"{nodes}: {kind} {attribute} missing")
+            for attribute in set(exp.keys()) & set(act.keys()):
+                if not numpy.allclose(
+                    numpy.asarray(exp[attribute], dtype=float),
+                    numpy.asarray(act[attribute], dtype=float),
+                    rtol=rtol,
+                    atol=atol,
+                ):
+                    differences.append(f"{nodes}: {kind} {attribute} differ")
+    return differences
+
+
+def simulate_primary_input(energysystem, template_key=None, **kwargs):
+    """
+    Simulation function for primary input scenarios (see module description)
+
+    Depending on ANALYTIC_EVALUATION setting, optimum is evaluated analytically
+    ("on"), via solver ("off") or both ("verify"); in verification mode, differences
+    are logged and results from solver are returned.
+    Accepts same keyword arguments as simulation.default_simulate_fct, which are
+    only used if energysystem is solved via solver.
+    """
+    if ANALYTIC_EVALUATION == "off":
+        return default_simulate_fct(energysystem, template_key=template_key, **kwargs)
+    try:
+        results, param_results = evaluate(energysystem)
+    except NotAnalyticallySolvable as error:
+        logging.info(f"Solving energysystem via solver: {error}")
+        return default_simulate_fct(energysystem, template_key=template_key, **kwargs)
+
+    if ANALYTIC_EVALUATION == "verify":
+        solver_results, solver_param_results = default_simulate_fct(
+            energysystem, template_key=template_key, **kwargs
+        )
+        differences = compare_results(solver_results, results)
+        if differences:
+            logging.warning(
+                "Analytic evaluation differs from solver:\n" + "\n".join(differences)
+            )
+        return solver_results, solver_param_results
+    return results, param_results
@@ -1,17 +1,16 @@
 """Holds (abstract) basic scenarios to init default demand, busses etc."""
 
-import sqlahelper
-import transaction
 import pandas
 import logging
-from collections import namedtuple
+from collections import namedtuple, defaultdict
 from abc import ABC, abstractmethod
 
 from oemof.solph import EnergySystem, Bus, Flow, Sink
 
 from stemp import app_settings
 from stemp import constants
-from stemp.oep_models import OEPScenario
+from stemp.database import session_scope
+from stemp.oep_models import OEPScenario, invalidate_scenario_parameters
 from stemp.models import District, Household
 
 
@@ -21,25 +20,63 @@ AdvancedLabel.__new__.__defaults__ = (None,)
 pe = namedtuple("PrimaryEnergy", ("energy", "factor"))
 
 
+class NodeIndex(object):
+    """
+    Index of nodes (advanced labels) of restored results by name, type and tag
+
+    Index is built once per result from keys of parameter results; afterwards, nodes
+    can be looked up in constant time instead of scanning all keys.
+    """
+    def __init__(self, param_results):
+        self.by_name = {}
+        self.by_type = defaultdict(list)
+        self.by_tag = defaultdict(list)
+        for nodes in param_results:
+            for node in nodes:
+                if node is None or node.name in self.by_name:
+                    continue
+                self.by_name[node.name] = node
+                self.by_type[node.type].append(node)
+                for tag in node.tags or ():
+                    self.by_tag[tag].append(node)
+
+    def get(self, name):
+        """Returns node with given name"""
+        return self.by_name[name]
+
+    def get_by_type(self, node_type):
+        """Returns all nodes of given type"""
+        return self.by_type.get(node_type, [])
+
+    def get_by_tag(self, tag):
+        """Returns all nodes tagged with given tag"""
+        return self.by_tag.get(tag, [])
+
+
 def upload_scenario_parameters():
     """Scenario parameters for all scenarios are be uploaded to database"""
-    session = sqlahelper.get_session()
     for sc_parameters in app_settings.SCENARIO_PARAMETERS.values():
         for sc_setup in sc_parameters["SETUPS"]:
-            if session.query(OEPScenario).filter_by(scenario=sc_setup).first() is None:
-                scenarios = [
-                    OEPScenario(
-                        scenario=sc_setup,
-                        component=com,
-                        parameter=parameter_name,
-                        **parameter_data,
-                    )
-                    for com, parameters in sc_parameters["SETUPS"][sc_setup].items()
-                    for parameter_name, parameter_data in parameters.items()
-                ]
-                with transaction.manager:
-                    session.add_all(scenarios)
-                logging.info(f"Scenario upload: {sc_setup} done.")
+            with session_scope() as session:
+                query = session.query(OEPScenario).filter_by(scenario=sc_setup)
+                if query.first() is not None:
+                    continue
+                session.add_all(
+                    [
+                        OEPScenario(
+                            scenario=sc_setup,
+                            component=com,
+                            parameter=parameter_name,
+                            **parameter_data,
+                        )
+                        for com, parameters in sc_parameters["SETUPS"][
+                            sc_setup
+                        ].items()
+                        for parameter_name, parameter_data in parameters.items()
+                    ]
+                )
+            logging.info(f"Scenario upload: {sc_setup} done.")
+    invalidate_scenario_parameters()
 
 
 class BaseScenario(ABC):
@@ -51,10 +88,15 @@ class BaseScenario(ABC):
     """
     needed_parameters = {"General": ["wacc"], "demand": ["index", "type"]}
 
-    def __init__(self, **parameters):
+    def __init__(self, customer=None, **parameters):
+        """
+        If customer (household or district) is given, it is used as demand instead
+        of loading demand from database; thus, demand can be shared between scenarios.
+        """
         self.energysystem = None
         self.sub_b_th = None
         self.demand_th = None
+        self.customer = customer
         self.create_energysystem(**parameters)
 
     def create_energysystem(self, **parameters):
@@ -95,9 +137,12 @@ class BaseScenario(ABC):
         """
         Whole district as one, separate or single households are added to energysystem
         """
-        demand = self.get_demand(
-            parameters["demand"]["type"], parameters["demand"]["index"]
-        )
+        if self.customer is not None:
+            demand = self.customer
+        else:
+            demand = self.get_demand(
+                parameters["demand"]["type"], parameters["demand"]["index"]
+            )
         self.add_subgrid_and_demands(demand)
         self.add_technology(demand, timeseries, parameters)
 
@@ -137,8 +182,15 @@ class BaseScenario(ABC):
 
     @classmethod
     @abstractmethod
-    def calculate_primary_factor_and_energy(cls, param_results, results):
-        """Returns primary factor and energy for given results"""
+    def calculate_primary_factor_and_energy(
+        cls, param_results, results, node_index=None
+    ):
+        """
+        Returns primary factor and energy for given results
+
+        Nodes are looked up via given node index (see NodeIndex); if no index is
+        given, it is built from parameter results.
+        """
         return pe(None, None)
 
 
@@ -153,20 +205,15 @@ class PrimaryInputScenario(BaseScenario):
         pass
 
     @classmethod
-    def calculate_primary_factor_and_energy(cls, param_results, node_results):
+    def calculate_primary_factor_and_energy(
+        cls, param_results, node_results, node_index=None
+    ):
         """Returns primary factor and energy for given results"""
+        if node_index is None:
+            node_index = NodeIndex(param_results)
         # Find primary source & demand:
-        primary_source_node = next(
-            filter(
-                lambda x: x.tags is not None and "primary_source" in x.tags,
-                node_results.result,
-            )
-        )
-        demand_node = next(
-            filter(
-                lambda x: x.tags is not None and "demand" in x.tags, node_results.result
-            )
-        )
+        primary_source_node = node_index.get_by_tag("primary_source")[0]
+        demand_node = node_index.get_by_tag("demand")[0]
 
         # Get primary factor:
         pf_primary = param_results[(primary_source_node, None)]["scalars"]["pf"]
@@ -1,11 +1,21 @@
 """Scenario module for BHKWs"""
 
+import numpy
+
 from oemof.solph import Flow, Bus, Investment, Transformer
 from oemof.tools.economics import annuity
 
 from stemp.scenarios import basic_setup
+from stemp.caching import LRUCache, array_fingerprint
 from stemp.constants import BHKW_FULL_LOAD_HOURS, BHKW_OPTIMISATION_STEP
 from stemp.scenarios.basic_setup import AdvancedLabel, pe
+from stemp.scenarios.decomposition import simulate_decomposed
+
+# Partial-load BHKW is solved via decomposition, if enabled (see decomposition module):
+simulate = simulate_decomposed
+
+BHKW_SIZE_CACHE = LRUCache(max_size=256)
+"""Optimal BHKW sizes per demand fingerprint (shared by BHKW and Bio-BHKW)"""
 
 
 class Scenario(basic_setup.BaseScenario):
@@ -127,20 +137,41 @@ class Scenario(basic_setup.BaseScenario):
         Returns (estimated) optimal BHKW size depending on demand
 
         Depending of preferred full load hours, BHKW size is determined.
+        Result is memoized per demand fingerprint; given demand is not changed.
+        """
+        return BHKW_SIZE_CACHE.get(
+            array_fingerprint(demand),
+            lambda: Scenario.calculate_optimum_bhkw_size(demand),
+        )
+
+    @staticmethod
+    def calculate_optimum_bhkw_size(demand):
         """
-        demand.sort_values(ascending=False, inplace=True)
-        partial_load_right = demand.iloc[BHKW_FULL_LOAD_HOURS - 1 : 8760].sum()
-
-        # Search for optimum bkhw-size starting at minimum (full-load-hours):
-        x_start = BHKW_FULL_LOAD_HOURS - 2
-        demand_left = demand.iloc[:BHKW_FULL_LOAD_HOURS]
-        while True:
-            bhkw_size = demand.iloc[x_start]
-            partial_load_left = -(demand_left - bhkw_size).clip(upper=0).sum()
-            if partial_load_left > partial_load_right:
-                break
-            x_start -= BHKW_OPTIMISATION_STEP
-        return demand.iloc[x_start + 1]
+        Calculates optimal BHKW size from load duration curve of given demand
+
+        Starting at minimum BHKW size (demand at full load hours), BHKW size is
+        increased in steps of BHKW_OPTIMISATION_STEP hours until partial load left
+        of full load hours (demand below BHKW size) exceeds remaining demand right of
+        full load hours.
+        Instead of iterating, partial loads for all steps are calculated at once
+        using cumulative sums of the sorted load duration curve.
+        """
+        load_duration = numpy.sort(numpy.asarray(demand, dtype=float))[::-1]
+        partial_load_right = load_duration[BHKW_FULL_LOAD_HOURS - 1 :].sum()
+
+        # Partial load left for BHKW size s is sum(s - d) for all d < s within
+        # full load hours:
+        ascending_left = load_duration[:BHKW_FULL_LOAD_HOURS][::-1]
+        cumulated_left = numpy.concatenate(([0.0], numpy.cumsum(ascending_left)))
+        steps = numpy.arange(BHKW_FULL_LOAD_HOURS - 2, -1, -BHKW_OPTIMISATION_STEP)
+        bhkw_sizes = load_duration[steps]
+        below_size = numpy.searchsorted(ascending_left, bhkw_sizes, side="left")
+        partial_load_left = bhkw_sizes * below_size - cumulated_left[below_size]
+
+        exceeded = numpy.flatnonzero(partial_load_left > partial_load_right)
+        if len(exceeded) == 0:
+            return load_duration[0]
+        return load_duration[steps[exceeded[0]] + 1]
 
     @staticmethod
     def get_bhkw_capex(bhkw_size):
@@ -231,35 +262,18 @@ class Scenario(basic_setup.BaseScenario):
             return super(Scenario, cls).get_data_label(nodes)
 
     @classmethod
-    def calculate_primary_factor_and_energy(cls, param_results, node_results):
+    def calculate_primary_factor_and_energy(
+        cls, param_results, node_results, node_index=None
+    ):
+        if node_index is None:
+            node_index = basic_setup.NodeIndex(param_results)
         # Find nodes:
-        bhkw, b_bhkw_el = next(
-            filter(
-                lambda x: (
-                    x[0].name == "bhkw"
-                    and x[1] is not None
-                    and x[1].name == "b_bhkw_el"
-                ),
-                param_results.keys(),
-            )
-        )
-        b_demand_th, demand_node = next(
-            filter(
-                lambda x: (
-                    x[0].name == "b_demand_th"
-                    and x[1] is not None
-                    and x[1].name == "demand_th"
-                ),
-                param_results.keys(),
-            )
-        )
-        b_gas, _ = next(filter(lambda x: x[0].name == "b_gas", param_results.keys()))
-        _, excess_node = next(
-            filter(
-                lambda x: x[1] is not None and x[1].name == "excess_th",
-                param_results.keys(),
-            )
-        )
+        bhkw = node_index.get("bhkw")
+        b_bhkw_el = node_index.get("b_bhkw_el")
+        b_demand_th = node_index.get("b_demand_th")
+        demand_node = node_index.get("demand_th")
+        b_gas = node_index.get("b_gas")
+        excess_node = node_index.get("excess_th")
 
         # Calculate thermic contribution to primary factor:
         demand = sum(node_results.result[demand_node]["input"].values())
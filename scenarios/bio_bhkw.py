@@ -2,6 +2,8 @@
 
 from stemp.scenarios import bhkw
 
+simulate = bhkw.simulate
+
 
 class Scenario(bhkw.Scenario):
     name = "BIO_BHKW"
@@ -0,0 +1,313 @@
+"""
+Decomposed (rolling horizon) simulation of energysystems with partial-load BHKWs
+
+Partial-load constraints of invested flows (i.e. minimal load of BHKW) couple
+investment and dispatch of the whole year. Instead of solving one year-long model,
+energysystem is solved in two stages:
+
+1. Sizes of all flows with partial-load constraint are determined by solving a
+   relaxed model, in which time series are aggregated (see
+   DECOMPOSITION_FIRST_STAGE and timeseries_aggregation module).
+2. Sizes are fixed and dispatch is solved per period (see DECOMPOSITION_PERIOD,
+   i.e. month by month) in a process pool. Investments without partial-load
+   constraint (i.e. peak load boiler) are kept in each period; their size is the
+   maximum of all periods.
+
+Results of all periods are stitched into one result set with the same structure
+as simulation.default_simulate_fct returns. As sizes of first stage are
+heuristic, objective may differ slightly from monolithic solve (compare via
+"python stemp/benchmark.py decomposition").
+"""
+
+import logging
+import multiprocessing
+from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy
+import pandas
+from oemof import outputlib
+from oemof.solph import Model
+
+from stemp import solver
+from stemp.scenarios.simulation import default_simulate_fct, get_variable_results
+from stemp.scenarios.timeseries_aggregation import (
+    aggregate_energysystem,
+    get_sequences,
+)
+
+try:
+    from stemp.app_settings import (
+        DECOMPOSITION_PERIOD,
+        DECOMPOSITION_FIRST_STAGE,
+        SIMULATION_POOL_SIZE,
+    )
+except KeyError:
+    logging.warning(
+        "Could not find wam settings. "
+        "Maybe you have to start django application first."
+    )
+    DECOMPOSITION_PERIOD = ""
+    DECOMPOSITION_FIRST_STAGE = "typical_days:12"
+    SIMULATION_POOL_SIZE = 1
+
+_PERIOD_WORKER = {}
+"""State of period worker process (set via pool initializer, see solve_periods)"""
+
+
+def _flow_key(source, target):
+    return str(source.label), str(target.label)
+
+
+def get_partial_load_flows(energysystem):
+    """Returns all invested flows with partial-load constraint (keyed by labels)"""
+    periods = len(energysystem.timeindex)
+    return {
+        _flow_key(source, target): flow
+        for (source, target), flow in energysystem.flows().items()
+        if flow.investment is not None
+        and any(flow.min[t] > 0 for t in range(periods))
+    }
+
+
+def get_periods(timeindex, freq):
+    """Returns start and stop index of each period (i.e. month) of time index"""
+    codes = timeindex.to_period(freq).asi8
+    starts = numpy.flatnonzero(numpy.diff(codes, prepend=codes[0] - 1))
+    return list(zip(starts, numpy.append(starts[1:], len(timeindex))))
+
+
+def solve(energysystem, profile, **model_kwargs):
+    """Builds and solves model of given energysystem and returns model"""
+    om = Model(energysystem=energysystem, **model_kwargs)
+    solver.solve(om, profile)
+    return om
+
+
+def get_first_stage_sizes(energysystem, profile):
+    """
+    Returns sizes of partial-load flows from relaxed (aggregated) first stage
+
+    Returns
+    -------
+    dict
+        Invested size per flow (keyed by labels)
+    """
+    partial_load_flows = get_partial_load_flows(energysystem)
+    relaxed = deepcopy(energysystem)
+    aggregation = aggregate_energysystem(relaxed, DECOMPOSITION_FIRST_STAGE)
+    om = solve(relaxed, profile, timeincrement=aggregation.weights)
+    results = outputlib.processing.convert_keys_to_strings(
+        outputlib.processing.results(om)
+    )
+    return {key: results[key]["scalars"]["invest"] for key in partial_load_flows}
+
+
+def solve_period(energysystem, period, sizes, profile, variables=None):
+    """
+    Solves dispatch of given energysystem within given period with fixed sizes
+
+    Parameters
+    ----------
+    energysystem : oemof.solph.EnergySystem
+        Energysystem to decompose (is not changed)
+    period : tuple
+        Start and stop index of period
+    sizes : dict
+        Fixed size per flow (keyed by labels)
+    profile : solver.SolverProfile
+        Solver profile to solve with
+    variables : set
+        Names of variables to extract (see simulation.get_variable_results);
+        investments are always extracted. If not given, all variables are extracted.
+
+    Returns
+    -------
+    tuple
+        Results (with str-keys) and objective of period
+    """
+    energysystem = deepcopy(energysystem)
+    start, stop = period
+    for container, key, sequence in get_sequences(energysystem):
+        sliced = numpy.asarray(sequence, dtype=float)[start:stop]
+        if isinstance(container, dict):
+            container[key] = sliced
+        else:
+            setattr(container, key, sliced)
+    energysystem.timeindex = energysystem.timeindex[start:stop]
+    for (source, target), flow in energysystem.flows().items():
+        size = sizes.get(_flow_key(source, target))
+        if size is not None:
+            flow.nominal_value = size
+            flow.investment = None
+    om = solve(energysystem, profile)
+    if variables is None:
+        results = outputlib.processing.results(om)
+    else:
+        results = get_variable_results(om, set(variables) | {"invest"})
+    return outputlib.processing.convert_keys_to_strings(results), om.objective()
+
+
+def _init_period_worker(energysystem):
+    """Stores energysystem in period worker process (inherited via fork)"""
+    _PERIOD_WORKER["energysystem"] = energysystem
+
+
+def _solve_worker_period(period, sizes, profile, variables):
+    """Solves given period of energysystem stored in period worker process"""
+    return solve_period(
+        _PERIOD_WORKER["energysystem"], period, sizes, profile, variables
+    )
+
+
+def solve_periods(energysystem, periods, sizes, profile, variables=None):
+    """
+    Solves all periods of given energysystem in (forked) process pool
+
+    Energysystem is handed to workers via pool initializer; as workers are forked,
+    it is not pickled. If SIMULATION_POOL_SIZE is not greater than one (or current
+    process is not allowed to start child processes, or if process pool cannot be
+    started or breaks down), periods are solved sequentially.
+    """
+    if SIMULATION_POOL_SIZE > 1 and not multiprocessing.current_process().daemon:
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(SIMULATION_POOL_SIZE, len(periods)),
+                mp_context=multiprocessing.get_context("fork"),
+                initializer=_init_period_worker,
+                initargs=(energysystem,),
+            ) as pool:
+                return list(
+                    pool.map(
+                        _solve_worker_period,
+                        periods,
+                        [sizes] * len(periods),
+                        [profile] * len(periods),
+                        [variables] * len(periods),
+                    )
+                )
+        except (AssertionError, OSError, BrokenProcessPool):
+            logging.warning(
+                "Could not run process pool - solving periods in turn", exc_info=True
+            )
+    return [
+        solve_period(energysystem, period, sizes, profile, variables)
+        for period in periods
+    ]
+
+
+def stitch_results(period_results, sizes, timeindex):
+    """
+    Stitches results of all periods into one result set
+
+    Sequences are concatenated; sizes of fixed flows are added as "invest" scalar
+    and sizes of flows invested per period are set to maximum of all periods.
+    """
+    results = {}
+    for key in period_results[0]:
+        sequences = pandas.concat(
+            [period[key]["sequences"] for period in period_results]
+        )
+        sequences.index = timeindex
+        scalars = period_results[0][key]["scalars"].copy()
+        if "invest" in scalars:
+            scalars["invest"] = max(
+                period[key]["scalars"]["invest"] for period in period_results
+            )
+        if key in sizes:
+            scalars["invest"] = sizes[key]
+        results[key] = {"scalars": scalars, "sequences": sequences}
+    return results
+
+
+def get_objective(energysystem, period_results, objectives, results):
+    """
+    Returns total objective of decomposed solve
+
+    Investment costs contained in objectives of periods are replaced by investment
+    costs of stitched sizes.
+    """
+    ep_costs = {
+        _flow_key(source, target): flow.investment.ep_costs
+        for (source, target), flow in energysystem.flows().items()
+        if flow.investment is not None
+    }
+    objective = sum(objectives)
+    for period in period_results:
+        for key, period_result in period.items():
+            if "invest" in period_result["scalars"]:
+                objective -= ep_costs[key] * period_result["scalars"]["invest"]
+    return objective + sum(
+        ep_costs[key] * results[key]["scalars"]["invest"] for key in ep_costs
+    )
+
+
+def solve_decomposed(
+    energysystem, solver_profile=None, period=None, result_variables=None
+):
+    """
+    Solves energysystem via decomposition (see module description)
+
+    Parameters
+    ----------
+    energysystem : oemof.solph.EnergySystem
+        Energysystem to solve (is not changed)
+    solver_profile : str or solver.SolverProfile
+        Solver profile to solve with (defaults to default profile)
+    period : str
+        Pandas frequency of periods (defaults to DECOMPOSITION_PERIOD)
+    result_variables : set
+        Names of variables to extract (see solve_period)
+
+    Returns
+    -------
+    tuple
+        Oemof results, input parameters (both with str-keys) and objective
+    """
+    profile = solver.get_profile(solver_profile)
+    sizes = get_first_stage_sizes(energysystem, profile)
+    periods = get_periods(energysystem.timeindex, period or DECOMPOSITION_PERIOD)
+    period_results, objectives = zip(
+        *solve_periods(energysystem, periods, sizes, profile, result_variables)
+    )
+    results = stitch_results(period_results, sizes, energysystem.timeindex)
+    param_results = outputlib.processing.convert_keys_to_strings(
+        outputlib.processing.parameter_as_dict(energysystem, exclude_none=True)
+    )
+    objective = get_objective(energysystem, period_results, objectives, results)
+    return results, param_results, objective
+
+
+def simulate_decomposed(
+    energysystem,
+    solver_profile=None,
+    template_key=None,
+    result_variables=None,
+    **kwargs,
+):
+    """
+    Simulation function for scenarios with partial-load BHKWs
+
+    If DECOMPOSITION_PERIOD is set and energysystem contains flows with partial-load
+    constraint, energysystem is solved via decomposition; otherwise (or if time
+    series have been aggregated already) default simulation function is used.
+    Accepts same keyword arguments as simulation.default_simulate_fct.
+    """
+    if (
+        not DECOMPOSITION_PERIOD
+        or getattr(energysystem, "aggregation", None) is not None
+        or len(get_partial_load_flows(energysystem)) == 0
+    ):
+        return default_simulate_fct(
+            energysystem,
+            solver_profile=solver_profile,
+            template_key=template_key,
+            result_variables=result_variables,
+            **kwargs,
+        )
+    logging.info("Solve optimization problem via decomposition")
+    results, param_results, _ = solve_decomposed(
+        energysystem, solver_profile, result_variables=result_variables
+    )
+    return results, param_results
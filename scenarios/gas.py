@@ -4,6 +4,10 @@ from oemof.solph import Flow, Transformer, Bus, Investment
 from oemof.tools.economics import annuity
 
 from stemp.scenarios.basic_setup import PrimaryInputScenario, AdvancedLabel
+from stemp.scenarios.analytic import simulate_primary_input
+
+# Optimum is evaluated analytically instead of solving (see analytic module):
+simulate = simulate_primary_input
 
 
 class Scenario(PrimaryInputScenario):
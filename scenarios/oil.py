@@ -5,6 +5,10 @@ from oemof.tools.economics import annuity
 
 from stemp.scenarios import basic_setup
 from stemp.scenarios.basic_setup import AdvancedLabel
+from stemp.scenarios.analytic import simulate_primary_input
+
+# Optimum is evaluated analytically instead of solving (see analytic module):
+simulate = simulate_primary_input
 
 
 class Scenario(basic_setup.PrimaryInputScenario):
@@ -1,7 +1,6 @@
 """Module for PV and heatpump scenario"""
 
 import pandas
-import sqlahelper
 
 from oemof.solph import Flow, Transformer, Investment, Source, Bus, Sink
 from oemof.tools.economics import annuity
@@ -13,9 +12,8 @@ from stemp.scenarios.basic_setup import AdvancedLabel, pe
 
 def get_timeseries():
     """Returns timeseries for temperature and PV"""
-    session = sqlahelper.get_session()
-    temp = session.query(OEPTimeseries).filter_by(name="Temperature").first().data
-    pv = session.query(OEPTimeseries).filter_by(name="PV").first().data
+    temp = OEPTimeseries.get_data("Temperature")
+    pv = OEPTimeseries.get_data("PV")
     timeseries = pandas.DataFrame({"temp": temp, "pv": pv})
     return timeseries
 
@@ -49,6 +47,7 @@ class Scenario(basic_setup.BaseScenario):
             label=AdvancedLabel(f"b_demand_th_warmwater", type="Bus",)
         )
         self.energysystem.add(self.sub_b_th, self.sub_b_th_warmwater)
+        demands = customer.annual_demands()
 
         # Add heat demand
         self.demand_th = Sink(
@@ -56,7 +55,7 @@ class Scenario(basic_setup.BaseScenario):
             inputs={
                 self.sub_b_th: Flow(
                     nominal_value=1,
-                    actual_value=customer.annual_heat_demand(),
+                    actual_value=demands.heat,
                     fixed=True,
                 )
             },
@@ -71,7 +70,7 @@ class Scenario(basic_setup.BaseScenario):
             inputs={
                 self.sub_b_th_warmwater: Flow(
                     nominal_value=1,
-                    actual_value=customer.annual_hot_water_demand(),
+                    actual_value=demands.hot_water,
                     fixed=True,
                 )
             },
@@ -180,23 +179,14 @@ class Scenario(basic_setup.BaseScenario):
             return super(Scenario, cls).get_data_label(nodes)
 
     @classmethod
-    def calculate_primary_factor_and_energy(cls, param_results, node_results):
-        _, demand_node = next(
-            filter(
-                lambda x: (x[1] is not None and x[1].name == "demand_th"),
-                param_results.keys(),
-            )
-        )
-        net_transformer, b_demand_el = next(
-            filter(
-                lambda x: (
-                    x[0].name == "transformer_net_to_demand_el"
-                    and x[1] is not None
-                    and x[1].name == "b_demand_el"
-                ),
-                param_results.keys(),
-            )
-        )
+    def calculate_primary_factor_and_energy(
+        cls, param_results, node_results, node_index=None
+    ):
+        if node_index is None:
+            node_index = basic_setup.NodeIndex(param_results)
+        demand_node = node_index.get("demand_th")
+        net_transformer = node_index.get("transformer_net_to_demand_el")
+        b_demand_el = node_index.get("b_demand_el")
 
         demand = sum(node_results.result[demand_node]["input"].values())
         net_input = sum(node_results.result[net_transformer]["input"].values())
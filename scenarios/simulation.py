@@ -2,31 +2,69 @@
 
 import os
 import logging
+import hashlib
+from collections import defaultdict
 
-from oemof.solph import Model
+import numpy
+import pandas
+from pyomo.environ import Var
+
+from oemof.solph import Model, Flow
 from oemof import outputlib
 from oemof.tools import helpers
 
+from stemp import solver
+from stemp.caching import LRUCache, array_fingerprint
+from stemp.scenarios.timeseries_aggregation import (
+    aggregate_energysystem,
+    expand_results,
+)
+
 try:
     from wam.settings import BASE_DIR
-    from stemp.app_settings import STORE_LP_FILE
+    from stemp.app_settings import (
+        STORE_LP_FILE,
+        MODEL_TEMPLATE_CACHE_SIZE,
+        TIMESERIES_AGGREGATION,
+        SCENARIO_PARAMETERS,
+        SCENARIO_SOLVER_PROFILES,
+    )
 except KeyError:
     logging.warning(
         "Could not find wam settings. "
         "Maybe you have to start django application first."
     )
+    MODEL_TEMPLATE_CACHE_SIZE = 0
+    TIMESERIES_AGGREGATION = ""
+    SCENARIO_SOLVER_PROFILES = {}
 
 EXCLUDED_PATHS = ("__init__.py",)
 CREATE_ENERGYSYSTEM_FCT = "create_energysystem"
 NEEDED_PARAMETERS = "NEEDED_PARAMETERS"
 SIMULATE_FCT = "simulate"
+SOLVER_PROFILE = "solver_profile"
+
+MODEL_TEMPLATES = LRUCache(max_size=MODEL_TEMPLATE_CACHE_SIZE)
+"""
+Built (and solved) optimization models which can be re-used for parameter variants
 
+Models are stored per template key (see get_model_template_key); thus, only
+energysystems which differ in cost parameters share the same model.
+"""
 
-def create_energysystem(scenario_module, **parameters):
+
+def create_energysystem(
+    scenario_module, customer=None, aggregation=None, **parameters
+):
     """
     Returns energysystem for given scenario
 
     Checks if all needed parameters are given, before setting up energysystem.
+    If customer (household or district) is given, it is used as demand instead of
+    loading demand from database.
+    Time series of energysystem are aggregated by given aggregation mode (see
+    timeseries_aggregation module); if no aggregation is given, TIMESERIES_AGGREGATION
+    from settings is used (empty string disables aggregation).
     """
     # Check if all needed parameters are given:
     needed = scenario_module.Scenario.needed_parameters
@@ -51,7 +89,11 @@ def create_energysystem(scenario_module, **parameters):
             )
 
     # Create energysystem:
-    scenario = scenario_module.Scenario(**parameters)
+    scenario = scenario_module.Scenario(customer=customer, **parameters)
+    if aggregation is None:
+        aggregation = TIMESERIES_AGGREGATION
+    if aggregation:
+        aggregate_energysystem(scenario.energysystem, aggregation)
     return scenario.energysystem
 
 
@@ -60,21 +102,282 @@ def get_simulation_function(scenario_module):
     Returns simulation function for current scenario
 
     If no custom scenario function is given, default simulation function is used.
+    Custom simulation functions must accept the same keyword arguments as
+    default simulation function.
     """
     simulate_fct = getattr(scenario_module, SIMULATE_FCT, default_simulate_fct)
     return simulate_fct
 
 
-def default_simulate_fct(energysystem, solver="cbc", tee_switch=True, keep=True):
+def get_solver_profile(scenario_module):
+    """
+    Returns solver profile for current scenario
+
+    Profile can be set per scenario via SCENARIO_SOLVER_PROFILES in STEMP config;
+    otherwise, profile given by scenario module (see SOLVER_PROFILE) or default
+    profile is used (see solver module).
+    """
+    scenario_name = scenario_module.__name__.split(".")[-1]
+    profile = SCENARIO_SOLVER_PROFILES.get(
+        scenario_name, getattr(scenario_module, SOLVER_PROFILE, None)
+    )
+    return solver.get_profile(profile)
+
+
+def get_cost_parameters(scenario_name):
+    """
+    Returns all cost parameters of given scenario
+
+    Cost parameters are marked with parameter type "costs" in scenario config.
+    Those parameters only change coefficients of the objective function, but not the
+    structure of the optimization model.
+
+    Returns
+    -------
+    set
+        Set of (component, parameter) tuples
+    """
+    return {
+        (component, parameter)
+        for setup in SCENARIO_PARAMETERS[scenario_name]["SETUPS"].values()
+        for component, parameters in setup.items()
+        for parameter, attributes in parameters.items()
+        if attributes.get("parameter_type") == "costs"
+    }
+
+
+def _profile_fingerprint(value):
+    """Returns fingerprint for timeseries; scalar values are covered by parameters"""
+    if isinstance(value, (pandas.Series, numpy.ndarray, list)):
+        return array_fingerprint(value)
+    return None
+
+
+def get_model_template_key(scenario_name, energysystem, parameters):
+    """
+    Returns key to look up model template for given energysystem
+
+    Key is built from scenario name, all non-cost parameters, node labels,
+    demand fingerprint (fingerprints of all timeseries in flows and conversion
+    factors) and investment bounds.
+    Thus, energysystems which only differ in cost parameters share the same key.
+
+    Parameters
+    ----------
+    scenario_name : str
+        Name of scenario module
+    energysystem : oemof.solph.EnergySystem
+        Energysystem to get template key for
+    parameters : dict
+        Parameters which have been used to set up energysystem
+
+    Returns
+    -------
+    tuple
+        Scenario name and structure hash
+    """
+    cost_parameters = get_cost_parameters(scenario_name)
+    structure = [
+        sorted(
+            (component, parameter, repr(value))
+            for component, component_parameters in parameters.items()
+            for parameter, value in component_parameters.items()
+            if (component, parameter) not in cost_parameters
+        )
+    ]
+    flows = sorted(
+        energysystem.flows().items(),
+        key=lambda item: (str(item[0][0].label), str(item[0][1].label)),
+    )
+    for (source, target), flow in flows:
+        investment = flow.investment
+        structure.append(
+            (
+                str(source.label),
+                str(target.label),
+                _profile_fingerprint(flow.actual_value),
+                None
+                if investment is None
+                else (investment.minimum, investment.maximum, investment.existing),
+            )
+        )
+    for node in energysystem.nodes:
+        for target, factor in getattr(node, "conversion_factors", {}).items():
+            structure.append(
+                (str(node.label), str(target.label), _profile_fingerprint(factor))
+            )
+    return scenario_name, hashlib.sha1(repr(structure).encode()).hexdigest()
+
+
+def _get_custom_attributes(obj, standard_attributes):
+    """Returns public scalar attributes of given flow or node, which are not standard"""
+    return {
+        attribute: value
+        for attribute, value in vars(obj).items()
+        if not attribute.startswith("_")
+        and attribute not in standard_attributes
+        and isinstance(value, (bool, int, float, str))
+    }
+
+
+def update_cost_coefficients(model, energysystem):
+    """
+    Patches cost coefficients of given energysystem into (already built) model
+
+    Variable costs and investment attributes (i.e. ep_costs, capex) of all flows are
+    copied from energysystem into related flows of model; afterwards, objective is
+    rebuilt. Constraints are kept untouched, as energysystem must only differ in
+    cost parameters (see get_model_template_key).
+    Custom attributes of flows and nodes, which are not part of the optimization
+    problem (i.e. pf, co2_emissions, min_size), are copied as well; thus, energysystem
+    of model matches given energysystem.
+    """
+    standard_flow_attributes = set(vars(Flow()))
+    new_flows = {
+        (source.label, target.label): flow
+        for (source, target), flow in energysystem.flows().items()
+    }
+    for (source, target), flow in model.flows.items():
+        new_flow = new_flows[source.label, target.label]
+        flow.variable_costs = new_flow.variable_costs
+        if flow.investment is not None:
+            flow.investment.__dict__.update(new_flow.investment.__dict__)
+        flow.__dict__.update(_get_custom_attributes(new_flow, standard_flow_attributes))
+    new_nodes = {node.label: node for node in energysystem.nodes}
+    for node in model.es.nodes:
+        node.__dict__.update(_get_custom_attributes(new_nodes[node.label], ()))
+    model.del_component(model.objective)
+    model._add_objective()
+
+
+def is_mixed_integer(model):
+    """Returns True if model contains any integer or binary variable"""
+    return any(not var.is_continuous() for var in model.component_data_objects(Var))
+
+
+def _result_key(nodes):
+    """Returns oemof result key (node tuple) for given variable index"""
+    return tuple(nodes) if len(nodes) == 2 else (nodes[0], None)
+
+
+def get_variable_results(model, variables):
+    """
+    Returns values of given variables of solved model
+
+    Lean alternative to oemof.outputlib.processing.results: instead of building a
+    dataframe of all variables, values of given variables are read directly from
+    pyomo variables into numpy arrays. Results have the same structure as oemof
+    results; time-indexed variables are returned as sequences, others as scalars.
+
+    Parameters
+    ----------
+    model : oemof.solph.Model
+        Solved model
+    variables : set
+        Names of variables to extract (i.e. "flow" and "invest")
+
+    Returns
+    -------
+    dict
+        Oemof results (keyed by node tuples)
+    """
+    scalars = defaultdict(dict)
+    sequences = defaultdict(dict)
+    for var in model.component_objects(Var):
+        name = var.local_name
+        if name not in variables:
+            continue
+        values = defaultdict(list)
+        for index, var_data in var.items():
+            index = index if isinstance(index, tuple) else (index,)
+            if isinstance(index[-1], int):
+                values[index[:-1]].append(var_data.value)
+            else:
+                scalars[_result_key(index)][name] = var_data.value
+        for nodes, sequence in values.items():
+            sequences[_result_key(nodes)][name] = numpy.array(sequence, dtype=float)
+
+    results = {}
+    for key in list(sequences) + [key for key in scalars if key not in sequences]:
+        data = pandas.DataFrame(sequences.get(key, {}), index=model.es.timeindex)
+        data.columns.name = "variable_name"
+        results[key] = {
+            "scalars": pandas.Series(scalars.get(key, {}), dtype=float),
+            "sequences": data,
+        }
+    return results
+
+
+def extract_results(model, variables=None, energysystem=None):
+    """
+    Returns results and input parameters of solved model as dicts with str-keys
+
+    If variables are given, only those are extracted (see get_variable_results);
+    otherwise, all variables are extracted via oemof.outputlib.processing.results
+    (debug mode, see results.get_result_variables). Input parameters are taken from
+    given energysystem (defaults to energysystem of model); thus, parameters of
+    re-used model templates are not mixed up with parameters of current variant.
+    If time series of energysystem have been aggregated, results are re-expanded
+    to original time index.
+    """
+    if energysystem is None:
+        energysystem = model.es
+    if variables is None:
+        results = outputlib.processing.results(model)
+    else:
+        results = get_variable_results(model, variables)
+    param_results = outputlib.processing.parameter_as_dict(
+        energysystem, exclude_none=True
+    )
+    aggregation = getattr(energysystem, "aggregation", None)
+    if aggregation is not None:
+        expand_results(results, aggregation)
+        expand_results(param_results, aggregation)
+    return tuple(
+        map(outputlib.processing.convert_keys_to_strings, (results, param_results))
+    )
+
+
+def default_simulate_fct(
+    energysystem, solver_profile=None, template_key=None, result_variables=None
+):
     """
     Default simulation function to simulate oemof Model
 
-    Builds simple simulation model from energysystem and solves it with given solver.
-    Resulting results and input parameters are returned as dictionaries with str-keys.
+    Builds simple simulation model from energysystem and solves it with given solver
+    profile (name or profile, see solver module; defaults to default profile).
+    Resulting results and input parameters are returned as dictionaries with str-keys;
+    if result variables are given, only those variables are extracted (see
+    extract_results).
+
+    If template key is given and a model template for this key has been built
+    before, cost coefficients are patched into template and template is re-solved
+    (warm-started in case of MILP) instead of building a new model.
+
+    If time series of energysystem have been aggregated, timesteps are weighted by
+    represented hours and results are re-expanded to original time index.
     """
-    # create Optimization model based on energy_system
-    logging.info("Create optimization problem")
-    om = Model(energysystem=energysystem)
+    aggregation = getattr(energysystem, "aggregation", None)
+    profile = solver.get_profile(solver_profile)
+    om = None
+    mixed_integer = None
+    warmstart = False
+    use_template = template_key is not None and MODEL_TEMPLATES.max_size > 0
+    if use_template:
+        template = MODEL_TEMPLATES.pop(template_key)
+        if template is not None:
+            logging.info("Re-use optimization problem")
+            om, mixed_integer = template
+            warmstart = mixed_integer
+            update_cost_coefficients(om, energysystem)
+
+    if om is None:
+        # create Optimization model based on energy_system
+        logging.info("Create optimization problem")
+        model_kwargs = {}
+        if aggregation is not None:
+            model_kwargs["timeincrement"] = aggregation.weights
+        om = Model(energysystem=energysystem, **model_kwargs)
 
     # if debug is true an lp-file will be written
     if STORE_LP_FILE:
@@ -84,16 +387,13 @@ def default_simulate_fct(energysystem, solver="cbc", tee_switch=True, keep=True)
 
     # SOLVE:
     # solve with specific optimization options (passed to pyomo)
-    logging.info("Solve optimization problem")
-    om.solve(
-        solver=solver,
-        solve_kwargs={"tee": tee_switch, "keepfiles": keep},
-        cmdline_options={
-            # 'MaxNodes': 1000,
-            "mipgap": 0.005  # Only for Gurobi
-        },
-    )
+    logging.info(f"Solve optimization problem (solver profile {profile.name})")
+    solver.solve(om, profile, warmstart=warmstart)
+
+    results = extract_results(om, result_variables, energysystem)
 
-    results = outputlib.processing.results(om)
-    param_results = outputlib.processing.parameter_as_dict(om, exclude_none=True)
-    return map(outputlib.processing.convert_keys_to_strings, (results, param_results))
+    if use_template:
+        if mixed_integer is None:
+            mixed_integer = is_mixed_integer(om)
+        MODEL_TEMPLATES.set(template_key, (om, mixed_integer))
+    return results
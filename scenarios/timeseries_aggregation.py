@@ -0,0 +1,226 @@
+"""
+Time series aggregation to reduce size of optimization problems
+
+Instead of simulating every hour of the year, energysystems can be simulated with
+reduced temporal resolution:
+
+- Down-sampling (i.e. "2H" or "4H"): Blocks of consecutive hours are merged into one
+  timestep.
+- Typical days (i.e. "typical_days:12"): Days are clustered (k-means over all time
+  series of the energysystem) and each cluster is represented by its mean day.
+
+Each aggregated timestep is weighted by the number of hours it represents. Sequences
+are replaced by their mean within each aggregated timestep; thus, energy totals of
+fixed flows (demands) are preserved exactly. After simulation, result sequences are
+re-expanded to the original (hourly) time index, so that all analyzers work on
+full-year results.
+"""
+
+from collections import namedtuple
+
+import numpy
+import pandas
+
+TYPICAL_DAYS = "typical_days"
+HOURS_PER_DAY = 24
+MAX_KMEANS_ITERATIONS = 100
+
+Aggregation = namedtuple(
+    "Aggregation", ("original_timeindex", "timeindex", "mapping", "weights")
+)
+Aggregation.__doc__ = """
+Original and aggregated time index together with mapping from original timesteps to
+aggregated timesteps and weights (hours represented by each aggregated timestep)
+"""
+
+
+def _is_sequence(value, periods):
+    return isinstance(value, (pandas.Series, numpy.ndarray, list)) and (
+        len(value) == periods
+    )
+
+
+def get_sequences(energysystem):
+    """
+    Returns all time-dependent attributes of flows and conversion factors
+
+    Returns
+    -------
+    list of tuple
+        Tuples of object, attribute (or key of conversion factors) and sequence
+    """
+    periods = len(energysystem.timeindex)
+    sequences = []
+    for flow in energysystem.flows().values():
+        for attribute, value in vars(flow).items():
+            if _is_sequence(value, periods):
+                sequences.append((flow, attribute, value))
+    for node in energysystem.nodes:
+        for target, factor in getattr(node, "conversion_factors", {}).items():
+            if _is_sequence(factor, periods):
+                sequences.append((node.conversion_factors, target, factor))
+    return sequences
+
+
+def downsample(timeindex, hours):
+    """Returns aggregation merging blocks of given hours into one timestep"""
+    mapping = numpy.arange(len(timeindex)) // hours
+    return Aggregation(
+        original_timeindex=timeindex,
+        timeindex=pandas.date_range(
+            timeindex[0], periods=mapping[-1] + 1, freq=f"{hours}H"
+        ),
+        mapping=mapping,
+        weights=numpy.bincount(mapping).astype(float),
+    )
+
+
+def cluster_days(timeindex, sequences, number_of_days):
+    """
+    Returns aggregation representing all days by given number of typical days
+
+    Days are clustered via k-means; each sequence is normalized to its maximum
+    beforehand, in order to weight all sequences equally. Initial centers are chosen
+    deterministically (days evenly spread over days sorted by daily sum) to get
+    reproducible results.
+    """
+    periods = len(timeindex)
+    if periods % HOURS_PER_DAY != 0:
+        raise ValueError(
+            f"Cannot cluster {periods} timesteps into days of {HOURS_PER_DAY} hours"
+        )
+    days = periods // HOURS_PER_DAY
+    number_of_days = min(number_of_days, days)
+
+    features = []
+    for sequence in sequences:
+        values = numpy.asarray(sequence, dtype=float)
+        scale = numpy.abs(values).max()
+        if scale > 0 and values.min() != values.max():
+            features.append((values / scale).reshape(days, HOURS_PER_DAY))
+    if len(features) == 0:
+        features.append(numpy.zeros((days, HOURS_PER_DAY)))
+    features = numpy.hstack(features)
+
+    order = numpy.argsort(features.sum(axis=1), kind="stable")
+    centers = features[order[numpy.linspace(0, days - 1, number_of_days).astype(int)]]
+    labels = None
+    for _ in range(MAX_KMEANS_ITERATIONS):
+        distances = ((features[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        new_labels = distances.argmin(axis=1)
+        if labels is not None and (new_labels == labels).all():
+            break
+        labels = new_labels
+        for cluster in range(number_of_days):
+            members = features[labels == cluster]
+            if len(members) > 0:
+                centers[cluster] = members.mean(axis=0)
+
+    # Remove empty clusters:
+    used, labels = numpy.unique(labels, return_inverse=True)
+    mapping = (
+        labels.repeat(HOURS_PER_DAY) * HOURS_PER_DAY
+        + numpy.tile(numpy.arange(HOURS_PER_DAY), days)
+    )
+    return Aggregation(
+        original_timeindex=timeindex,
+        timeindex=pandas.date_range(
+            timeindex[0], periods=len(used) * HOURS_PER_DAY, freq="H"
+        ),
+        mapping=mapping,
+        weights=numpy.bincount(mapping).astype(float),
+    )
+
+
+def get_aggregation(timeindex, sequences, mode):
+    """
+    Returns aggregation for given aggregation mode
+
+    Parameters
+    ----------
+    timeindex : pandas.DatetimeIndex
+        Original (hourly) time index
+    sequences : list
+        Sequences of energysystem (used for clustering of typical days)
+    mode : str
+        Aggregation mode, either pandas frequency (i.e. "2H") or "typical_days:<n>"
+
+    Returns
+    -------
+    Aggregation
+        Aggregation for given mode
+    """
+    if mode.startswith(TYPICAL_DAYS):
+        _, _, number_of_days = mode.partition(":")
+        return cluster_days(timeindex, sequences, int(number_of_days))
+    hours = pandas.Timedelta(pandas.tseries.frequencies.to_offset(mode)) / (
+        pandas.Timedelta(hours=1)
+    )
+    if hours != int(hours) or hours < 1:
+        raise ValueError(f'Invalid time series aggregation "{mode}"')
+    return downsample(timeindex, int(hours))
+
+
+def aggregate_energysystem(energysystem, mode):
+    """
+    Aggregates all sequences of energysystem in place
+
+    Time index of energysystem is replaced by aggregated time index; aggregation is
+    stored in energysystem (attribute "aggregation") in order to weight timesteps in
+    optimization model and to re-expand results afterwards.
+
+    Parameters
+    ----------
+    energysystem : oemof.solph.EnergySystem
+        Energysystem to aggregate
+    mode : str
+        Aggregation mode (see get_aggregation)
+
+    Returns
+    -------
+    Aggregation
+        Applied aggregation
+    """
+    sequences = get_sequences(energysystem)
+    aggregation = get_aggregation(
+        energysystem.timeindex, [sequence for _, _, sequence in sequences], mode
+    )
+    for container, key, sequence in sequences:
+        aggregated = (
+            numpy.bincount(
+                aggregation.mapping, weights=numpy.asarray(sequence, dtype=float)
+            )
+            / aggregation.weights
+        )
+        if isinstance(container, dict):
+            container[key] = aggregated
+        else:
+            setattr(container, key, aggregated)
+    energysystem.timeindex = aggregation.timeindex
+    energysystem.aggregation = aggregation
+    return aggregation
+
+
+def expand_results(results, aggregation):
+    """
+    Re-expands result sequences from aggregated to original time index
+
+    Each original timestep gets the value of its aggregated timestep. As flows are
+    given as power (per hour), energy totals of expanded sequences equal weighted
+    totals of aggregated sequences.
+
+    Parameters
+    ----------
+    results : dict
+        Oemof results (or parameter results)
+    aggregation : Aggregation
+        Aggregation applied to energysystem (see aggregate_energysystem)
+    """
+    for values in results.values():
+        sequences = values.get("sequences")
+        if isinstance(sequences, (pandas.DataFrame, pandas.Series)) and len(
+            sequences
+        ) == len(aggregation.timeindex):
+            expanded = sequences.iloc[aggregation.mapping]
+            expanded.index = aggregation.original_timeindex
+            values["sequences"] = expanded
@@ -0,0 +1,348 @@
+"""
+Solver backends and solver profiles used to solve optimization models
+
+A solver profile (see SolverProfile) bundles solver, solver interface, number of
+threads, relative MIP gap, time limit and whether solver logs are streamed (tee)
+and temporary LP/solution files are kept. Profiles are registered in PROFILES;
+built-in profiles can be overridden and further profiles can be added via section
+SOLVER_PROFILES of STEMP config (see app_settings):
+
+.. code-block:: bash
+
+  [[SOLVER_PROFILES]]
+    [[[default]]]
+      threads = 2
+      time_limit = 600
+
+Options are translated into command line options of related solver via solver
+backends (see SolverBackend); further backends can be added via
+register_backend. Scenario modules select a profile via module attribute
+"solver_profile" (see simulation.get_solver_profile), which can be overridden per
+scenario via section SCENARIO_SOLVER_PROFILES of STEMP config.
+
+Solver interfaces (see INTERFACES) differ in the way models are passed to solver:
+"shell" writes LP file, starts solver process and reads solution file (via
+oemof.solph.Model.solve); "direct", "persistent" and "appsi" pass models to solver
+in-process via pyomo (persistent solvers keep model instance in memory, so that
+re-solves of model templates only update objective). If in-process interface is
+not available, model is solved via default profile instead (see solve).
+Note: Built-in profile "in_memory" (HiGHS via appsi) requires pyomo >= 6.4 and
+highspy, which are not part of the requirements (oemof 0.3 is based on pyomo 5);
+thus, no scenario selects it by default.
+"""
+
+import logging
+
+BACKENDS = {}
+"""Registered solver backends (see SolverBackend) by solver name"""
+
+PROFILES = {}
+"""Registered solver profiles (see SolverProfile) by profile name"""
+
+DEFAULT_PROFILE = "default"
+INTERFACES = ("shell", "direct", "persistent", "appsi")
+
+__available = {}
+
+
+class SolverBackend(object):
+    """
+    Translates options of solver profiles into command line options of a solver
+
+    Parameters
+    ----------
+    solver : str
+        Solver name as used by pyomo
+    threads : str
+        Name of solver option to set number of threads (None if not supported)
+    ratio_gap : str
+        Name of solver option to set relative MIP gap (None if not supported)
+    time_limit : str
+        Name of solver option to set time limit in seconds (None if not supported)
+    interfaces : dict
+        Pyomo solver name per supported solver interface (see INTERFACES); defaults
+        to shell interface only
+    """
+
+    def __init__(
+        self, solver, threads=None, ratio_gap=None, time_limit=None, interfaces=None
+    ):
+        self.solver = solver
+        self.interfaces = interfaces or {"shell": solver}
+        self.options = {
+            "threads": threads,
+            "ratio_gap": ratio_gap,
+            "time_limit": time_limit,
+        }
+
+    def get_cmdline_options(self, profile):
+        """Returns command line options for given solver profile"""
+        return {
+            self.options[option]: getattr(profile, option)
+            for option in self.options
+            if self.options[option] is not None
+            and getattr(profile, option) is not None
+        }
+
+
+def register_backend(backend):
+    """Registers given solver backend (replaces backend of same solver)"""
+    BACKENDS[backend.solver] = backend
+
+
+class SolverProfile(object):
+    """
+    Options to solve optimization models with
+
+    Parameters
+    ----------
+    name : str
+        Name of profile
+    solver : str
+        Solver name (solver backend must be registered)
+    interface : str
+        Solver interface (see INTERFACES), must be supported by solver backend
+    threads : int
+        Number of threads used by solver (None uses solver default)
+    ratio_gap : float
+        Relative MIP gap at which solver stops (None uses solver default)
+    time_limit : int
+        Time limit in seconds (None for no limit)
+    tee : bool
+        If set, solver log is streamed to stdout
+    keepfiles : bool
+        If set, temporary LP and solution files are kept on disk
+    """
+
+    def __init__(
+        self,
+        name,
+        solver="cbc",
+        interface="shell",
+        threads=1,
+        ratio_gap=0.005,
+        time_limit=None,
+        tee=False,
+        keepfiles=False,
+    ):
+        if solver not in BACKENDS:
+            raise ValueError(f'Unknown solver "{solver}" in solver profile "{name}"')
+        if interface not in BACKENDS[solver].interfaces:
+            raise ValueError(
+                f'Solver "{solver}" does not support interface "{interface}" '
+                f'(solver profile "{name}")'
+            )
+        self.name = name
+        self.solver = solver
+        self.interface = interface
+        self.threads = threads
+        self.ratio_gap = ratio_gap
+        self.time_limit = time_limit
+        self.tee = tee
+        self.keepfiles = keepfiles
+
+    def __repr__(self):
+        return f"<SolverProfile {self.name} ({self.solver}, {self.interface})>"
+
+    @property
+    def solve_kwargs(self):
+        """Keyword arguments passed to pyomo solve"""
+        return {"tee": self.tee, "keepfiles": self.keepfiles}
+
+    @property
+    def cmdline_options(self):
+        """Command line options passed to solver (see SolverBackend)"""
+        return BACKENDS[self.solver].get_cmdline_options(self)
+
+    def copy(self, name=None, **options):
+        """Returns copy of profile (with given name) updated by given options"""
+        profile_options = {
+            "solver": self.solver,
+            "interface": self.interface,
+            "threads": self.threads,
+            "ratio_gap": self.ratio_gap,
+            "time_limit": self.time_limit,
+            "tee": self.tee,
+            "keepfiles": self.keepfiles,
+        }
+        profile_options.update(options)
+        return SolverProfile(name or self.name, **profile_options)
+
+
+def __convert_option(name, option, value):
+    """Converts option of solver profile from config string"""
+    if option in ("solver", "interface"):
+        return value
+    if option in ("tee", "keepfiles"):
+        return value == "True"
+    if option in ("threads", "ratio_gap", "time_limit"):
+        if value == "":
+            return None
+        return float(value) if option == "ratio_gap" else int(value)
+    raise KeyError(f'Unknown option "{option}" in solver profile "{name}"')
+
+
+def register_profile(profile):
+    """Registers given solver profile (replaces profile of same name)"""
+    PROFILES[profile.name] = profile
+
+
+def load_profiles(config):
+    """
+    Registers solver profiles from given config section (i.e. SOLVER_PROFILES)
+
+    Options are given as strings (empty strings unset numeric options). Configured
+    options of existing profiles are updated; new profiles are based on default
+    profile.
+    """
+    for name, options in config.items():
+        base = PROFILES.get(name, PROFILES[DEFAULT_PROFILE])
+        profile = base.copy(
+            name,
+            **{
+                option: __convert_option(name, option, value)
+                for option, value in options.items()
+            },
+        )
+        register_profile(profile)
+
+
+def get_profile(profile=None):
+    """
+    Returns solver profile
+
+    Parameters
+    ----------
+    profile : str or SolverProfile
+        Name of registered profile or profile itself; if not given, default
+        profile is returned
+    """
+    if isinstance(profile, SolverProfile):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise KeyError(f'Unknown solver profile "{name}"')
+
+
+def is_available(profile):
+    """Returns True, if solver interface of given profile is available"""
+    from pyomo.environ import SolverFactory  # pyomo is imported on first solve
+
+    name = BACKENDS[profile.solver].interfaces[profile.interface]
+    if name not in __available:
+        __available[name] = bool(SolverFactory(name).available(exception_flag=False))
+        if not __available[name]:
+            logging.warning(f'Solver interface "{name}" is not available')
+    return __available[name]
+
+
+def solve(model, solver_profile=None, warmstart=False):
+    """
+    Solves given (oemof) model with given solver profile
+
+    Shell interface solves via oemof.solph.Model.solve; other interfaces solve
+    in-process without writing LP and solution files. If interface of profile is
+    not available, default profile is used instead.
+
+    Parameters
+    ----------
+    model : oemof.solph.Model
+        Model to solve
+    solver_profile : str or SolverProfile
+        Solver profile (defaults to default profile)
+    warmstart : bool
+        If set, solver is warm-started from current values of model (shell and
+        direct interfaces only; persistent solvers keep their state anyway)
+
+    Returns
+    -------
+    pyomo.opt.SolverResults
+        Results of solver
+    """
+    profile = get_profile(solver_profile)
+    solve_kwargs = profile.solve_kwargs
+    if profile.interface == "shell":
+        if warmstart:
+            solve_kwargs["warmstart"] = True
+        return model.solve(
+            solver=profile.solver,
+            solve_kwargs=solve_kwargs,
+            cmdline_options=profile.cmdline_options,
+        )
+    if not is_available(profile):
+        if profile.name == DEFAULT_PROFILE:
+            raise RuntimeError("Solver of default profile is not available")
+        return solve(model, DEFAULT_PROFILE, warmstart)
+
+    from pyomo.environ import SolverFactory
+    from pyomo.opt import TerminationCondition
+
+    name = BACKENDS[profile.solver].interfaces[profile.interface]
+    if profile.interface == "persistent":
+        opt = getattr(model, "persistent_solver", None)
+        if opt is None or opt.name != name:
+            opt = SolverFactory(name)
+            opt.set_instance(model)
+            model.persistent_solver = opt
+        else:
+            opt.set_objective(model.objective)
+        opt.options.update(profile.cmdline_options)
+        results = opt.solve(**solve_kwargs)
+    else:
+        opt = SolverFactory(name)
+        opt.options.update(profile.cmdline_options)
+        if warmstart and profile.interface == "direct":
+            solve_kwargs["warmstart"] = True
+        results = opt.solve(model, **solve_kwargs)
+
+    condition = results.solver.termination_condition
+    if condition != TerminationCondition.optimal:
+        logging.warning(f"Solver {name} terminated with condition {condition}")
+    model.solver_results = results
+    model.es.results = results
+    return results
+
+
+register_backend(SolverBackend("cbc", "threads", "ratioGap", "sec"))
+register_backend(SolverBackend("glpk", None, "mipgap", "tmlim"))
+register_backend(
+    SolverBackend(
+        "gurobi",
+        "Threads",
+        "MIPGap",
+        "TimeLimit",
+        interfaces={
+            "shell": "gurobi",
+            "direct": "gurobi_direct",
+            "persistent": "gurobi_persistent",
+        },
+    )
+)
+register_backend(
+    SolverBackend(
+        "cplex",
+        "threads",
+        "mip_tolerances_mipgap",
+        "timelimit",
+        interfaces={
+            "shell": "cplex",
+            "direct": "cplex_direct",
+            "persistent": "cplex_persistent",
+        },
+    )
+)
+register_backend(
+    SolverBackend(
+        "highs",
+        "threads",
+        "mip_rel_gap",
+        "time_limit",
+        interfaces={"appsi": "appsi_highs"},
+    )
+)
+
+register_profile(SolverProfile(DEFAULT_PROFILE))
+register_profile(SolverProfile("debug", tee=True, keepfiles=True))
+register_profile(SolverProfile("in_memory", solver="highs", interface="appsi"))
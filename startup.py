@@ -0,0 +1,47 @@
+"""
+Startup modes of the app and timing of startup phases
+
+Startup mode is set via STARTUP_MODE in STEMP config and can be overridden per
+process via environment variable STEMP_STARTUP_MODE:
+
+- "lazy" (default): DB engines are created at startup; scenario modules (including
+  oemof) are imported on first access (see app_settings.ScenarioModules).
+- "preload": Additionally, oemof and all activated scenario modules are imported at
+  startup (see apps.StempConfig.ready); thus, first request or task after restart of
+  a (gunicorn or celery) worker does not pay for imports.
+- "deferred": DB engines are created on first use (see app_settings.DeferredEngine);
+  intended for management commands, which often do not need all connections.
+
+Duration of each startup phase is recorded and can be reported via get_report;
+thus, cold-start latency is measurable (see also benchmark.startup).
+"""
+
+import time
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+STARTUP_MODES = ("lazy", "preload", "deferred")
+
+TIMINGS = OrderedDict()
+"""Duration (in seconds) of each startup phase of current process"""
+
+
+@contextmanager
+def phase(name):
+    """Measures duration of given startup phase"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        TIMINGS[name] = time.perf_counter() - start
+        logging.debug(f"Startup phase {name} took {TIMINGS[name]:.3f}s")
+
+
+def get_report():
+    """Returns duration of all startup phases of current process (as text)"""
+    lines = [
+        f"{name:<40}{duration * 1000:>10.1f} ms" for name, duration in TIMINGS.items()
+    ]
+    lines.append(f"{'Total':<40}{sum(TIMINGS.values()) * 1000:>10.1f} ms")
+    return "\n".join(lines)
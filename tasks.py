@@ -5,15 +5,38 @@ Simulations are run in parallel and results are stored in database.
 Only result-ID is returned to django via celery.
 """
 
-import sqlahelper
+import time
+import uuid
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from celery import states
+from celery.signals import worker_process_init, worker_process_shutdown, task_postrun
+from django.core.cache import cache
+from django.db import connections, transaction
 
 from wam.celery import app
 
 from stemp.scenarios.simulation import get_simulation_function
+from stemp.scenarios.simulation import get_solver_profile
 from stemp.scenarios.simulation import create_energysystem
-from stemp.app_settings import SCENARIO_MODULES
+from stemp.scenarios.simulation import get_model_template_key
+from stemp.scenarios.basic_setup import BaseScenario
+from stemp.app_settings import (
+    SCENARIO_MODULES,
+    SIMULATION_DEDUPLICATION_TIMEOUT,
+    SIMULATION_PENDING_GRACE_PERIOD,
+    SIMULATION_POOL_SIZE,
+    WARMING_INTERVAL,
+    RESULT_STORAGE,
+    ENGINES,
+)
 
 from stemp.models import Scenario, Parameter, Simulation
+from stemp.database import session_scope, get_pool_metrics
+from stemp.results import sequence_store
+from stemp.results.results import summarize_results, get_result_variables
 from db_apps import oemof_results
 
 
@@ -34,15 +57,324 @@ def simulate_energysystem(scenario_module, parameters):
     int
         Result ID, which points to stored results in database
     """
+    result, param_result, summary = simulate(scenario_module, parameters)
+    result_id = store_results(
+        scenario_module, parameters, result, param_result, summary=summary
+    )
+    return result_id
+
+
+@app.task
+def simulate_batch(scenarios):
+    """
+    Simulates multiple scenarios within one task and stores all results at once
+
+    Demand (household or district) is loaded only once per demand and shared between
+    all scenarios. Scenarios are simulated in a worker-local process pool (see
+    SIMULATION_POOL_SIZE). Django rows of all results are stored within one
+    transaction; oemof results are committed per result by oemof_results, thus,
+    already stored oemof results are deleted if storing any result fails (see
+    delete_results).
+
+    Parameters
+    ----------
+    scenarios : list of tuple
+        List of scenario module names and related parameters
+
+    Returns
+    -------
+    list of int
+        Result IDs (in order of given scenarios)
+    """
+    customers = {}
+    for _, parameters in scenarios:
+        demand = (parameters["demand"]["type"], parameters["demand"]["index"])
+        if demand not in customers:
+            customers[demand] = BaseScenario.get_demand(*demand)
+            customers[demand].annual_demands()
+    jobs = [
+        (
+            scenario_module,
+            parameters,
+            customers[parameters["demand"]["type"], parameters["demand"]["index"]],
+        )
+        for scenario_module, parameters in scenarios
+    ]
+    simulated = simulate_all(jobs)
+
+    result_ids = []
+    with session_scope(transactional=False) as sa_session:
+        try:
+            with transaction.atomic():
+                for (scenario_module, parameters), simulation in zip(
+                    scenarios, simulated
+                ):
+                    result, param_result, summary = simulation
+                    result_ids.append(
+                        store_results(
+                            scenario_module,
+                            parameters,
+                            result,
+                            param_result,
+                            sa_session,
+                            summary,
+                        )
+                    )
+        except Exception:
+            delete_results(sa_session, result_ids)
+            raise
+    return result_ids
+
+
+@app.task
+def warm_default_results(force=False):
+    """
+    Pre-solves default scenarios for default households (see warming module)
+
+    Returns
+    -------
+    int
+        Number of started simulations
+    """
+    # Imported here, as warming module depends on this module:
+    from stemp import warming
+
+    return warming.warm_default_results(force)
+
+
+@app.on_after_finalize.connect
+def setup_periodic_tasks(sender, **kwargs):
+    """Schedules warming of default results (via celery beat)"""
+    if WARMING_INTERVAL > 0:
+        sender.add_periodic_task(
+            WARMING_INTERVAL, warm_default_results.s(), name="stemp_warming"
+        )
+
+
+@worker_process_init.connect
+def dispose_engines(**kwargs):
+    """Pooled connections of parent process must not be used by forked workers"""
+    for engine in ENGINES.values():
+        engine.dispose()
+
+
+@worker_process_shutdown.connect
+def log_pool_metrics(**kwargs):
+    """Logs connection pool metrics (see database.PoolMetrics) of worker process"""
+    logging.info(f"Connection pool metrics: {get_pool_metrics()}")
+
+
+@task_postrun.connect(sender=simulate_energysystem)
+def release_simulation(task_id=None, args=(), **kwargs):
+    """Unregisters in-flight simulation, once task has finished (or failed)"""
+    _release_in_flight(task_id, [args])
+
+
+@task_postrun.connect(sender=simulate_batch)
+def release_batch(task_id=None, args=(), **kwargs):
+    """Unregisters in-flight simulations of batch, once task has finished (or failed)"""
+    _release_in_flight(task_id, args[0])
+
+
+def simulate(scenario_module, parameters, customer=None):
+    """
+    Creates and simulates energysystem for given scenario and parameters
+
+    Afterwards, results are summarized (see results.summarize_results); if
+    summarizing fails, summary is None and result page falls back to full analysis.
+
+    Returns
+    -------
+    tuple
+        Oemof results, input parameters and summary of the simulation
+    """
     module = SCENARIO_MODULES[scenario_module]
-    energysystem = create_energysystem(module, **parameters)
+    energysystem = create_energysystem(module, customer=customer, **parameters)
     simulation_fct = get_simulation_function(module)
-    result, param_result = simulation_fct(energysystem)
-    result_id = store_results(scenario_module, parameters, result, param_result)
-    return result_id
+    template_key = get_model_template_key(scenario_module, energysystem, parameters)
+    results, param_results = simulation_fct(
+        energysystem,
+        solver_profile=get_solver_profile(module),
+        template_key=template_key,
+        result_variables=get_result_variables(),
+    )
+    try:
+        summary = summarize_results(
+            scenario_module, energysystem, results, param_results
+        )
+    except Exception:
+        logging.exception("Could not summarize simulation results")
+        summary = None
+    return results, param_results, summary
+
+
+def simulate_all(jobs):
+    """
+    Simulates all given jobs (scenario module, parameters, customer)
+
+    If SIMULATION_POOL_SIZE is greater than one, jobs are simulated in parallel
+    within a (forked) process pool; otherwise (or if current process is not allowed
+    to start child processes, or if process pool cannot be started or breaks down),
+    jobs are simulated sequentially.
+    """
+    if (
+        SIMULATION_POOL_SIZE > 1
+        and len(jobs) > 1
+        and not multiprocessing.current_process().daemon
+    ):
+        # DB connections must not be shared with forked processes:
+        connections.close_all()
+        for engine in ENGINES.values():
+            engine.dispose()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=min(SIMULATION_POOL_SIZE, len(jobs)),
+                mp_context=multiprocessing.get_context("fork"),
+            ) as pool:
+                return list(pool.map(simulate, *zip(*jobs)))
+        except (AssertionError, OSError, BrokenProcessPool):
+            logging.warning(
+                "Could not run process pool - simulating scenarios sequentially",
+                exc_info=True,
+            )
+    return [simulate(*job) for job in jobs]
+
+
+def _get_in_flight_key(scenario_module, parameters):
+    """Returns cache key of in-flight simulation for given scenario and parameters"""
+    scenario = Scenario.objects.get_or_create(name=scenario_module)[0]
+    parameter_hash = Simulation.get_parameter_hash(
+        scenario_module, parameters, scenario.last_change
+    )
+    return f"stemp_simulation_{parameter_hash}"
+
+
+def _get_in_flight(cache_key):
+    """
+    Returns task and index (within batch) of registered in-flight simulation
+
+    Returns None, if no simulation is registered or registered simulation failed.
+    As celery reports unknown (i.e. lost) tasks as pending, simulations which are
+    still pending after SIMULATION_PENDING_GRACE_PERIOD are regarded as stale, too.
+    """
+    in_flight = cache.get(cache_key)
+    if in_flight is None or len(in_flight) != 3:
+        return None
+    task_id, index, registered = in_flight
+    task = app.AsyncResult(task_id)
+    if task.state in (states.FAILURE, states.REVOKED):
+        return None
+    if (
+        task.state == states.PENDING
+        and time.time() - registered > SIMULATION_PENDING_GRACE_PERIOD
+    ):
+        return None
+    return task, index
+
+
+def _register_in_flight(cache_key, task_id, index=None):
+    """
+    Registers simulation as in-flight
+
+    Returns already registered simulation (task and index), if an identical
+    simulation is in progress; otherwise None is returned.
+    """
+    in_flight = (task_id, index, time.time())
+    if cache.add(cache_key, in_flight, SIMULATION_DEDUPLICATION_TIMEOUT):
+        return None
+    running = _get_in_flight(cache_key)
+    if running is not None:
+        return running
+    cache.set(cache_key, in_flight, SIMULATION_DEDUPLICATION_TIMEOUT)
+    return None
+
+
+def _release_in_flight(task_id, scenarios):
+    """
+    Unregisters in-flight simulations of given task
+
+    Registrations which have been taken over by another task are kept. Results of
+    finished simulations are found via parameter hash (see Simulation.find_result).
+    """
+    for scenario_module, parameters in scenarios:
+        cache_key = _get_in_flight_key(scenario_module, parameters)
+        in_flight = cache.get(cache_key)
+        if in_flight is not None and in_flight[0] == task_id:
+            cache.delete(cache_key)
 
 
-def store_results(name, parameters, results, param_results):
+def start_simulation(scenario_module, parameters):
+    """
+    Starts simulation task, unless an identical simulation is already in progress
+
+    In-flight simulations are registered in django cache via canonical parameter
+    hash (see Simulation.get_parameter_hash). If an identical simulation has already
+    been started (and has not failed), related task is returned instead of starting
+    a duplicate task.
+    Note: Django cache must be shared between processes (i.e. redis, memcached or
+    database cache) in order to de-duplicate simulations between different workers.
+
+    Parameters
+    ----------
+    scenario_module : str
+        Name of scenario module
+    parameters : dict
+        Parameters which shall be used to create energysystem via Scenario class
+
+    Returns
+    -------
+    tuple(celery.result.AsyncResult, int)
+        Task which is (or will be) simulating given scenario and parameters and
+        index of result within task result (None, if task returns single result ID)
+    """
+    cache_key = _get_in_flight_key(scenario_module, parameters)
+    task_id = str(uuid.uuid4())
+    running = _register_in_flight(cache_key, task_id)
+    if running is not None:
+        return running
+    task = simulate_energysystem.apply_async(
+        args=(scenario_module, parameters), task_id=task_id
+    )
+    return task, None
+
+
+def start_batch_simulation(scenarios):
+    """
+    Starts one batch task for all given scenarios
+
+    Scenarios which are already simulated by another (in-flight) task are attached to
+    that task instead (see start_simulation).
+
+    Parameters
+    ----------
+    scenarios : list of tuple
+        List of scenario module names and related parameters
+
+    Returns
+    -------
+    list of tuple(celery.result.AsyncResult, int)
+        Task and index of result within task result for each given scenario
+    """
+    batch_id = str(uuid.uuid4())
+    batch = []
+    pending = []
+    for scenario_module, parameters in scenarios:
+        cache_key = _get_in_flight_key(scenario_module, parameters)
+        running = _register_in_flight(cache_key, batch_id, len(batch))
+        if running is not None:
+            pending.append(running)
+        else:
+            pending.append((None, len(batch)))
+            batch.append((scenario_module, parameters))
+    if batch:
+        task = simulate_batch.apply_async(args=(batch,), task_id=batch_id)
+        pending = [(task if t is None else t, index) for t, index in pending]
+    return pending
+
+
+def store_results(
+    name, parameters, results, param_results, sa_session=None, summary=None
+):
     """
     Results from oemof simulation are stored in database
 
@@ -50,6 +382,8 @@ def store_results(name, parameters, results, param_results):
     Oemof results are stored via oemof_db package using SQLAlchemy.
     Result-ID of oemof results is stored in Simulation model together with scenario and
     parameters.
+    If RESULT_STORAGE is set to "columnar", sequences are stored in column-oriented
+    sequence store instead of result database (see results.sequence_store).
 
     Parameters
     ----------
@@ -61,23 +395,91 @@ def store_results(name, parameters, results, param_results):
         Oemof results of the simulation
     param_results : dict
         Oemof input parameters of the simulation
+    sa_session : sqlalchemy.orm.Session
+        SQLAlchemy session to store oemof results with (if not given, a new session
+        is opened and closed via database.session_scope)
+    summary : dict
+        Summary of aggregation data (see results.summarize_results)
 
     Returns
     -------
     int
         Result-ID of stored simulation
     """
+    if sa_session is None:
+        with session_scope(transactional=False) as session:
+            return store_results(
+                name, parameters, results, param_results, session, summary
+            )
+
     # Store scenario, parameter and setup via Django ORM
     scenario = Scenario.objects.get_or_create(name=name)[0]
     parameter = Parameter.objects.get_or_create(data=parameters)[0]
 
+    if RESULT_STORAGE == "columnar":
+        (db_param_results, db_results), sequences = sequence_store.split_data(
+            param_results, results
+        )
+    else:
+        db_param_results, db_results = param_results, results
+
     # Store oemeof results via SQLAlchemy:
-    sa_session = sqlahelper.get_session()
-    result_id = oemof_results.store_results(sa_session, param_results, results)
-    sa_session.close()
+    result_id = oemof_results.store_results(sa_session, db_param_results, db_results)
+    try:
+        if RESULT_STORAGE == "columnar":
+            sequence_store.write_data(result_id, sequences)
 
-    # Store simulation in Django ORM:
-    Simulation.objects.get_or_create(
-        scenario=scenario, parameter=parameter, result_id=result_id
-    )
+        # Store simulation in Django ORM:
+        Simulation.objects.get_or_create(
+            scenario=scenario,
+            parameter=parameter,
+            result_id=result_id,
+            defaults={
+                "parameter_hash": Simulation.get_parameter_hash(
+                    name, parameters, scenario.last_change
+                ),
+                "summary": summary,
+            },
+        )
+    except Exception:
+        delete_results(sa_session, [result_id])
+        raise
     return result_id
+
+
+def delete_results(sa_session, result_ids):
+    """
+    Deletes stored oemof results (and related sequences) of given result IDs
+
+    Used to remove orphaned oemof results, if related simulations could not be
+    stored in Django ORM. Errors are logged only, as original error shall be raised.
+    """
+    if len(result_ids) == 0:
+        return
+    try:
+        input_results = (
+            sa_session.query(oemof_results.OemofInputResult)
+            .filter(oemof_results.OemofInputResult.input_result_id.in_(result_ids))
+            .all()
+        )
+        data_ids = [
+            data_id
+            for input_result in input_results
+            for data_id in (input_result.input_id, input_result.result_id)
+        ]
+        for table in (oemof_results.OemofScalar, oemof_results.OemofSequence):
+            sa_session.query(table).filter(table.data_id.in_(data_ids)).delete(
+                synchronize_session=False
+            )
+        for input_result in input_results:
+            sa_session.delete(input_result)
+        sa_session.flush()
+        sa_session.query(oemof_results.OemofData).filter(
+            oemof_results.OemofData.data_id.in_(data_ids)
+        ).delete(synchronize_session=False)
+        sa_session.commit()
+    except Exception:
+        sa_session.rollback()
+        logging.exception(f"Could not delete orphaned results {result_ids}")
+    for result_id in result_ids:
+        sequence_store.delete_sequences(result_id)
@@ -0,0 +1,73 @@
+import os
+import numpy
+import pandas
+import pytest
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from oemof.solph import EnergySystem, Bus, Flow, Sink, Source, Transformer, Investment
+
+from stemp.scenarios.analytic import (
+    evaluate,
+    compare_results,
+    NotAnalyticallySolvable,
+)
+from stemp.scenarios.basic_setup import AdvancedLabel
+from stemp.scenarios.simulation import default_simulate_fct
+
+INDEX = pandas.date_range("2016-01-01", periods=48, freq="H")
+DEMAND = 2 + numpy.sin(numpy.linspace(0, 4 * numpy.pi, len(INDEX)))
+
+
+def get_energysystem(gas_price=0.06, backup=False):
+    """Returns energysystem shaped like primary input scenarios (i.e. gas)"""
+    energysystem = EnergySystem(timeindex=INDEX)
+    b_gas = Bus(label=AdvancedLabel("b_gas", type="Bus"), balanced=False)
+    b_th = Bus(label=AdvancedLabel("b_demand_th", type="Bus"))
+    demand = Sink(
+        label=AdvancedLabel("demand_th", type="Sink", tags=("demand",)),
+        inputs={b_th: Flow(nominal_value=1, actual_value=DEMAND, fixed=True)},
+    )
+    excess = Sink(label=AdvancedLabel("excess_th", type="Sink"), inputs={b_th: Flow()})
+    heating = Transformer(
+        label=AdvancedLabel(
+            "gas_heating", type="Transformer", tags=("primary_source",)
+        ),
+        inputs={
+            b_gas: Flow(variable_costs=gas_price, investment=Investment(ep_costs=50))
+        },
+        outputs={b_th: Flow(variable_costs=0.01)},
+        conversion_factors={b_th: 0.9},
+    )
+    energysystem.add(b_gas, b_th, demand, excess, heating)
+    if backup:
+        energysystem.add(
+            Source(
+                label=AdvancedLabel("backup", type="Source"),
+                outputs={b_th: Flow(variable_costs=1)},
+            )
+        )
+    return energysystem
+
+
+def test_analytic_evaluation_matches_solver():
+    solver_results, _ = default_simulate_fct(get_energysystem())
+    results, _ = evaluate(get_energysystem())
+    assert compare_results(solver_results, results) == []
+
+
+@pytest.mark.parametrize(
+    "setup",
+    [{"gas_price": -0.06}, {"backup": True}],
+    ids=["negative_costs", "extra_flow"],
+)
+def test_unexpected_energysystem_is_not_analytically_solvable(setup):
+    with pytest.raises(NotAnalyticallySolvable):
+        evaluate(get_energysystem(**setup))
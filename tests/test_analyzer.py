@@ -0,0 +1,136 @@
+import os
+import pytest
+from types import SimpleNamespace
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from oemof.solph import analyzer as an
+
+from stemp.app_settings import ACTIVATED_SCENARIOS, SCENARIO_MODULES
+from stemp.constants import DemandType
+from stemp.results import analyzer, results
+from stemp.scenarios import simulation
+from stemp.warming import get_default_parameters
+
+# Former (per flow) analyzers, which are replaced by vectorized analyzers:
+class TotalInvestmentAnalyzer(an.Analyzer):
+    """
+    Calculates total investment costs for whole system
+
+    total_invest = capex * size
+    """
+    requires = ("results", "param_results")
+    required_variables = ()
+    depends_on = (an.SizeAnalyzer,)
+
+    def analyze(self, *args):
+        super(TotalInvestmentAnalyzer, self).analyze(*args)
+        seq_result = self._get_dep_result(an.SizeAnalyzer)
+        try:
+            psc = self.psc(args)
+            size = seq_result[args]
+            invest = psc["investment_capex"]
+        except KeyError:
+            return
+        result = invest * size
+        self.result[args] = result
+        self.total += result
+
+
+class CO2Analyzer(an.Analyzer):
+    """
+    Calculates proportional CO2 emission for each component
+
+    co2_emission_prop = CO2_emission * (flow_component / total_demand)
+    """
+    requires = ("results", "param_results")
+    required_variables = ()
+    depends_on_former = (an.NodeBalanceAnalyzer,)
+
+    def __init__(self):
+        super(CO2Analyzer, self).__init__()
+        self.demand = 0.0
+
+    def init_analyzer(self):
+        nb_result = self._get_dep_result(an.NodeBalanceAnalyzer)
+        # Find all demands:
+        for node, node_balance in nb_result.items():
+            try:
+                if node.tags is not None and "demand" in node.tags:
+                    self.demand += sum(node_balance["input"].values())
+            except AttributeError:
+                pass
+
+    def analyze(self, *args):
+        super(CO2Analyzer, self).analyze(*args)
+        seq_result = self._get_dep_result(an.SequenceFlowSumAnalyzer)
+        try:
+            psc = self.psc(args)
+            flow = seq_result[args]
+            co2 = psc["co2_emissions"]
+        except KeyError:
+            return
+        result = co2 * flow / self.demand
+        self.result[args] = result
+        self.total += result
+
+
+class FossilCostsAnalyzer(an.Analyzer):
+    """
+    Calculates "Brennstoffkosten" for each component/system
+
+    All variable costs of components marked as "fossil" are summed up.
+    """
+    required_variables = ()
+    depends_on = (an.VariableCostAnalyzer,)
+
+    def analyze(self, *args):
+        super(FossilCostsAnalyzer, self).analyze(*args)
+        vc_result = self._get_dep_result(an.VariableCostAnalyzer)
+        try:
+            psc = self.psc(args)
+            if psc["is_fossil"]:
+                result = vc_result[args]
+            else:
+                return
+        except KeyError:
+            return
+        self.result[args] = result
+        self.total += result
+
+
+REPLACED_ANALYZERS = {
+    TotalInvestmentAnalyzer: analyzer.VectorizedTotalInvestmentAnalyzer,
+    CO2Analyzer: analyzer.VectorizedCO2Analyzer,
+    FossilCostsAnalyzer: analyzer.VectorizedFossilCostsAnalyzer,
+}
+
+
+@pytest.mark.parametrize("scenario", ACTIVATED_SCENARIOS)
+def test_vectorized_analyzers_match_former_analyzers(scenario):
+    parameters = get_default_parameters(scenario, DemandType.Single, 1)
+    module = SCENARIO_MODULES[scenario]
+    energysystem = simulation.create_energysystem(module, **parameters)
+    simulated = simulation.get_simulation_function(module)(energysystem)
+    result = results.get_simulated_result(scenario, energysystem, *simulated)
+    analyzers = results.plan_analyzers(
+        SimpleNamespace(analyzer=analyzer_class)
+        for analyzers in REPLACED_ANALYZERS.items()
+        for analyzer_class in analyzers
+    )
+    results.analyze(result, analyzers)
+
+    for former, vectorized in REPLACED_ANALYZERS.items():
+        expected = result.analysis.get_analyzer(former)
+        actual = result.analysis.get_analyzer(vectorized)
+        assert actual.result.keys() == expected.result.keys()
+        for args, value in expected.result.items():
+            assert actual.result[args] == pytest.approx(value)
+        assert actual.total == pytest.approx(expected.total)
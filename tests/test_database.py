@@ -0,0 +1,40 @@
+import os
+import pytest
+import transaction
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from stemp.database import session_scope
+
+
+def test_nested_scopes_share_session_and_transaction():
+    commits = []
+    with session_scope() as outer:
+        outer_transaction = transaction.get()
+        outer_transaction.addAfterCommitHook(commits.append)
+        with session_scope() as inner:
+            assert inner is outer
+            assert transaction.get() is outer_transaction
+        # Inner scope neither commits nor aborts outer transaction:
+        assert commits == []
+        assert transaction.get() is outer_transaction
+    assert commits == [True]
+
+
+def test_error_in_nested_scope_aborts_outer_transaction():
+    commits = []
+    with pytest.raises(RuntimeError):
+        with session_scope():
+            outer_transaction = transaction.get()
+            outer_transaction.addAfterCommitHook(commits.append)
+            with session_scope():
+                raise RuntimeError("Nested error")
+    assert commits == []
+    assert transaction.get() is not outer_transaction
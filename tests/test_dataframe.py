@@ -0,0 +1,145 @@
+import os
+import re
+import numpy
+import pandas
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from stemp.constants import RESULT_COLORS
+from stemp.visualizations.dataframe import ComparisonDataframe
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), "golden")
+
+CATEGORIES = [
+    "Wärmekosten",
+    "Investitionskosten",
+    "Brennstoffkosten",
+    "CO2 Emissionen",
+    "Primärenergiefaktor",
+    "Primärenergie",
+    "Vorteile",
+    "Nachteile",
+]
+
+
+def get_comparison_dataframe(data):
+    comparison = ComparisonDataframe(
+        pandas.DataFrame(data, index=CATEGORIES, dtype=object)
+    )
+    comparison.information = {"Wärmekosten": "Kosten pro kWh"}
+    return comparison
+
+
+def test_comparison_dataframe_matches_golden_html():
+    comparison = get_comparison_dataframe(
+        {
+            "Gasheizung": [
+                0.12,
+                8000.0,
+                1200.0,
+                250.0,
+                1.1,
+                20000.0,
+                "Pro Gas",
+                "Con Gas",
+            ],
+            "Wärmepumpe": [
+                0.15,
+                15000.0,
+                600.0,
+                180.0,
+                1.4,
+                12000.0,
+                "Pro WP",
+                "Con WP",
+            ],
+            "BHKW": [
+                0.135,
+                21000.5,
+                900.0,
+                210.0,
+                0.7,
+                9000.0,
+                "Pro BHKW",
+                "Con BHKW",
+            ],
+        }
+    )
+    with open(os.path.join(GOLDEN_PATH, "comparison_dataframe.html")) as golden:
+        assert comparison.render_data() == golden.read()
+
+
+def test_single_scenario_is_not_colored():
+    comparison = get_comparison_dataframe(
+        {"Gasheizung": [0.12, 8000.0, 1200.0, 250.0, 1.1, 20000.0, "Pro", "Con"]}
+    )
+    assert "background-color" not in comparison.render_data()
+
+
+def get_baseline_row_styles(row, bins):
+    """Cell colors of row as set by former Styler rendering (__style_color)"""
+    row_range = row.max() - row.min()
+    if abs(row_range) < 1e-14:
+        return [""] * len(row)
+    styles = []
+    for value in row:
+        color_index = numpy.digitize([(value - row.min()) / row_range], bins)[0]
+        styles.append(RESULT_COLORS[min(color_index, len(RESULT_COLORS) - 1)].style)
+    return styles
+
+
+def get_baseline_cells(comparison):
+    """Text and color per cell as set by former format_row_wise and __style_color"""
+    data = comparison.data
+    cells = {}
+    for row_num, (category, row) in enumerate(data.iterrows()):
+        formatter = comparison.formatters.get(category, lambda value: value)
+        if len(data.columns) > 1 and category in comparison.colored:
+            styles = get_baseline_row_styles(row.astype(float), comparison.bins)
+        else:
+            styles = [""] * len(row)
+        for col_num, (value, style) in enumerate(zip(row, styles)):
+            cells[row_num, col_num] = (str(formatter(value)), style)
+    return cells
+
+
+def get_rendered_cells(html):
+    """Text and color per cell of rendered table"""
+    cells = re.findall(
+        r'<td class="data row(\d+) col(\d+)" style="text-align: \w+;\s?([^"]*)">'
+        r"(.*?)</td>",
+        html,
+        re.S,
+    )
+    return {(int(row), int(col)): (text, style) for row, col, style, text in cells}
+
+
+def test_cells_match_baseline_styler_rendering():
+    random = numpy.random.RandomState(0)
+    for columns in (2, 3, 5):
+        # Rounded values in order to get ties within rows:
+        values = random.randint(0, 4, size=(6, columns)) * [
+            [0.05],
+            [5000.0],
+            [400.0],
+            [80.0],
+            [0.4],
+            [4000.0],
+        ]
+        values[0, :] = values[0, 0]  # Row without range is not colored
+        data = {
+            f"Szenario {column}": list(values[:, column])
+            + [f"Pro {column}", f"Con {column}"]
+            for column in range(columns)
+        }
+        comparison = get_comparison_dataframe(data)
+        expected = get_baseline_cells(comparison)
+        rendered = get_rendered_cells(comparison.render_data())
+        assert rendered == expected
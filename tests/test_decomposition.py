@@ -0,0 +1,73 @@
+import os
+import pandas
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from oemof.solph import EnergySystem, Bus, Flow, Source, Investment
+
+from stemp.scenarios import decomposition
+
+INDEX = pandas.date_range("2017-01-01", periods=4, freq="H")
+BOILER = ("boiler", "b_heat")
+BHKW = ("bhkw", "b_heat")
+
+
+def get_energysystem():
+    energysystem = EnergySystem(timeindex=INDEX)
+    heat = Bus(label="b_heat")
+    energysystem.add(
+        heat,
+        Source(
+            label="boiler", outputs={heat: Flow(investment=Investment(ep_costs=10))}
+        ),
+        Source(label="bhkw", outputs={heat: Flow(investment=Investment(ep_costs=20))}),
+    )
+    return energysystem
+
+
+def get_period_results():
+    """Results of two periods; BHKW size is fixed, boiler is invested per period"""
+    return [
+        {
+            BOILER: {
+                "scalars": pandas.Series({"invest": invest}),
+                "sequences": pandas.DataFrame({"flow": boiler_flow}),
+            },
+            BHKW: {
+                "scalars": pandas.Series(dtype=float),
+                "sequences": pandas.DataFrame({"flow": bhkw_flow}),
+            },
+        }
+        for invest, boiler_flow, bhkw_flow in (
+            (3.0, [1.0, 3.0], [2.0, 2.0]),
+            (5.0, [5.0, 0.0], [2.0, 1.0]),
+        )
+    ]
+
+
+def test_stitch_results():
+    results = decomposition.stitch_results(get_period_results(), {BHKW: 2.5}, INDEX)
+    assert results.keys() == {BOILER, BHKW}
+    assert results[BOILER]["sequences"].index.equals(INDEX)
+    assert list(results[BOILER]["sequences"]["flow"]) == [1.0, 3.0, 5.0, 0.0]
+    assert list(results[BHKW]["sequences"]["flow"]) == [2.0, 2.0, 2.0, 1.0]
+    assert results[BOILER]["scalars"]["invest"] == 5.0
+    assert results[BHKW]["scalars"]["invest"] == 2.5
+
+
+def test_objective_uses_stitched_investments():
+    period_results = get_period_results()
+    results = decomposition.stitch_results(period_results, {BHKW: 2.5}, INDEX)
+    # Objectives of periods contain variable costs and investment of period:
+    objectives = [100 + 10 * 3.0, 200 + 10 * 5.0]
+    objective = decomposition.get_objective(
+        get_energysystem(), period_results, objectives, results
+    )
+    assert objective == 100 + 200 + 10 * 5.0 + 20 * 2.5
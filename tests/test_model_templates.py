@@ -0,0 +1,50 @@
+import os
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from stemp.app_settings import SCENARIO_MODULES
+from stemp.constants import DemandType
+from stemp.scenarios import simulation
+from stemp.warming import get_default_parameters
+
+SCENARIO = "gas"
+
+
+def simulate(parameters, use_template):
+    energysystem = simulation.create_energysystem(
+        SCENARIO_MODULES[SCENARIO], **parameters
+    )
+    template_key = (
+        simulation.get_model_template_key(SCENARIO, energysystem, parameters)
+        if use_template
+        else None
+    )
+    return simulation.default_simulate_fct(energysystem, template_key=template_key)
+
+
+def test_template_variant_matches_fresh_simulation():
+    simulation.MODEL_TEMPLATES.max_size = 4
+    simulation.MODEL_TEMPLATES.clear()
+    parameters = get_default_parameters(SCENARIO, DemandType.Single, 1)
+    variant = {
+        component: dict(component_parameters)
+        for component, component_parameters in parameters.items()
+    }
+    variant["Gas"]["capex"] = float(variant["Gas"]["capex"]) * 1.5
+    variant["General"]["gas_price"] = float(variant["General"]["gas_price"]) * 2
+
+    simulate(parameters, True)
+    _, template_params = simulate(variant, True)
+    _, fresh_params = simulate(variant, False)
+
+    assert template_params.keys() == fresh_params.keys()
+    for key, values in fresh_params.items():
+        assert values["scalars"].equals(template_params[key]["scalars"])
+        assert values["sequences"].equals(template_params[key]["sequences"])
@@ -0,0 +1,103 @@
+import os
+import numpy
+import pandas
+import pytest
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from oemof import outputlib
+from oemof.solph import EnergySystem, Bus, Flow, Sink, Source, Investment, Model
+from oemof.solph.components import GenericStorage
+
+from stemp import solver
+from stemp.scenarios.simulation import get_variable_results
+from stemp.scenarios.timeseries_aggregation import aggregate_energysystem
+
+INDEX = pandas.date_range("2016-01-01", periods=48, freq="H")
+VARIABLES = ("flow", "invest")
+
+
+def get_energysystem():
+    """Returns energysystem with invested flows and storage"""
+    energysystem = EnergySystem(timeindex=INDEX)
+    b_th = Bus(label="b_th")
+    energysystem.add(
+        b_th,
+        Source(
+            label="boiler",
+            outputs={
+                b_th: Flow(
+                    variable_costs=1 + numpy.cos(numpy.linspace(0, 4, len(INDEX))),
+                    investment=Investment(ep_costs=40),
+                )
+            },
+        ),
+        Sink(
+            label="demand",
+            inputs={
+                b_th: Flow(
+                    nominal_value=1,
+                    actual_value=2 + numpy.sin(numpy.linspace(0, 8, len(INDEX))),
+                    fixed=True,
+                )
+            },
+        ),
+        Sink(label="excess", inputs={b_th: Flow()}),
+        GenericStorage(
+            label="storage",
+            inputs={b_th: Flow()},
+            outputs={b_th: Flow()},
+            investment=Investment(ep_costs=5),
+            loss_rate=0.01,
+        ),
+    )
+    return energysystem
+
+
+def solve(aggregation=None):
+    energysystem = get_energysystem()
+    model_kwargs = {}
+    if aggregation is not None:
+        model_kwargs["timeincrement"] = aggregate_energysystem(
+            energysystem, aggregation
+        ).weights
+    model = Model(energysystem, **model_kwargs)
+    solver.solve(model)
+    return model
+
+
+@pytest.mark.parametrize("aggregation", [None, "2H"], ids=["hourly", "aggregated"])
+def test_lean_extraction_matches_oemof_results(aggregation):
+    model = solve(aggregation)
+    expected = outputlib.processing.results(model)
+    actual = get_variable_results(model, set(VARIABLES))
+
+    expected_keys = {
+        key
+        for key, values in expected.items()
+        if "flow" in values["sequences"] or "invest" in values["scalars"]
+    }
+    assert set(actual) == expected_keys
+    for key in expected_keys:
+        sequences = expected[key]["sequences"]
+        if "flow" in sequences:
+            assert actual[key]["sequences"].index.equals(sequences.index)
+            numpy.testing.assert_allclose(
+                actual[key]["sequences"]["flow"].values, sequences["flow"].values
+            )
+        else:
+            assert "flow" not in actual[key]["sequences"]
+        scalars = expected[key]["scalars"]
+        if "invest" in scalars:
+            assert actual[key]["scalars"]["invest"] == pytest.approx(
+                scalars["invest"]
+            )
+        else:
+            assert "invest" not in actual[key]["scalars"]
@@ -0,0 +1,72 @@
+import os
+import pandas
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from db_apps import oemof_results
+from stemp.database import session_scope
+from stemp.results.results import restore_results_bulk
+from stemp.scenarios.basic_setup import AdvancedLabel
+from stemp.tasks import delete_results
+
+SOURCE = str(AdvancedLabel("gas", "Source", ("fuel",)))
+BUS = str(AdvancedLabel("b_gas", "Bus", ()))
+INDEX = pandas.date_range("2017-01-01", periods=3, freq="H")
+
+INPUT_DATA = {
+    (SOURCE, BUS): {
+        "scalars": pandas.Series(
+            {"variable_costs": 0.5, "nominal_value": 10, "fixed": False, "max": None}
+        ),
+        "sequences": pandas.DataFrame({"actual_value": [1.0, 0.5, 0.0]}, index=INDEX),
+    },
+    (BUS, "None"): {
+        "scalars": pandas.Series({"label": "b_gas"}),
+        "sequences": pandas.DataFrame(),
+    },
+}
+RESULT_DATA = {
+    (SOURCE, BUS): {
+        "scalars": pandas.Series({"invest": 12.5}),
+        "sequences": pandas.DataFrame({"flow": [2.0, 1.0, 0.0]}, index=INDEX),
+    }
+}
+
+
+def test_bulk_restore_matches_restore_results():
+    with session_scope(transactional=False) as session:
+        result_ids = [
+            oemof_results.store_results(session, INPUT_DATA, RESULT_DATA)
+            for _ in range(2)
+        ]
+        try:
+            restored = restore_results_bulk(session, result_ids + [-1])
+            assert set(restored) == set(result_ids)
+            for result_id in result_ids:
+                expected = oemof_results.restore_results(
+                    session,
+                    result_id,
+                    restore_none_type=True,
+                    advanced_label=AdvancedLabel,
+                )
+                for expected_data, data in zip(expected, restored[result_id]):
+                    assert expected_data.keys() == data.keys()
+                    for nodes, values in expected_data.items():
+                        pandas.testing.assert_series_equal(
+                            values["scalars"].sort_index(),
+                            data[nodes]["scalars"].sort_index(),
+                        )
+                        pandas.testing.assert_frame_equal(
+                            values["sequences"],
+                            data[nodes]["sequences"],
+                            check_like=True,
+                        )
+        finally:
+            delete_results(session, result_ids)
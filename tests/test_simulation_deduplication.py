@@ -0,0 +1,56 @@
+import os
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+from django.core.cache import cache
+from wam.celery import app
+from stemp import tasks
+
+# Local broker stand-in - tasks are queued, but never executed:
+app.conf.update(broker_url="memory://", result_backend="cache+memory://")
+
+PARAMETERS = {"General": {"wacc": 3}, "demand": {"type": 0, "index": 1}}
+
+
+def test_identical_simulations_share_task():
+    cache.clear()
+    first, _ = tasks.start_simulation("gas", PARAMETERS)
+    # Same parameters in different order and with floats instead of integers:
+    second, _ = tasks.start_simulation(
+        "gas", {"demand": {"index": 1, "type": 0.0}, "General": {"wacc": 3.0}}
+    )
+    assert first.id == second.id
+
+
+def test_different_parameters_start_new_task():
+    cache.clear()
+    first, _ = tasks.start_simulation("gas", PARAMETERS)
+    second, _ = tasks.start_simulation(
+        "gas", {"General": {"wacc": 4}, "demand": {"type": 0, "index": 1}}
+    )
+    assert first.id != second.id
+
+
+def test_failed_simulation_is_restarted():
+    cache.clear()
+    first, _ = tasks.start_simulation("gas", PARAMETERS)
+    app.backend.mark_as_failure(first.id, RuntimeError("Simulation failed"))
+    second, _ = tasks.start_simulation("gas", PARAMETERS)
+    assert first.id != second.id
+
+
+def test_batch_attaches_to_in_flight_simulation():
+    cache.clear()
+    first, _ = tasks.start_simulation("gas", PARAMETERS)
+    other = {"General": {"wacc": 4}, "demand": {"type": 0, "index": 1}}
+    pending = tasks.start_batch_simulation([("gas", PARAMETERS), ("gas", other)])
+    assert pending[0] == (first, None)
+    assert pending[1][0].id != first.id
+    assert pending[1][1] == 0
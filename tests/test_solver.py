@@ -0,0 +1,126 @@
+import os
+import pytest
+from types import SimpleNamespace
+from django.core.wsgi import get_wsgi_application
+
+# Change path:
+kopy_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+os.chdir(kopy_path)
+
+os.environ["DJANGO_DATABASE"] = "default"
+os.environ["DJANGO_SETTINGS_MODULE"] = "wam.settings"
+application = get_wsgi_application()
+
+import pyomo.environ
+from pyomo.opt import TerminationCondition
+
+from stemp import solver
+
+
+def test_default_profile_suits_production():
+    profile = solver.get_profile()
+    assert profile.solve_kwargs == {"tee": False, "keepfiles": False}
+    assert profile.cmdline_options == {"threads": 1, "ratioGap": 0.005}
+
+
+def test_options_are_translated_per_backend():
+    profile = solver.get_profile().copy(
+        "test", solver="gurobi", threads=4, time_limit=60
+    )
+    assert profile.cmdline_options == {"Threads": 4, "MIPGap": 0.005, "TimeLimit": 60}
+
+    with pytest.raises(ValueError):
+        solver.get_profile().copy("test", interface="persistent")
+
+
+def test_profiles_are_loaded_from_config():
+    solver.load_profiles(
+        {"test_config": {"threads": "2", "ratio_gap": "", "tee": "True"}}
+    )
+    profile = solver.get_profile("test_config")
+    assert profile.cmdline_options == {"threads": 2}
+    assert profile.tee
+    with pytest.raises(KeyError):
+        solver.load_profiles({"test_config": {"gap": "0.1"}})
+    with pytest.raises(KeyError):
+        solver.get_profile("unknown")
+
+
+class FakeModel(object):
+    """Stands in for oemof model and records solves via shell interface"""
+
+    objective = "objective"
+
+    def __init__(self):
+        self.es = SimpleNamespace()
+        self.shell_solves = []
+
+    def solve(self, solver, solve_kwargs, cmdline_options):
+        self.shell_solves.append((solver, cmdline_options))
+
+
+class FakeSolver(object):
+    """Stands in for in-process pyomo solver"""
+
+    def __init__(self, name):
+        self.name = name
+        self.options = {}
+        self.instance = None
+        self.objectives = []
+        self.solves = 0
+
+    def set_instance(self, model):
+        self.instance = model
+
+    def set_objective(self, objective):
+        self.objectives.append(objective)
+
+    def solve(self, *args, **kwargs):
+        self.solves += 1
+        return SimpleNamespace(
+            solver=SimpleNamespace(termination_condition=TerminationCondition.optimal)
+        )
+
+
+@pytest.fixture
+def solver_factory(monkeypatch):
+    solvers = []
+
+    def create_solver(name):
+        solvers.append(FakeSolver(name))
+        return solvers[-1]
+
+    monkeypatch.setattr(pyomo.environ, "SolverFactory", create_solver)
+    monkeypatch.setattr(solver, "is_available", lambda profile: True)
+    return solvers
+
+
+def test_in_process_interface_solves_without_shell(solver_factory):
+    model = FakeModel()
+    results = solver.solve(model, "in_memory")
+    assert model.shell_solves == []
+    assert [opt.name for opt in solver_factory] == ["appsi_highs"]
+    assert solver_factory[0].options == {"threads": 1, "mip_rel_gap": 0.005}
+    assert model.solver_results is results
+    assert model.es.results is results
+
+
+def test_persistent_solver_is_reused(solver_factory):
+    profile = solver.get_profile().copy(
+        "test_persistent", solver="gurobi", interface="persistent"
+    )
+    model = FakeModel()
+    solver.solve(model, profile)
+    solver.solve(model, profile)
+    assert len(solver_factory) == 1
+    assert solver_factory[0].instance is model
+    assert solver_factory[0].objectives == [model.objective]
+    assert solver_factory[0].solves == 2
+
+
+def test_unavailable_interface_falls_back_to_default(solver_factory, monkeypatch):
+    monkeypatch.setattr(solver, "is_available", lambda profile: False)
+    model = FakeModel()
+    solver.solve(model, "in_memory")
+    assert solver_factory == []
+    assert model.shell_solves == [("cbc", {"threads": 1, "ratioGap": 0.005})]
@@ -5,8 +5,10 @@ import logging
 
 from stemp.app_settings import SCENARIO_MODULES
 from stemp.constants import DemandType, DistrictStatus
-from .tasks import simulate_energysystem
+from .tasks import start_simulation, start_batch_simulation
 from stemp.models import Simulation, Household, District
+from stemp.oep_models import OEPScenario
+from stemp.forms import ParameterForm
 
 
 class SessionSimulation(object):
@@ -25,40 +27,56 @@ class SessionSimulation(object):
         self.changed_parameters = None
         self.result_id = None
         self.pending = None
+        self.pending_index = None
+
+    def get_scenario_parameters(self):
+        """
+        Returns scenario parameters (including dynamic parameters) for current demand
+        """
+        scenario_parameters = OEPScenario.get_scenario_parameters(
+            self.name, self.session.demand_type
+        )
+        # Load additional dynamic parameters from module:
+        return self.module.Scenario.add_dynamic_parameters(self, scenario_parameters)
+
+    def init_default_parameters(self):
+        """
+        Sets default parameters of scenario
+
+        Parameters are set as if parameter page had been submitted without changes.
+        """
+        parameters = [(self.name, self.get_scenario_parameters())]
+        initial = {
+            name: field.initial for name, field in ParameterForm(parameters).fields.items()
+        }
+        parameter_form = ParameterForm(parameters, initial)
+        if not parameter_form.is_valid():
+            raise ValueError(
+                f'Invalid default parameters for scenario "{self.name}": '
+                f"{parameter_form.errors}"
+            )
+        self.parameter = dict(parameter_form.prepared_data(self.name))
 
     def check_for_result(self):
         """
         Checks if result for given scenario and parameters is already simulated
 
-        Following checks are made:
-            * Find scenario name
-            * Check if scenario file has been changed recently
-            * Check if params match
+        Simulation is looked up via canonical hash of scenario name, parameters and
+        date of last scenario change (see Simulation.get_parameter_hash); thus,
+        outdated simulations are not found.
 
         Returns
         -------
         int:
             Simulation ID if results were found, else None
         """
-        for simulation in Simulation.objects.filter(scenario__name=self.name):
-
-            # Check if result is outdated:
-            if simulation.date < simulation.scenario.last_change:
-                continue
-
-            if simulation.parameter.data != self.parameter:
-                continue
-
-            # Simulation found:
-            return simulation.result_id
-
-        # Simulation not found:
-        return None
+        return Simulation.find_result(self.name, self.parameter)
 
     def load_or_simulate(self):
         """
         Checks if current scenario is simulated already and sets result ID if so.
-        Otherwise it starts simulation of given scenario.
+        Otherwise it starts simulation of given scenario (or attaches to an identical
+        simulation which is already in progress).
         """
         self.include_demand()
 
@@ -67,7 +85,9 @@ class SessionSimulation(object):
         if result_id is not None:
             self.result_id = result_id
         else:
-            self.pending = simulate_energysystem.delay(self.name, self.parameter)
+            self.pending, self.pending_index = start_simulation(
+                self.name, self.parameter
+            )
 
     def is_pending(self):
         """
@@ -82,10 +102,15 @@ class SessionSimulation(object):
             return False
         if self.pending.ready():
             try:
-                self.result_id = self.pending.get()
+                result = self.pending.get()
+                self.result_id = (
+                    result if self.pending_index is None else result[self.pending_index]
+                )
             except Exception:
                 logging.exception("Simulation task failed")
                 self.result_id = None
+            self.pending = None
+            self.pending_index = None
             return False
         return True
 
@@ -127,6 +152,35 @@ class UserSession(object):
         for scenario in scenario_names:
             self.scenarios.append(SessionSimulation(scenario, self))
 
+    def load_or_simulate(self):
+        """
+        Loads stored results of all scenarios and simulates missing scenarios
+
+        All scenarios without stored results are simulated within one batch task
+        (see tasks.simulate_batch); each scenario stores task and index of its result
+        within batch result.
+        """
+        missing = []
+        for scenario in self.scenarios:
+            scenario.include_demand()
+            result_id = scenario.check_for_result()
+            if result_id is not None:
+                scenario.result_id = result_id
+            else:
+                missing.append(scenario)
+        if len(missing) == 0:
+            return
+        pending = start_batch_simulation(
+            [(scenario.name, scenario.parameter) for scenario in missing]
+        )
+        for scenario, (task, index) in zip(missing, pending):
+            scenario.pending = task
+            scenario.pending_index = index
+
+    def is_pending(self):
+        """Returns True, if simulation of any scenario is still running"""
+        return any([scenario.is_pending() for scenario in self.scenarios])
+
     def reset_demand(self):
         """Resets current demand options"""
         self.demand_type = None
@@ -1,6 +1,7 @@
 import os
 import pandas
 
+from django.http import HttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
 from django.views.generic import TemplateView
 from django.urls import reverse
@@ -12,7 +13,6 @@ from user_sessions.utils import check_session_method
 from stemp import app_settings
 from stemp.constants import DemandType
 from stemp.models import Household, Simulation
-from stemp.oep_models import OEPScenario
 from stemp import models, forms
 from stemp.results import results
 from stemp.visualizations import highcharts, dataframe
@@ -75,6 +75,7 @@ class DemandSingleView(TemplateView):
                 hh = hh_form.save()
                 hh_id = hh.id
                 Simulation.delete_containing_household(hh_id)
+                results.ResultPageCache().invalidate()
             else:
                 context = self.get_context_data()
                 context["household_form"] = hh_form
@@ -278,18 +279,11 @@ class ParameterView(TemplateView):
         if not scenarios:
             raise KeyError("No scenarios found")
 
-        # Get data from OEP:
-        parameters = []
-        for scenario in scenarios:
-            scenario_parameters = OEPScenario.get_scenario_parameters(
-                scenario.name, session.demand_type
-            )
-            # Load additional dynamic parameters from module:
-            scenario_parameters = scenario.module.Scenario.add_dynamic_parameters(
-                scenario, scenario_parameters
-            )
-            parameters.append((scenario.name, scenario_parameters))
-        return parameters
+        # Get data from OEP (including dynamic parameters):
+        return [
+            (scenario.name, scenario.get_scenario_parameters())
+            for scenario in scenarios
+        ]
 
     def get_context_data(self, session, parameter_form=None, **kwargs):
         context = {}
@@ -380,8 +374,7 @@ class SummaryView(TemplateView):
     @check_session_method
     def post(self, request, session):
         if "done" in request.POST:
-            for scenario in session.scenarios:
-                scenario.load_or_simulate()
+            session.load_or_simulate()
             return redirect("stemp:result")
         else:
             return redirect("stemp:parameter")
@@ -408,17 +401,22 @@ class ResultView(TemplateView):
         result_ids = kwargs.get("results")
 
         if result_ids is not None:
-            # Check if results exist:
-            results_not_found = [
-                result_id
-                for result_id in result_ids
-                if not Simulation.objects.filter(result_id=result_id).exists()
-            ]
-            if len(results_not_found) > 0:
-                return self.render_to_response({"results_not_found": results_not_found})
-            context = self.get_context_data(result_ids)
+            result_ids = sorted(result_ids)
+            page_cache = results.ResultPageCache()
+            content = page_cache.get(result_ids)
+            if content is not None:
+                return HttpResponse(content)
+            try:
+                context = self.get_context_data(result_ids)
+            except results.SimulationResultNotFound as error:
+                return self.render_to_response(
+                    {"results_not_found": error.result_ids}
+                )
             # Render list of given results:
-            return self.render_to_response(context)
+            response = self.render_to_response(context)
+            response.render()
+            page_cache.set(result_ids, response.content)
+            return response
 
         try:
             session = SESSION_DATA.get_session(request)
@@ -426,8 +424,7 @@ class ResultView(TemplateView):
             # Render empty results:
             return self.render_to_response({})
 
-        pending = any([scenario.is_pending() for scenario in session.scenarios])
-        if pending:
+        if session.is_pending():
             # Render pending simulation:
             return redirect("stemp:pending")
 
@@ -44,6 +44,15 @@ class ManageView(TemplateView):
         elif "insert_assumptions" in request.POST:
             queries.insert_assumptions()
             info = "Assumptions inserted."
+        elif "backfill_hashes" in request.POST:
+            queries.backfill_simulation_hashes()
+            info = "Simulation hashes backfilled."
+        elif "migrate_sequences" in request.POST:
+            queries.migrate_result_sequences()
+            info = "Result sequences migrated."
+        elif "warm_results" in request.POST:
+            queries.warm_default_results()
+            info = "Warming of default results started."
         elif "insert_sources" in request.POST:
             queries.insert_sources()
             info = "Sources inserted."
@@ -14,7 +14,7 @@ def check_pending(request, session):
     """
     Returns true if all results are ready
     """
-    ready = all([not scenario.is_pending() for scenario in session.scenarios])
+    ready = not session.is_pending()
     return JsonResponse({"ready": ready})
 
 
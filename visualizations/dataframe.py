@@ -2,13 +2,37 @@
 
 import numpy
 import pandas
-from collections import OrderedDict
+import jinja2
 from itertools import accumulate
 
 from utils.visualizations import VisualizationTemplate
 from stemp.constants import RESULT_COLORS
 from stemp.app_settings import LABELS
 
+COMPARISON_TABLE_TEMPLATE = """\
+<table>
+  <thead>
+    <tr>
+      <th class="blank level0"></th>
+{%- for column in columns %}
+      <th class="col_heading level0 col{{ loop.index0 }}">{{ column }}</th>
+{%- endfor %}
+    </tr>
+  </thead>
+  <tbody>
+{%- for row in rows %}
+{%- set row_num = loop.index0 %}
+    <tr>
+      <th class="row_heading level0 row{{ row_num }}">{{ row.heading }}</th>
+{%- for value, style in row.cells %}
+      <td class="data row{{ row_num }} col{{ loop.index0 }}" style="text-align: {{ row.align }};{% if style %} {{ style }}{% endif %}">{{ value }}</td>
+{%- endfor %}
+    </tr>
+{%- endfor %}
+  </tbody>
+</table>
+"""
+
 
 class Dataframe(VisualizationTemplate):
     """Class to render a dataframe to html"""
@@ -34,16 +58,6 @@ class Dataframe(VisualizationTemplate):
         context["data"] = self.render_data()
         return context
 
-    @staticmethod
-    def format_row_wise(styler, formatter):
-        """Function to set up rowwise formatter in dataframe"""
-        for row, row_formatter in formatter.items():
-            row_num = styler.index.get_loc(row)
-
-            for col_num in range(len(styler.columns)):
-                styler._display_funcs[(row_num, col_num)] = row_formatter
-        return styler
-
 
 class ComparisonDataframe(Dataframe):
     """Renders dataframe which holds comparison of different (technology) scenarios"""
@@ -85,7 +99,9 @@ class ComparisonDataframe(Dataframe):
         "Primärenergiefaktor",
         "Primärenergie",
     )
+    left_aligned = ("Vorteile", "Nachteile")
     information = {k: v for k, v in LABELS["result"]["information"].items()}
+    table_template = jinja2.Template(COMPARISON_TABLE_TEMPLATE)
 
     def __init__(self, data):
         super(ComparisonDataframe, self).__init__(
@@ -96,24 +112,23 @@ class ComparisonDataframe(Dataframe):
     def set_data(self, data: pandas.DataFrame):
         self.data = data
 
-    def __style_color(self, row):
+    def _get_row_styles(self, row):
         """
-        Sets color for cell in a row, depending on value compared to other cells
+        Sets color for cells of a row, depending on value compared to other cells
 
         Depending on number of colors, value ranges are binned.
-        Colors are set for each cell depending on result bin.
+        Bins of all cells of the row are found within one (vectorized) digitize.
         """
-        row_style = []
-        row_range = row.max() - row.min()
+        values = numpy.asarray(row, dtype=float)
+        row_min = numpy.nanmin(values)
+        row_range = numpy.nanmax(values) - row_min
         if abs(row_range) < 1e-14:
-            return [""] * len(row)
-        for value in row:
-            color_index = numpy.digitize([(value - row.min()) / row_range], self.bins)[
-                0
-            ]
-            color_index = min(color_index, len(RESULT_COLORS) - 1)
-            row_style.append(RESULT_COLORS[color_index].style)
-        return row_style
+            return [""] * len(values)
+        color_indices = numpy.minimum(
+            numpy.digitize((values - row_min) / row_range, self.bins),
+            len(RESULT_COLORS) - 1,
+        )
+        return [RESULT_COLORS[index].style for index in color_indices]
 
     def __create_column_name_with_info(self, column):
         """Adds information mark (?) with tooltip to each category in column"""
@@ -129,40 +144,38 @@ class ComparisonDataframe(Dataframe):
         else:
             return column
 
-    def render_data(self):
-        """Adapted rendering function, to apply all styles to the dataframe"""
-        # Exchange columns with columns plus information:
-        columns_dict = OrderedDict(
-            [(i, self.__create_column_name_with_info(i)) for i in self.data.index]
-        )
-        self.data.index = pandas.Index(columns_dict.values())
-
-        # Apply styles:
-        styler = self.format_row_wise(
-            self.data.style,
-            {
-                columns_dict[column]: formatter
-                for column, formatter in self.formatters.items()
-            },
-        )
+    def get_rows(self):
+        """
+        Returns heading and formatted cells (value and style) for each row of data
 
-        if len(self.data.columns) > 1:
-            styler = styler.apply(
-                self.__style_color,
-                axis=1,
-                subset=pandas.IndexSlice[
-                    [columns_dict[colored] for colored in self.colored], :
-                ],
+        Formatter and colors are looked up and computed once per row instead of once
+        per cell.
+        """
+        colorize = len(self.data.columns) > 1
+        rows = []
+        for category, row in self.data.iterrows():
+            formatter = self.formatters.get(category, str)
+            values = [formatter(value) for value in row]
+            if colorize and category in self.colored:
+                styles = self._get_row_styles(row.values)
+            else:
+                styles = [""] * len(values)
+            rows.append(
+                {
+                    "heading": self.__create_column_name_with_info(category),
+                    "cells": list(zip(values, styles)),
+                    "align": "left" if category in self.left_aligned else "right",
+                }
             )
-        pro_con_align = [
-            {
-                "selector": f"td.data.row{row}.col{col}",
-                "props": [("text-align", "left")],
-            }
-            for row in range(6, 8)
-            for col in range(len(self.data.columns))
-        ]
-        styler.set_table_styles(
-            [{"selector": "td", "props": [("text-align", "right")]},] + pro_con_align
+        return rows
+
+    def render_data(self):
+        """
+        Renders comparison table via precompiled template
+
+        Pandas Styler is not used, as it renders each cell separately and is slow;
+        instead, cells are formatted and colored row-wise (see get_rows).
+        """
+        return self.table_template.render(
+            columns=self.data.columns, rows=self.get_rows()
         )
-        return styler.render()
@@ -0,0 +1,102 @@
+"""
+Pre-solves results of default scenarios in order to serve most requests from cache
+
+Most users do not change any parameter on parameter page; thus, results for all
+activated scenarios, default households and default parameters are simulated in
+advance. As stored simulations are looked up via parameter hash including date of
+last scenario change (see Simulation.get_parameter_hash), results are re-warmed
+automatically, once a scenario changes.
+"""
+
+import logging
+from django.core.cache import cache
+
+from stemp import constants
+from stemp.app_settings import ACTIVATED_SCENARIOS
+from stemp.constants import DemandType
+from stemp.models import Scenario, Simulation, Household
+from stemp.user_data import UserSession
+from stemp.tasks import start_batch_simulation
+
+WARMING_STATE_KEY = "stemp_warming_state"
+
+
+def get_default_households():
+    """Returns default households (see db_population.queries.insert_default_households)"""
+    names = [
+        f"{house_type.value}_{num_persons}"
+        for house_type in constants.HouseType
+        for num_persons in range(1, 11)
+    ]
+    return Household.objects.filter(name__in=names).order_by("id")
+
+
+def get_default_parameters(scenario, demand_type, demand_id):
+    """
+    Returns default parameters (including demand) for given scenario and demand
+
+    Parameters are set up as if a user had submitted parameter page unchanged.
+    """
+    session = UserSession()
+    session.demand_type = demand_type
+    session.demand_id = demand_id
+    session.init_scenarios([scenario])
+    scenario_session = session.scenarios[0]
+    scenario_session.init_default_parameters()
+    scenario_session.include_demand()
+    return scenario_session.parameter
+
+
+def get_warming_state():
+    """Returns date of last change for all activated scenarios"""
+    return {
+        scenario.name: scenario.last_change
+        for scenario in Scenario.objects.filter(name__in=ACTIVATED_SCENARIOS)
+    }
+
+
+def warm_default_results(force=False):
+    """
+    Starts simulations for all activated scenarios, default households and defaults
+
+    For each household, all scenarios without stored results are simulated within one
+    batch task (see tasks.simulate_batch); thus, households are simulated in parallel
+    by all available celery workers.
+    Unless force is set, warming is skipped if no scenario has changed since last
+    complete warming. Warming is regarded as complete, once stored results are found
+    for all default scenarios; thus, simulations which are still running or have
+    failed are checked (and restarted if failed, see tasks.start_simulation) on next
+    warming.
+
+    Parameters
+    ----------
+    force : bool
+        If set, stored results are checked, even if no scenario has changed
+
+    Returns
+    -------
+    int
+        Number of started simulations
+    """
+    state = get_warming_state()
+    if not force and cache.get(WARMING_STATE_KEY) == state:
+        return 0
+
+    started = 0
+    for household in get_default_households():
+        missing = []
+        for scenario in ACTIVATED_SCENARIOS:
+            parameters = get_default_parameters(
+                scenario, DemandType.Single, household.id
+            )
+            if Simulation.find_result(scenario, parameters) is None:
+                missing.append((scenario, parameters))
+        if len(missing) > 0:
+            start_batch_simulation(missing)
+            started += len(missing)
+    logging.info(f"Started {started} simulations to warm default results")
+
+    if started == 0:
+        # Scenarios are stored on first simulation; thus, state is read again:
+        cache.set(WARMING_STATE_KEY, get_warming_state(), None)
+    return started